@@ -48,6 +48,7 @@ const config: GatsbyConfig = {
           { title: `Posts`, slug: `/` },
           ...(features.graphEnabled ? [{ title: `Graph`, slug: `/graph` }] : []),
           { title: `Snippets`, slug: `/gallery` },
+          { title: `Search`, slug: `/search` },
           { title: `About`, slug: `/about` },
         ],
         externalLinks: [],
@@ -57,8 +57,47 @@ function loadSnippetMetadata() {
   return {}
 }
 
+// Load the link graph exported by scripts/package_obsidian.py (see scripts/link_graph.py)
+function loadLinkGraph() {
+  const graphPath = path.join(__dirname, "content", "link-graph.json")
+  if (fs.existsSync(graphPath)) {
+    try {
+      const graph = JSON.parse(fs.readFileSync(graphPath, "utf-8"))
+      const snippetsDir = path.join(__dirname, "content", "snippets")
+      graph.byTitle = new Map(Object.entries(graph.notes || {}).map(([title, note]) => [title.toLowerCase(), note]))
+      graph.snippetDirs = new Set(fs.existsSync(snippetsDir) ? fs.readdirSync(snippetsDir) : [])
+      return graph
+    } catch (e) {
+      console.warn("Failed to load link graph:", e)
+    }
+  }
+  return null
+}
+
+// A note's outgoing links from the link graph, in the same form as
+// extractWikiLinks: packaged snippets as snippet:slug, anything else by title.
+// Like the rendered page, it leaves out unresolved targets (plain text) and
+// snippets that failed their quality check (not linked).
+// Returns null for notes the graph doesn't know.
+function graphWikiLinks(linkGraph, title, snippetMeta = {}) {
+  const note = linkGraph.byTitle.get(title.toLowerCase())
+  if (!note) return null
+
+  const links = []
+  for (const target of note.links || []) {
+    const slug = linkGraph.notes[target]?.slug
+    if (slug && linkGraph.snippetDirs.has(slug)) {
+      if (snippetMeta[slug]?.passes === false) continue
+      links.push(`snippet:${slug}`)
+    } else {
+      links.push(target)
+    }
+  }
+  return [...new Set(links)]
+}
+
 // Process a content directory (posts or snippets)
-function processContentDir(dirPath, isSnippet = false, snippetMeta = {}) {
+function processContentDir(dirPath, isSnippet = false, snippetMeta = {}, linkGraph = null) {
   if (!fs.existsSync(dirPath)) return { nodes: [], titleToSlug: new Map() }
 
   const nodes = []
@@ -81,7 +120,8 @@ function processContentDir(dirPath, isSnippet = false, snippetMeta = {}) {
     
     titleToSlug.set(title.toLowerCase(), dir)
     
-    const wikiLinks = extractWikiLinks(content)
+    // Links come from the packager's link graph; re-scan the MDX only without one
+    const wikiLinks = (linkGraph && graphWikiLinks(linkGraph, title, snippetMeta)) || extractWikiLinks(content)
     const tags = extractTags(content)
 
     // For snippets, check if accessible (quality passed)
@@ -144,6 +184,11 @@ exports.createSchemaCustomization = ({ actions, schema }) => {
       slug: String
     }
     
+    type SnippetLink {
+      title: String
+      slug: String
+    }
+    
     type MdxSnippet implements Node {
       id: ID!
       slug: String!
@@ -153,6 +198,7 @@ exports.createSchemaCustomization = ({ actions, schema }) => {
       contentFilePath: String!
       excerpt(pruneLength: Int = 140): String! @snippetMdxPassthrough(fieldName: "excerpt")
       tags: [SnippetTag]
+      related: [SnippetLink]
     }
   `)
 }
@@ -196,6 +242,11 @@ exports.onCreateNode = ({ node, actions, getNode, createNodeId, createContentDig
     displayDate: node.frontmatter?.displayDate || null,
     contentFilePath: fileNode.absolutePath,
     tags: modifiedTags,
+    // Similar snippets listed by scripts/note_similarity.py
+    related: (node.frontmatter?.related || []).map((entry) => ({
+      title: entry.title,
+      slug: `/snippets/${entry.slug}/`,
+    })),
   }
   
   const mdxSnippetId = createNodeId(`${node.id} >>> MdxSnippet`)
@@ -332,12 +383,13 @@ function generateGraphData() {
   const snippetsDir = path.join(__dirname, "content", "snippets")
   
   const snippetMeta = loadSnippetMetadata()
+  const linkGraph = loadLinkGraph()
   const hiddenConfig = loadHiddenSnippets()
   const hiddenSlugs = new Set(hiddenConfig.hidden || [])
   
   // Process posts and snippets
-  const { nodes: postNodes, titleToSlug: postTitleToSlug } = processContentDir(postsDir, false)
-  const { nodes: snippetNodes, titleToSlug: snippetTitleToSlug } = processContentDir(snippetsDir, true, snippetMeta)
+  const { nodes: postNodes, titleToSlug: postTitleToSlug } = processContentDir(postsDir, false, snippetMeta, linkGraph)
+  const { nodes: snippetNodes, titleToSlug: snippetTitleToSlug } = processContentDir(snippetsDir, true, snippetMeta, linkGraph)
   
   // Filter out hidden snippets from nodes
   const visibleSnippetNodes = snippetNodes.filter(n => !hiddenSlugs.has(n.id.replace('snippet-', '')))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+AI Check Log
+
+Append-only JSONL log of quality-check verdicts, one file per day:
+
+    scripts/logs/ai_checks_{date}.jsonl        active file, one entry per line
+    scripts/logs/ai_checks_{date}.{n}.jsonl.gz rotated files (n = 1, 2, ...)
+
+Appending costs one write regardless of how many checks were logged
+before. Once the active file reaches AI_LOG_MAX_BYTES it is renamed to
+the next rotation index and gzip-compressed (AI_LOG_COMPRESS=0 keeps it
+as plain .jsonl). AI_LOG_MAX_BYTES=0 disables rotation.
+
+The log is the record of every check; nothing else keeps a copy.
+Per-check debug files ({timestamp}_{title}.json) are only written with
+AI_LOG_PER_CHECK_FILES=1.
+"""
+
+import os
+import re
+import gzip
+import json
+import shutil
+from pathlib import Path
+from typing import Dict, Any
+
+from file_lock import file_lock
+
+# Default log location
+LOGS_DIR = Path(__file__).parent / 'logs'
+
+# Rotate the active file once it reaches this size (0 = never)
+LOG_MAX_BYTES = int(os.getenv('AI_LOG_MAX_BYTES', str(5 * 1024 * 1024)))
+
+# Gzip rotated files
+LOG_COMPRESS = os.getenv('AI_LOG_COMPRESS', '1') != '0'
+
+# Also write one {timestamp}_{title}.json file per check
+PER_CHECK_FILES = os.getenv('AI_LOG_PER_CHECK_FILES', '0') == '1'
+
+# ai_checks_{date}.jsonl or ai_checks_{date}.{n}.jsonl[.gz]
+LOG_FILE_PATTERN = re.compile(r'^ai_checks_(\d{4}-\d{2}-\d{2})(?:\.(\d+))?\.(jsonl|jsonl\.gz)$')
+
+
+def log_path(date_str: str, logs_dir: Path = LOGS_DIR) -> Path:
+    """Active log file for a date (YYYY-MM-DD)."""
+    return logs_dir / f'ai_checks_{date_str}.jsonl'
+
+
+def _rotate(active: Path, compress: bool) -> None:
+    """Move the active file to the next free rotation index (caller holds the lock)."""
+    prefix = active.name[:-len('.jsonl')]
+    taken = [
+        int(match.group(2))
+        for match in map(LOG_FILE_PATTERN.match, os.listdir(active.parent))
+        if match and match.group(2) and f'ai_checks_{match.group(1)}' == prefix
+    ]
+    rotated = active.with_name(f'{prefix}.{max(taken, default=0) + 1}.jsonl')
+    os.replace(active, rotated)
+    if compress:
+        with open(rotated, 'rb') as src, gzip.open(rotated.with_name(rotated.name + '.gz'), 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        rotated.unlink()
+
+
+def append_entry(
+    entry: Dict[str, Any],
+    date_str: str,
+    logs_dir: Path = LOGS_DIR,
+    max_bytes: int = LOG_MAX_BYTES,
+    compress: bool = LOG_COMPRESS
+) -> Path:
+    """
+    Append one entry to the day's log, rotating first if it is full.
+    Safe across threads and processes. Returns the active log path.
+    """
+    logs_dir.mkdir(parents=True, exist_ok=True)
+    active = log_path(date_str, logs_dir)
+    line = json.dumps(entry, ensure_ascii=False) + '\n'
+
+    with file_lock(active):
+        if max_bytes and active.exists() and active.stat().st_size + len(line) > max_bytes:
+            _rotate(active, compress)
+        with open(active, 'a', encoding='utf-8') as f:
+            f.write(line)
+    return active
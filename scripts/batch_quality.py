@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Batch Quality Scoring
+
+Re-scores every snippet in content/snippets/_metadata.json as a single
+OpenAI Batch API job instead of one chat.completions call per note.
+
+Usage:
+    python scripts/batch_quality.py [--refresh] [--dry-run]
+    python scripts/batch_quality.py --resume BATCH_ID
+
+The script will:
+1. Collect every snippet whose verdict is not already cached
+2. Write the pending checks to a Batch API JSONL request file (one request
+   per chunk for notes longer than QUALITY_CHUNK_TOKENS)
+3. Upload it, create the batch and poll until it finishes
+4. Combine the verdicts for each note and import them into _metadata.json,
+   the verdict cache, the build manifest and the ai_checks_*.json logs
+
+Batch state is kept in scripts/.cache/batches/ so an interrupted run can
+be resumed with --resume. Point OPENAI_BASE_URL at openai_stub_server.py
+to run the whole flow locally.
+"""
+
+import json
+import time
+import argparse
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, List, Tuple
+
+from package_obsidian import (
+    OBSIDIAN_VAULT_PATH,
+    OPENAI_API_KEY,
+    SNIPPETS_DIR,
+    BLOG_ROOT,
+    find_document,
+    extract_frontmatter,
+    split_for_check,
+    chunk_title,
+    quality_cache_key,
+    quality_request_body,
+    parse_quality_response,
+    combine_chunk_verdicts,
+    quality_cache,
+    get_snippet_metadata,
+    log_ai_check,
+)
+from build_manifest import BuildManifest
+from quality_prefilter import prefilter_verdict
+from snippet_metadata import SnippetMetadata
+from openai_client import get_openai_client
+
+# Where request files and batch state are kept
+BATCH_DIR = Path(__file__).parent / '.cache' / 'batches'
+
+# Batch API endpoint the requests target
+BATCH_ENDPOINT = '/v1/chat/completions'
+
+# Batch statuses after which polling stops
+FINAL_STATUSES = {'completed', 'failed', 'expired', 'cancelled'}
+
+
+def collect_pending_checks(
+    metadata: SnippetMetadata,
+    refresh: bool = False,
+    vault_path: str = OBSIDIAN_VAULT_PATH
+) -> List[Dict[str, Any]]:
+    """
+    Build one pending check per snippet in the metadata.
+    Snippets with a cached verdict are skipped unless refresh=True, and so
+    are ones the pre-filter rejects (the packager fails those locally).
+    """
+    pending = []
+    for slug, entry in metadata.items():
+        title = entry.get('title', slug)
+        doc_path = find_document(title, vault_path)
+        if not doc_path:
+            print(f"  ⚠️  Not in vault, skipping: {title}")
+            continue
+
+        _, body = extract_frontmatter(doc_path.read_text(encoding='utf-8'))
+        rejected = prefilter_verdict(body)
+        if rejected is not None:
+            print(f"  🧹 Rejected locally, skipping: {title} ({rejected['reason']})")
+            continue
+
+        chunks = split_for_check(body)
+        key = quality_cache_key(chunks, title)
+        if not refresh and quality_cache.get(key) is not None:
+            continue
+
+        pending.append({
+            'custom_id': slug,
+            'title': title,
+            'cache_key': key,
+            'chunks': chunks,
+        })
+    return pending
+
+
+def item_chunks(item: Dict[str, Any]) -> List[str]:
+    """A pending check's chunks (batch state saved before chunking has check_content)."""
+    return item.get('chunks') or [item['check_content']]
+
+
+def chunk_requests(item: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+    """(custom_id, chunk, title sent) for each request of a pending check."""
+    chunks = item_chunks(item)
+    if len(chunks) == 1:
+        return [(item['custom_id'], chunks[0], item['title'])]
+    return [
+        (f"{item['custom_id']}#{index}", chunk, chunk_title(item['title'], index, len(chunks)))
+        for index, chunk in enumerate(chunks)
+    ]
+
+
+def write_request_file(pending: List[Dict[str, Any]], path: Path) -> None:
+    """Write pending checks as Batch API JSONL requests."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for item in pending:
+            for custom_id, chunk, title in chunk_requests(item):
+                f.write(json.dumps({
+                    'custom_id': custom_id,
+                    'method': 'POST',
+                    'url': BATCH_ENDPOINT,
+                    'body': quality_request_body(chunk, title)
+                }) + '\n')
+
+
+def save_batch_state(batch_id: str, request_file: Path, pending: List[Dict[str, Any]]) -> Path:
+    """Remember which checks a batch contains so its results can be imported later."""
+    state_path = BATCH_DIR / f'{batch_id}.json'
+    state_path.write_text(json.dumps({
+        'batch_id': batch_id,
+        'request_file': str(request_file),
+        'created': datetime.now().isoformat(),
+        'items': pending
+    }, indent=2), encoding='utf-8')
+    return state_path
+
+
+def load_batch_state(batch_id: str) -> Dict[str, Any]:
+    """Load the state saved by save_batch_state."""
+    return json.loads((BATCH_DIR / f'{batch_id}.json').read_text(encoding='utf-8'))
+
+
+def submit_batch(client: Any, request_file: Path) -> Any:
+    """Upload the request file and create the batch."""
+    with open(request_file, 'rb') as f:
+        uploaded = client.files.create(file=f, purpose='batch')
+    return client.batches.create(
+        input_file_id=uploaded.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window='24h',
+        metadata={'description': 'snippet quality re-score'}
+    )
+
+
+def wait_for_batch(client: Any, batch_id: str, poll_interval: float) -> Any:
+    """Poll until the batch reaches a final status."""
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        done = f"{counts.completed}/{counts.total}" if counts else "?"
+        print(f"  ⏳ Batch {batch_id}: {batch.status} ({done})")
+        if batch.status in FINAL_STATUSES:
+            return batch
+        time.sleep(poll_interval)
+
+
+def import_results(client: Any, batch: Any, state: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Import batch output into the verdict cache, _metadata.json, the build
+    manifest and the AI check logs. A note scored in chunks is imported
+    only if every chunk succeeded. Returns counts of imported/failed checks.
+    """
+    items = {item['custom_id']: item for item in state['items']}
+    # Request custom_id -> (snippet slug, chunk index)
+    requests = {
+        custom_id: (item['custom_id'], index)
+        for item in state['items']
+        for index, (custom_id, _, _) in enumerate(chunk_requests(item))
+    }
+    verdicts: Dict[str, Dict[int, Tuple[Dict[str, Any], Dict[str, Any]]]] = {}
+    counts = {'imported': 0, 'failed': 0}
+
+    lines = []
+    if batch.output_file_id:
+        lines = client.files.content(batch.output_file_id).text.splitlines()
+
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        request = requests.get(record.get('custom_id'))
+        if request is None:
+            continue
+        slug, index = request
+        item = items[slug]
+
+        response = record.get('response') or {}
+        if record.get('error') or response.get('status_code') != 200:
+            print(f"  ❌ {item['title']}: {record.get('error') or response.get('status_code')}")
+            continue
+
+        try:
+            content = response['body']['choices'][0]['message']['content']
+            result = parse_quality_response(content)
+        except (KeyError, IndexError, ValueError) as e:
+            print(f"  ❌ {item['title']}: unparseable verdict ({e})")
+            continue
+        verdicts.setdefault(slug, {})[index] = (result, response['body'].get('usage') or {})
+
+    metadata = get_snippet_metadata()
+    manifest = BuildManifest.load(root=BLOG_ROOT)
+
+    for slug, item in items.items():
+        chunks = item_chunks(item)
+        scored = verdicts.get(slug, {})
+        if len(scored) < len(chunks):
+            continue
+        results = [scored[index] for index in range(len(chunks))]
+
+        result = combine_chunk_verdicts([verdict for verdict, _ in results])
+        result['usage'] = {
+            'prompt_tokens': sum(usage.get('prompt_tokens', 0) for _, usage in results),
+            'completion_tokens': sum(usage.get('completion_tokens', 0) for _, usage in results),
+            'chunks': len(chunks)
+        }
+        quality_cache.put(item['cache_key'], result)
+        log_ai_check(item['title'], result, chunks[0], source='batch')
+
+        metadata[slug] = {
+            'title': item['title'],
+            'passes': result['passes'],
+            'quality_score': result.get('quality_score'),
+            'reason': result.get('reason', '')
+        }
+        # Posts linking this snippet pick up a changed pass/fail on the next package run
+        manifest.update(SNIPPETS_DIR / slug / 'index.mdx', quality=result)
+
+        status = "✅ PASS" if result['passes'] else "❌ FAIL"
+        print(f"  {status} {item['title']} (score: {result.get('quality_score', 'N/A')})")
+        counts['imported'] += 1
+
+    counts['failed'] = len(items) - counts['imported']
+    metadata.flush()
+    manifest.save()
+    return counts
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Re-score all snippets with one OpenAI batch job.")
+    parser.add_argument('--refresh', action='store_true',
+                        help="Re-score snippets even if a cached verdict exists")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Only write the JSONL request file")
+    parser.add_argument('--resume', metavar='BATCH_ID',
+                        help="Poll and import an already-submitted batch")
+    parser.add_argument('--poll-interval', type=float, default=30.0,
+                        help="Seconds between status polls (default: 30)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Batch Quality Scoring")
+    print("=" * 60)
+
+    if not OPENAI_API_KEY and not args.dry_run:
+        print("\n⚠️  No OpenAI API key configured.")
+        return
+
+    client = None
+    if not args.dry_run:
+        client = get_openai_client(OPENAI_API_KEY)
+
+    if args.resume:
+        state = load_batch_state(args.resume)
+        batch_id = args.resume
+    else:
+        metadata = get_snippet_metadata()
+        print(f"\nSnippets in metadata: {len(metadata)}")
+        pending = collect_pending_checks(metadata, refresh=args.refresh)
+        print(f"Pending checks: {len(pending)}")
+        if not pending:
+            print("\n✅ Every snippet already has a cached verdict.")
+            return
+
+        request_file = BATCH_DIR / f"quality_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.jsonl"
+        write_request_file(pending, request_file)
+        print(f"📝 Wrote requests: {request_file}")
+        if args.dry_run:
+            return
+
+        batch = submit_batch(client, request_file)
+        batch_id = batch.id
+        save_batch_state(batch_id, request_file, pending)
+        state = load_batch_state(batch_id)
+        print(f"🚀 Submitted batch: {batch_id}")
+        print(f"   Resume later with: python scripts/batch_quality.py --resume {batch_id}")
+
+    batch = wait_for_batch(client, batch_id, args.poll_interval)
+    if batch.status != 'completed':
+        print(f"\n❌ Batch ended with status: {batch.status}")
+        return
+
+    counts = import_results(client, batch, state)
+
+    print("\n" + "=" * 60)
+    print("Summary")
+    print("=" * 60)
+    print(f"Verdicts imported: {counts['imported']}")
+    print(f"Failed requests: {counts['failed']}")
+
+
+if __name__ == '__main__':
+    main()
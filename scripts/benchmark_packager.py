@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Packager Benchmark
+
+Generates a synthetic vault (see synthetic_vault.py) and times each stage
+of package_obsidian.py on it separately:
+
+- vault_index_cold / vault_index_warm: building and refreshing the index
+- vault_lookup: find_document for every wiki-link target
+- extract_frontmatter, parse_wiki_links, convert_latex_for_mdx, convert_to_mdx
+- quality_check: check_linked_document with check_quality stubbed out
+- image_copy: copying every image into a post directory
+- image_publish: the same through the hardlinking image store
+- metadata_io: recording every snippet in _metadata.json and reading it back
+
+Everything is written under a temporary directory; the real vault, content/
+and scripts/.cache are not touched and no API calls are made. Results are
+written as JSON so runs on different commits can be compared.
+
+Usage:
+    python scripts/benchmark_packager.py [--notes 500] [--links 8] [--images 50]
+        [--latex 0.3] [--depth 3] [--repeat 5] [--output FILE] [--compare FILE]
+"""
+
+import io
+import os
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import contextlib
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, Callable, Optional
+
+import package_obsidian as po
+from vault_index import VaultIndex, _INDEXES
+from build_manifest import BuildManifest
+from snippet_metadata import SnippetMetadata
+from content_store import get_content_store
+from image_store import ImageStore
+from synthetic_vault import generate_vault
+
+# Where results go unless --output is given
+RESULTS_DIR = Path(__file__).parent / '.cache' / 'benchmarks'
+
+# Stages slower than this ratio against --compare are flagged
+REGRESSION_RATIO = 1.2
+
+
+def stub_check_quality(content: str, title: str, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+    """Offline stand-in for check_quality: passes notes longer than 200 words."""
+    words = len(content.split())
+    return {
+        "appropriate": True,
+        "technically_sound": True,
+        "quality_score": 7 if words > 200 else 4,
+        "passes": words > 200,
+        "reason": "benchmark stub"
+    }
+
+
+def time_stage(func: Callable[[], Any], repeat: int, items: int) -> Dict[str, Any]:
+    """Run func `repeat` times and summarise the wall-clock timings."""
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - started)
+    best = min(runs)
+    return {
+        'items': items,
+        'runs': repeat,
+        'min_ms': round(best * 1000, 3),
+        'median_ms': round(statistics.median(runs) * 1000, 3),
+        'per_item_us': round(best * 1e6 / max(1, items), 3),
+    }
+
+
+def git_commit() -> Optional[str]:
+    """Current commit of the repo, if git is available."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=Path(__file__).parent, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(work_dir: Path, vault_args: Dict[str, Any], repeat: int) -> Dict[str, Dict[str, Any]]:
+    """Generate the vault under work_dir and time every stage."""
+    vault_dir = work_dir / 'vault'
+    info = generate_vault(vault_dir, **vault_args)
+    vault_path = str(vault_dir)
+    stages: Dict[str, Dict[str, Any]] = {}
+
+    # Vault index: a cold build from nothing, then a refresh with nothing changed
+    def cold_index() -> None:
+        VaultIndex(vault_path, cache_path=work_dir / 'index.json').refresh()
+    stages['vault_index_cold'] = time_stage(cold_index, repeat, len(info['titles']))
+
+    index = VaultIndex.load(vault_path, cache_path=work_dir / 'index.json')
+    stages['vault_index_warm'] = time_stage(index.refresh, repeat, len(info['titles']))
+    _INDEXES[vault_path] = index
+
+    paths = [index.find_document(title) for title in info['titles']]
+    texts = [path.read_text(encoding='utf-8') for path in paths]
+    bodies = [po.extract_frontmatter(text)[1] for text in texts]
+    links = [po.parse_wiki_links(body) for body in bodies]
+    targets = [l['target'] for note_links in links for l in note_links if not l['is_image']]
+
+    stages['vault_lookup'] = time_stage(
+        lambda: [po.find_document(target, vault_path) for target in targets], repeat, len(targets))
+    stages['extract_frontmatter'] = time_stage(
+        lambda: [po.extract_frontmatter(text) for text in texts], repeat, len(texts))
+    stages['parse_wiki_links'] = time_stage(
+        lambda: [po.parse_wiki_links(body) for body in bodies], repeat, len(bodies))
+    stages['convert_latex_for_mdx'] = time_stage(
+        lambda: [po.convert_latex_for_mdx(body) for body in bodies], repeat, len(bodies))
+
+    linked_snippets = {title: {'slug': po.slugify(title), 'passes': True} for title in info['titles']}
+    images_map = {name: name.replace(' ', '_') for name in info['images']}
+    stages['convert_to_mdx'] = time_stage(
+        lambda: [po.convert_to_mdx(body, title, linked_snippets=linked_snippets, images_map=images_map)
+                 for title, body in zip(info['titles'], bodies)],
+        repeat, len(bodies))
+
+    # Quality checks (stubbed, output discarded) through the same path package_post uses
+    manifest = BuildManifest(work_dir / 'manifest.json', root=work_dir)
+    original_check = po.check_quality
+    po.check_quality = stub_check_quality
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            stages['quality_check'] = time_stage(
+                lambda: [po.check_linked_document(title, vault_path, manifest, force=True)
+                         for title in info['titles']],
+                repeat, len(info['titles']))
+    finally:
+        po.check_quality = original_check
+
+    image_paths = [index.find_image(name) for name in info['images']]
+
+    def copy_images() -> None:
+        post_dir = work_dir / 'posts' / 'benchmark'
+        shutil.rmtree(post_dir, ignore_errors=True)
+        post_dir.mkdir(parents=True)
+        for name, path in zip(info['images'], image_paths):
+            shutil.copy2(path, post_dir / images_map[name])
+    stages['image_copy'] = time_stage(copy_images, repeat, len(image_paths))
+
+    store = ImageStore(work_dir / 'image_store')
+    image_shas = [manifest.file_hash(path) for path in image_paths]
+
+    def publish_images() -> None:
+        post_dir = work_dir / 'posts' / 'benchmark-store'
+        shutil.rmtree(post_dir, ignore_errors=True)
+        post_dir.mkdir(parents=True)
+        for name, path, sha in zip(info['images'], image_paths, image_shas):
+            store.publish(path, sha, post_dir / images_map[name])
+    stages['image_publish'] = time_stage(publish_images, repeat, len(image_paths))
+
+    def metadata_io() -> None:
+        metadata_path = work_dir / 'snippets' / '_metadata.json'
+        content_store = get_content_store(work_dir / 'content.db')
+        metadata = SnippetMetadata.load(metadata_path, store=content_store)
+        for title in info['titles']:
+            metadata[po.slugify(title)] = {'title': title, 'passes': True, 'quality_score': 7, 'reason': ''}
+        metadata.flush()
+        SnippetMetadata.load(metadata_path, store=content_store)
+    stages['metadata_io'] = time_stage(metadata_io, repeat, len(info['titles']))
+
+    return stages
+
+
+def print_results(stages: Dict[str, Dict[str, Any]], baseline: Optional[Dict[str, Any]] = None) -> None:
+    """Print a table of stage timings, with ratios against a baseline run if given."""
+    base_stages = (baseline or {}).get('stages', {})
+    print(f"\n{'Stage':<24}{'items':>8}{'min ms':>12}{'median ms':>12}{'µs/item':>10}"
+          + (f"{'vs base':>10}" if baseline else ''))
+    print("-" * (66 + (10 if baseline else 0)))
+    for name, stage in stages.items():
+        line = (f"{name:<24}{stage['items']:>8}{stage['min_ms']:>12.2f}"
+                f"{stage['median_ms']:>12.2f}{stage['per_item_us']:>10.1f}")
+        base = base_stages.get(name)
+        if base and base.get('min_ms'):
+            ratio = stage['min_ms'] / base['min_ms']
+            flag = ' ⚠️' if ratio > REGRESSION_RATIO else ''
+            line += f"{ratio:>9.2f}x{flag}"
+        print(line)
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark package_obsidian.py on a synthetic vault.")
+    parser.add_argument('--notes', type=int, default=500)
+    parser.add_argument('--links', type=int, default=8, help="Wiki-links per note")
+    parser.add_argument('--images', type=int, default=50)
+    parser.add_argument('--latex', type=float, default=0.3, help="Chance of math per sentence (0-1)")
+    parser.add_argument('--depth', type=int, default=3, help="Maximum folder nesting")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per stage (the fastest is reported)")
+    parser.add_argument('--output', type=Path, help="Results JSON (default: scripts/.cache/benchmarks/)")
+    parser.add_argument('--compare', type=Path, help="Earlier results JSON to compare against")
+    parser.add_argument('--keep', action='store_true', help="Keep the generated vault and outputs")
+    args = parser.parse_args()
+
+    vault_args = {
+        'notes': args.notes,
+        'links_per_note': args.links,
+        'images': args.images,
+        'latex_density': args.latex,
+        'depth': args.depth,
+        'seed': args.seed,
+    }
+
+    print("=" * 60)
+    print("Packager Benchmark")
+    print("=" * 60)
+    print(f"\nVault: {args.notes} notes, {args.links} links/note, {args.images} images, "
+          f"LaTeX {args.latex}, depth {args.depth}")
+
+    work_dir = Path(tempfile.mkdtemp(prefix='packager-bench-'))
+    try:
+        stages = run_benchmarks(work_dir, vault_args, args.repeat)
+    finally:
+        if args.keep:
+            print(f"\n📂 Kept benchmark files in {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'vault': vault_args,
+        'repeat': args.repeat,
+        'stages': stages,
+    }
+
+    baseline = None
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding='utf-8'))
+        print(f"\nComparing against {args.compare} (commit {baseline.get('commit')})")
+    print_results(stages, baseline)
+
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        output = RESULTS_DIR / f"bench_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{results['commit'] or 'nogit'}.json"
+    output.write_text(json.dumps(results, indent=2), encoding='utf-8')
+    print(f"\n📝 Results: {output}")
+
+
+if __name__ == '__main__':
+    main()
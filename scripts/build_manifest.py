@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Build Manifest
+
+Records what each packaged output (post or snippet index.mdx) was built
+from: a hash of the source note, hashes of its images, the converter
+version and anything else the output depends on. On the next run the
+packager compares the new inputs against the recorded ones and skips
+outputs that would come out the same.
+
+File hashes are memoised by (size, mtime) so unchanged images are not
+re-read on every run.
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Optional, Dict, Any, Set
+
+# Default manifest location
+MANIFEST_PATH = Path(__file__).parent / '.cache' / 'build_manifest.json'
+
+# Bump when the manifest layout changes
+MANIFEST_VERSION = 1
+
+# Human-readable rebuild reasons, in the order inputs are compared
+INPUT_REASONS = {
+    'converter': 'converter version changed',
+    'source': 'source note changed',
+    'images': 'images changed',
+    'links': 'linked snippets changed',
+    'min_score': 'quality threshold changed',
+    'prefilter': 'quality pre-filter changed',
+}
+
+# Inputs only some builds work out, compared only when the caller passes
+# them: a snippet's links to other snippets are only known with --depth, so
+# a run without it leaves snippets built with --depth as they are
+PARTIAL_INPUTS = {'links'}
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 of a string."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class BuildManifest:
+    """
+    Maps output keys (paths relative to the blog root) to the inputs they
+    were last built from.
+    """
+
+    def __init__(self, path: Path = MANIFEST_PATH, root: Optional[Path] = None):
+        self.path = path
+        self.root = root
+        self.outputs: Dict[str, Dict[str, Any]] = {}
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+
+        # Keys touched since the last take_changes(), for handing back from workers
+        self._changed_outputs: Set[str] = set()
+        self._changed_files: Set[str] = set()
+
+    @classmethod
+    def load(cls, path: Path = MANIFEST_PATH, root: Optional[Path] = None) -> 'BuildManifest':
+        """Load the manifest from disk; a missing or unreadable file gives an empty manifest."""
+        manifest = cls(path, root)
+        if path.exists():
+            try:
+                data = json.loads(path.read_text(encoding='utf-8'))
+                if data.get('version') == MANIFEST_VERSION:
+                    manifest.outputs = data.get('outputs', {})
+                    manifest.files = data.get('files', {})
+            except Exception:
+                pass
+        return manifest
+
+    def key(self, output_path: Path) -> str:
+        """Stable manifest key for an output file."""
+        if self.root is not None:
+            try:
+                return output_path.relative_to(self.root).as_posix()
+            except ValueError:
+                pass
+        return output_path.as_posix()
+
+    def file_hash(self, path: Path) -> str:
+        """SHA-256 of a file, reusing the stored hash while size and mtime are unchanged."""
+        stat = path.stat()
+        cache_key = str(path)
+        cached = self.files.get(cache_key)
+        if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+            return cached['sha256']
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        sha = digest.hexdigest()
+
+        self.files[cache_key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha}
+        self._changed_files.add(cache_key)
+        self._dirty = True
+        return sha
+
+    def get(self, output_path: Path) -> Optional[Dict[str, Any]]:
+        """Return the stored record for an output, if any."""
+        return self.outputs.get(self.key(output_path))
+
+    def check(self, output_path: Path, inputs: Dict[str, Any]) -> Optional[str]:
+        """
+        Compare inputs against the stored record (PARTIAL_INPUTS only if
+        given). Returns None if the output is up to date, else the reason
+        to rebuild.
+        """
+        record = self.get(output_path)
+        if record is None:
+            return 'new output'
+        if not output_path.exists():
+            return 'output missing'
+
+        stored = record.get('inputs', {})
+        for name in list(INPUT_REASONS) + sorted(set(inputs) - set(INPUT_REASONS)):
+            if name in PARTIAL_INPUTS and name not in inputs:
+                continue
+            if stored.get(name) != inputs.get(name):
+                return INPUT_REASONS.get(name, f'{name} changed')
+        return None
+
+    def record(self, output_path: Path, inputs: Dict[str, Any], **extra: Any) -> None:
+        """Store the inputs an output was just built from (plus any extra fields)."""
+        key = self.key(output_path)
+        self.outputs[key] = {'inputs': inputs, **extra}
+        self._changed_outputs.add(key)
+        self._dirty = True
+
+    def image_hashes(self) -> Set[str]:
+        """Hashes of the images every recorded output publishes (its 'images' input)."""
+        return {
+            sha
+            for record in self.outputs.values()
+            for sha in (record.get('inputs', {}).get('images') or {}).values()
+        }
+
+    def update(self, output_path: Path, **fields: Any) -> bool:
+        """Update extra fields of an existing record. Returns False if there is none."""
+        record = self.get(output_path)
+        if record is None:
+            return False
+        record.update(fields)
+        self._changed_outputs.add(self.key(output_path))
+        self._dirty = True
+        return True
+
+    def take_changes(self) -> Dict[str, Dict[str, Any]]:
+        """Return (and forget) records and file hashes changed since the last call."""
+        changes = {
+            'outputs': {key: self.outputs[key] for key in self._changed_outputs},
+            'files': {key: self.files[key] for key in self._changed_files},
+        }
+        self._changed_outputs.clear()
+        self._changed_files.clear()
+        return changes
+
+    def merge(self, changes: Dict[str, Dict[str, Any]]) -> None:
+        """Apply changes taken from another manifest instance (e.g. a worker process)."""
+        if changes['outputs'] or changes['files']:
+            self.outputs.update(changes['outputs'])
+            self.files.update(changes['files'])
+            self._dirty = True
+
+    def save(self) -> None:
+        """Write the manifest atomically if anything changed."""
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            'version': MANIFEST_VERSION,
+            'outputs': self.outputs,
+            'files': self.files,
+        }
+        tmp_path = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        tmp_path.write_text(json.dumps(data, indent=1), encoding='utf-8')
+        os.replace(tmp_path, self.path)
+        self._dirty = False
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Content Store
+
+SQLite database (scripts/.state/content.db) holding the packager's state
+in one place, with indexes for the queries it needs:
+
+- notes: every packaged post and snippet by kind and slug, with the hash of the
+  note it was built from and, for snippets, the quality verdict
+- reviews: the last review_snippets.py job per title
+
+content/snippets/_metadata.json is exported from the notes table (see
+export_metadata) so gatsby-node.js keeps reading the same file. It stays
+the record of the verdicts: whenever it differs from the last export (a
+hand edit, a git pull, or a new database) it is imported back into the
+store before use (see import_metadata). Individual quality checks are
+not stored here: scripts/logs/ (see ai_check_log.py) is their record.
+
+Unlike scripts/.cache, the database is state rather than cache: the
+note hashes and review jobs are only kept here.
+
+The database is in WAL mode, so readers don't block the writer, and each
+thread (and worker process) gets its own connection. Writes from several
+processes are serialised by SQLite's own locking.
+"""
+
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional
+
+from file_lock import file_lock
+
+# Default database location
+STORE_PATH = Path(__file__).parent / '.state' / 'content.db'
+
+# Bump when the schema changes
+SCHEMA_VERSION = 3
+
+# Seconds a writer waits for another process's transaction
+BUSY_TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    kind TEXT NOT NULL,
+    slug TEXT NOT NULL,
+    title TEXT NOT NULL,
+    content_hash TEXT,
+    passes INTEGER,
+    quality_score REAL,
+    reason TEXT,
+    retry_needed INTEGER NOT NULL DEFAULT 0,
+    updated TEXT,
+    PRIMARY KEY (kind, slug)
+);
+CREATE INDEX IF NOT EXISTS notes_title ON notes (title);
+CREATE INDEX IF NOT EXISTS notes_passes ON notes (kind, passes);
+CREATE INDEX IF NOT EXISTS notes_score ON notes (kind, quality_score);
+
+-- Copies of the check log kept by schema version 2
+DROP TABLE IF EXISTS checks;
+
+CREATE TABLE IF NOT EXISTS reviews (
+    title TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    content_hash TEXT,
+    score REAL,
+    model TEXT,
+    review_file TEXT,
+    error TEXT,
+    updated TEXT
+);
+
+CREATE TABLE IF NOT EXISTS exports (
+    path TEXT PRIMARY KEY,
+    hash TEXT NOT NULL
+);
+"""
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def _bool(value: Any) -> Optional[int]:
+    return None if value is None else int(bool(value))
+
+
+def _file_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _verdict(row: sqlite3.Row) -> Dict[str, Any]:
+    """passes and quality_score of a notes row as _metadata.json has them (7, not 7.0)."""
+    score = row['quality_score']
+    return {
+        'passes': None if row['passes'] is None else bool(row['passes']),
+        'quality_score': int(score) if score is not None and score == int(score) else score,
+    }
+
+
+class ContentStore:
+    """Notes, verdicts and review jobs in one SQLite file."""
+
+    def __init__(self, path: Path = STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    # --------------------------------------------------------
+    # Connections
+    # --------------------------------------------------------
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection (a forked worker opens its own)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+                conn.executescript(SCHEMA)
+                conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    @contextmanager
+    def _transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Context manager for one write transaction."""
+        return self._transaction(self.connection())
+
+    # --------------------------------------------------------
+    # Notes and verdicts
+    # --------------------------------------------------------
+
+    def put_snippets(self, entries: Dict[str, Dict[str, Any]], replace: bool = False) -> None:
+        """
+        Upsert snippets from _metadata.json-style entries (slug -> {title,
+        passes, quality_score, reason, retry_needed?, content_hash?}).
+        A missing content_hash keeps the stored one. With replace, snippets
+        not in entries are removed.
+        """
+        now = _now()
+        rows = [
+            (slug, entry.get('title', slug), entry.get('content_hash'), _bool(entry.get('passes')),
+             entry.get('quality_score'), entry.get('reason', ''), int(bool(entry.get('retry_needed'))), now)
+            for slug, entry in entries.items()
+        ]
+        with self.transaction() as conn:
+            conn.executemany(
+                """
+                INSERT INTO notes (slug, title, kind, content_hash, passes, quality_score, reason, retry_needed, updated)
+                VALUES (?, ?, 'snippet', ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (kind, slug) DO UPDATE SET
+                    title = excluded.title,
+                    content_hash = COALESCE(excluded.content_hash, notes.content_hash),
+                    passes = excluded.passes,
+                    quality_score = excluded.quality_score,
+                    reason = excluded.reason,
+                    retry_needed = excluded.retry_needed,
+                    updated = excluded.updated
+                """,
+                rows
+            )
+            if replace:
+                stored = [row['slug'] for row in conn.execute("SELECT slug FROM notes WHERE kind = 'snippet'")]
+                conn.executemany("DELETE FROM notes WHERE kind = 'snippet' AND slug = ?",
+                                 [(slug,) for slug in stored if slug not in entries])
+
+    def put_post(self, slug: str, title: str, content_hash: str) -> None:
+        """Record a packaged post and the hash of its note."""
+        with self.transaction() as conn:
+            conn.execute(
+                """
+                INSERT INTO notes (slug, title, kind, content_hash, updated) VALUES (?, ?, 'post', ?, ?)
+                ON CONFLICT (kind, slug) DO UPDATE SET
+                    title = excluded.title,
+                    content_hash = excluded.content_hash, updated = excluded.updated
+                """,
+                (slug, title, content_hash, _now())
+            )
+
+    def has_snippets(self) -> bool:
+        return self.connection().execute("SELECT 1 FROM notes WHERE kind = 'snippet' LIMIT 1").fetchone() is not None
+
+    def snippet_metadata(self) -> Dict[str, Dict[str, Any]]:
+        """Every snippet as a _metadata.json entry, in the order they were first recorded."""
+        metadata = {}
+        for row in self.connection().execute(
+                "SELECT * FROM notes WHERE kind = 'snippet' ORDER BY rowid"):
+            entry = {'title': row['title'], **_verdict(row), 'reason': row['reason'] or ''}
+            if row['retry_needed']:
+                entry['retry_needed'] = True
+            metadata[row['slug']] = entry
+        return metadata
+
+    def export_metadata(self, path: Path) -> Dict[str, Dict[str, Any]]:
+        """
+        Write _metadata.json for Gatsby from the store (atomically), and
+        remember its hash so import_metadata can tell it was not edited since.
+        Returns the entries.
+        """
+        metadata = self.snippet_metadata()
+        data = json.dumps(metadata, indent=2).encode('utf-8')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with file_lock(path):
+            tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+            self._set_export_hash(path, _file_hash(data))
+        return metadata
+
+    def import_metadata(self, path: Path) -> int:
+        """
+        Bring the snippets in line with _metadata.json if it changed since
+        the store last exported it (or the store has never seen it): its
+        entries are upserted (keeping stored content hashes) and snippets it
+        no longer lists are removed. Returns the number of snippets imported.
+        """
+        if not path.exists():
+            return 0
+        with file_lock(path):
+            try:
+                data = path.read_bytes()
+            except OSError:
+                return 0
+            file_hash = _file_hash(data)
+            if file_hash == self._export_hash(path):
+                return 0
+            try:
+                entries = json.loads(data.decode('utf-8'))
+            except ValueError:
+                return 0
+            self.put_snippets(entries, replace=True)
+            self._set_export_hash(path, file_hash)
+        return len(entries)
+
+    def _export_hash(self, path: Path) -> Optional[str]:
+        row = self.connection().execute(
+            "SELECT hash FROM exports WHERE path = ?", (str(path.resolve()),)).fetchone()
+        return row['hash'] if row else None
+
+    def _set_export_hash(self, path: Path, file_hash: str) -> None:
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO exports (path, hash) VALUES (?, ?) "
+                "ON CONFLICT (path) DO UPDATE SET hash = excluded.hash",
+                (str(path.resolve()), file_hash)
+            )
+
+    # --------------------------------------------------------
+    # Reviews
+    # --------------------------------------------------------
+
+    def record_review(self, title: str, status: str, **fields: Any) -> None:
+        """Record a review job's outcome ("done" or "failed")."""
+        with self.transaction() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO reviews (title, status, content_hash, score, model, review_file, error, updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (title, status, fields.get('content_hash'), fields.get('score'), fields.get('model'),
+                 fields.get('review_file'), fields.get('error'), fields.get('updated') or _now())
+            )
+
+    def get_review(self, title: str) -> Optional[Dict[str, Any]]:
+        row = self.connection().execute("SELECT * FROM reviews WHERE title = ?", (title,)).fetchone()
+        return dict(row) if row else None
+
+    def review_candidates(self, threshold: float, model: str) -> List[Dict[str, Any]]:
+        """
+        Snippets that failed or scored at or below threshold (lowest score
+        first), excluding checks that still need a retry. 'current' says
+        whether their last review was done for the same note hash, score
+        and model, i.e. nothing changed since.
+        """
+        rows = self.connection().execute(
+            """
+            SELECT n.slug, n.title, n.content_hash, n.passes, n.quality_score, n.reason,
+                   r.review_file,
+                   (r.status = 'done'
+                    AND r.content_hash IS n.content_hash
+                    AND r.score IS n.quality_score
+                    AND r.model IS ?) AS current
+            FROM notes AS n LEFT JOIN reviews AS r ON r.title = n.title
+            WHERE n.kind = 'snippet' AND n.retry_needed = 0
+              AND (n.passes = 0 OR n.quality_score <= ?)
+            ORDER BY COALESCE(n.quality_score, 0), n.title
+            """,
+            (model, threshold)
+        ).fetchall()
+        return [dict(row, **_verdict(row), current=bool(row['current'])) for row in rows]
+
+
+# One store per database path per process
+_STORES: Dict[Path, ContentStore] = {}
+
+
+def get_content_store(path: Path = STORE_PATH) -> ContentStore:
+    """Return the shared store for a database path."""
+    store = _STORES.get(path)
+    if store is None:
+        store = _STORES[path] = ContentStore(path)
+    return store
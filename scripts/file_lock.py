@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+File Locks
+
+Advisory inter-process locks around files that several packager workers
+(or a packager and a reviewer run) may update at the same time, such as
+the daily AI check log. Uses fcntl.flock on a sidecar "<name>.lock" file;
+on platforms without fcntl the lock only serialises threads.
+"""
+
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# flock is per open file description, so threads also need a process-local lock
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(key: str) -> threading.Lock:
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(key, threading.Lock())
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock for `path` (via `path`.lock) for the duration of the block."""
+    lock_path = path.with_name(f'{path.name}.lock')
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with _thread_lock(str(lock_path)):
+        with open(lock_path, 'a') as handle:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
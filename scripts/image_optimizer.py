@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Image Optimizer
+
+Optional packaging stage that downsizes vault images to a maximum width and
+re-encodes them (WebP by default, or AVIF / optimised PNG) without their
+metadata, so gatsby-plugin-sharp has less to chew through on a cold build.
+
+Results are cached in scripts/.cache/optimized/ by source hash and
+settings, so each image is only processed once. Uncached images are
+processed in a process pool. Needs Pillow; without it (or for formats it
+cannot handle, such as SVG and animated GIFs) the original image is used.
+So is it when re-encoding doesn't make the image smaller; those images and
+ones that fail to decode are cached too (as an empty .original marker), so
+they aren't retried on every run.
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+# Default cache location
+CACHE_DIR = Path(__file__).parent / '.cache' / 'optimized'
+
+# Defaults for the packager's --optimize-images
+DEFAULT_FORMAT = 'webp'
+DEFAULT_MAX_WIDTH = 1600
+DEFAULT_QUALITY = 82
+
+# Output format -> (Pillow format name, file extension)
+FORMATS = {
+    'webp': ('WEBP', '.webp'),
+    'avif': ('AVIF', '.avif'),
+    'png': ('PNG', '.png'),
+}
+
+# Inputs left alone: vector images and (possibly animated) GIFs
+SKIP_EXTENSIONS = {'.svg', '.gif'}
+
+# Bump when the processing below changes, to invalidate cached outputs
+OPTIMIZER_VERSION = 2
+
+
+def pillow_available() -> bool:
+    """Whether Pillow can be imported."""
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ImageOptimizer:
+    """Resizes and re-encodes images, caching outputs by source hash and settings."""
+
+    def __init__(
+        self,
+        fmt: str = DEFAULT_FORMAT,
+        max_width: int = DEFAULT_MAX_WIDTH,
+        quality: int = DEFAULT_QUALITY,
+        cache_dir: Path = CACHE_DIR,
+        processes: Optional[int] = None
+    ):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported image format: {fmt}")
+        self.fmt = fmt
+        self.max_width = max_width
+        self.quality = quality
+        self.cache_dir = cache_dir
+        self.processes = processes
+        settings = json.dumps([OPTIMIZER_VERSION, fmt, max_width, quality])
+        self.settings_key = hashlib.sha256(settings.encode('utf-8')).hexdigest()[:12]
+
+    def output_name(self, name: str) -> str:
+        """Published filename for an optimised image."""
+        return Path(name).stem + FORMATS[self.fmt][1]
+
+    def cache_path(self, sha: str) -> Path:
+        return self.cache_dir / f'{sha}-{self.settings_key}{FORMATS[self.fmt][1]}'
+
+    def original_marker(self, sha: str) -> Path:
+        """Marks an image to publish as-is (failed, or not made smaller)."""
+        return self.cache_dir / f'{sha}-{self.settings_key}.original'
+
+    def optimize_all(self, images: List[Tuple[Path, str]]) -> Dict[str, Optional[Path]]:
+        """
+        Optimise (source path, source sha256) pairs.
+        Returns sha -> optimised file, or None where the original should be used.
+        """
+        results: Dict[str, Optional[Path]] = {}
+        pending: Dict[str, Path] = {}
+        for src, sha in images:
+            if src.suffix.lower() in SKIP_EXTENSIONS or self.original_marker(sha).exists():
+                results[sha] = None
+            elif self.cache_path(sha).exists():
+                results[sha] = self.cache_path(sha)
+            else:
+                pending[sha] = src
+
+        if pending:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            jobs = [(str(src), str(self.cache_path(sha)), self.fmt, self.max_width, self.quality)
+                    for sha, src in pending.items()]
+            if len(jobs) == 1 or self.processes == 1:
+                outputs = [_optimize_one(*job) for job in jobs]
+            else:
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers=self.processes) as pool:
+                    outputs = list(pool.map(_optimize_one, *zip(*jobs)))
+            for sha, output in zip(pending, outputs):
+                results[sha] = Path(output) if output else None
+                if output is None:
+                    self.original_marker(sha).touch()
+        return results
+
+
+def _optimize_one(src: str, dest: str, fmt: str, max_width: int, quality: int) -> Optional[str]:
+    """
+    Worker: resize and re-encode one image to dest.
+    Returns dest, or None if the image should be published as-is (it can't
+    be processed, or the output would be no smaller than the source).
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(src) as image:
+            if getattr(image, 'is_animated', False):
+                return None
+            # Rotate by the EXIF orientation first: the EXIF is dropped below
+            image = ImageOps.exif_transpose(image)
+            if image.width > max_width:
+                height = max(1, round(image.height * max_width / image.width))
+                image = image.resize((max_width, height), Image.LANCZOS)
+            if fmt != 'png' and image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+            pil_format = FORMATS[fmt][0]
+            options: Dict[str, Any] = {'optimize': True} if fmt == 'png' else {'quality': quality}
+            if fmt == 'webp':
+                options['method'] = 6
+
+            # Drop EXIF, ICC profiles and text chunks (only transparency is image data)
+            image.info = {key: value for key, value in image.info.items() if key == 'transparency'}
+            tmp_path = f'{dest}.{os.getpid()}.tmp'
+            image.save(tmp_path, pil_format, **options)
+    except (OSError, ValueError, KeyError):
+        Path(f'{dest}.{os.getpid()}.tmp').unlink(missing_ok=True)
+        return None
+
+    if os.path.getsize(tmp_path) >= os.path.getsize(src):
+        Path(tmp_path).unlink()
+        return None
+    os.replace(tmp_path, dest)
+    return dest
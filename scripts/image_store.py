@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Image Store
+
+Content-addressed store for images published into content/. Each distinct
+image is kept once as scripts/.cache/images/<sha256><ext>, and every post
+that uses it gets a hardlink to that object instead of its own copy. An
+image shared by ten posts therefore takes the disk space of one, and
+re-publishing an unchanged image costs a stat instead of a copy.
+
+Publishing falls back to a reflink (copy-on-write clone, on filesystems
+that support FICLONE) and then to a plain copy when hardlinks are not
+possible, e.g. when content/ is on a different filesystem. Set
+IMAGE_PUBLISH_MODE=copy to always copy.
+
+Destinations are replaced atomically and never written in place, so a
+hardlinked object is never modified through a post directory (also in
+copy mode, where dest may still be a link from an earlier run).
+
+prune() removes the objects no published image refers to any more (the
+caller passes the hashes still in use, e.g. from the build manifest).
+"""
+
+import os
+import shutil
+from pathlib import Path
+from typing import Iterable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Default store location (inside the repo, so on the same filesystem as content/)
+STORE_DIR = Path(__file__).parent / '.cache' / 'images'
+
+# "link" (hardlink, then reflink, then copy) or "copy"
+PUBLISH_MODE = os.getenv('IMAGE_PUBLISH_MODE', 'link')
+
+# ioctl request for a copy-on-write clone (Linux btrfs/XFS/overlayfs)
+FICLONE = 0x40049409
+
+
+def _reflink(src: Path, dest: Path) -> bool:
+    """Clone src to dest with FICLONE. Returns False where unsupported."""
+    if fcntl is None or not hasattr(fcntl, 'ioctl'):
+        return False
+    try:
+        with open(src, 'rb') as s, open(dest, 'wb') as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return True
+    except OSError:
+        dest.unlink(missing_ok=True)
+        return False
+
+
+class ImageStore:
+    """Directory of images named by content hash."""
+
+    def __init__(self, root: Path = STORE_DIR, mode: str = PUBLISH_MODE):
+        self.root = root
+        self.mode = mode
+
+    def object_path(self, sha: str, name: str) -> Path:
+        """Store path for an image with this hash (the extension is kept for tools)."""
+        return self.root / f'{sha}{Path(name).suffix.lower()}'
+
+    def add(self, src: Path, sha: str) -> Path:
+        """Copy src into the store unless an object with its hash is already there."""
+        obj = self.object_path(sha, src.name)
+        if not obj.exists():
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp_path = obj.with_name(f'{obj.name}.{os.getpid()}.tmp')
+            shutil.copy2(src, tmp_path)
+            os.replace(tmp_path, obj)
+        return obj
+
+    def publish(self, src: Path, sha: str, dest: Path) -> Optional[str]:
+        """
+        Make dest hold the image src (whose hash is sha).
+        Returns how it was published ("linked", "reflinked" or "copied"),
+        or None if dest already was that store object.
+        """
+        tmp_path = dest.with_name(f'.{dest.name}.{os.getpid()}.tmp')
+        tmp_path.unlink(missing_ok=True)
+
+        if self.mode == 'copy':
+            shutil.copy2(src, tmp_path)
+            os.replace(tmp_path, dest)
+            return 'copied'
+
+        obj = self.add(src, sha)
+        try:
+            if os.path.samefile(obj, dest):
+                return None
+        except OSError:
+            pass
+
+        try:
+            os.link(obj, tmp_path)
+            method = 'linked'
+        except OSError:
+            if _reflink(obj, tmp_path):
+                method = 'reflinked'
+            else:
+                shutil.copy2(obj, tmp_path)
+                method = 'copied'
+        os.replace(tmp_path, dest)
+        return method
+
+    def prune(self, referenced: Iterable[str]) -> int:
+        """
+        Remove objects whose hash is not in referenced (the hashes of every
+        published image). Objects are kept however they were published, so
+        ones that were reflinked or copied aren't re-added on every run.
+        Returns the number of objects removed.
+        """
+        if not self.root.exists():
+            return 0
+        referenced = set(referenced)
+        removed = 0
+        for obj in self.root.iterdir():
+            if obj.name.endswith('.tmp') or obj.name.split('.', 1)[0] in referenced:
+                continue
+            try:
+                if obj.is_file():
+                    obj.unlink()
+                    removed += 1
+            except OSError:
+                continue
+        return removed
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Instrumentation
+
+Lightweight spans and counters for the packager, so a slow run can be
+broken down into vault lookups, API latency, conversion and file I/O.
+
+    from instrumentation import metrics, span, timed
+
+    @timed('convert_to_mdx')
+    def convert_to_mdx(...): ...
+
+    with span('write_file', path=str(path)):
+        path.write_text(text)
+    metrics.count('bytes_written', len(data))
+
+Every span adds to per-name totals (calls, wall time, max). Individual
+span events are only kept while record_events is on, for export as a
+Chrome trace (load the file in chrome://tracing or ui.perfetto.dev).
+Spans nest, so a parent's time includes its children's.
+"""
+
+import os
+import json
+import time
+import threading
+import functools
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Dict, Any, List, Iterator, Callable
+
+
+class Instrumentation:
+    """Thread-safe span totals, counters and (optionally) span events."""
+
+    def __init__(self, record_events: bool = False):
+        self.record_events = record_events
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget everything recorded so far."""
+        with self._lock:
+            self.spans: Dict[str, Dict[str, float]] = {}
+            self.counters: Dict[str, float] = {}
+            self.events: List[Dict[str, Any]] = []
+            self.started = time.perf_counter()
+            # perf_counter -> wall-clock offset, so events from several processes line up
+            self._epoch = time.time() - self.started
+
+    @contextmanager
+    def span(self, name: str, **args: Any) -> Iterator[None]:
+        """Time the enclosed block under `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add_span(name, start, time.perf_counter() - start, args)
+
+    def timed(self, name: str) -> Callable:
+        """Decorator form of span()."""
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name: str, value: float = 1) -> None:
+        """Add value to a counter (bytes read, tokens used, ...)."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def _add_span(self, name: str, start: float, duration: float, args: Dict[str, Any]) -> None:
+        with self._lock:
+            stats = self.spans.setdefault(name, {'calls': 0, 'total': 0.0, 'max': 0.0})
+            stats['calls'] += 1
+            stats['total'] += duration
+            stats['max'] = max(stats['max'], duration)
+            if self.record_events:
+                self.events.append({
+                    'name': name,
+                    'ph': 'X',
+                    'ts': round((self._epoch + start) * 1e6),
+                    'dur': round(duration * 1e6),
+                    'pid': os.getpid(),
+                    'tid': threading.get_ident(),
+                    'args': {key: str(value) for key, value in args.items()},
+                })
+
+    # --------------------------------------------------------
+    # Combining and exporting
+    # --------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Everything recorded so far, as plain data (e.g. to return from a worker process)."""
+        with self._lock:
+            return {
+                'spans': {name: dict(stats) for name, stats in self.spans.items()},
+                'counters': dict(self.counters),
+                'events': list(self.events),
+            }
+
+    def merge(self, snapshot: Dict[str, Any]) -> None:
+        """Add a snapshot taken in another process."""
+        with self._lock:
+            for name, other in snapshot['spans'].items():
+                stats = self.spans.setdefault(name, {'calls': 0, 'total': 0.0, 'max': 0.0})
+                stats['calls'] += other['calls']
+                stats['total'] += other['total']
+                stats['max'] = max(stats['max'], other['max'])
+            for name, value in snapshot['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            if self.record_events:
+                self.events.extend(snapshot['events'])
+
+    def summary(self) -> str:
+        """Table of span totals (slowest first) and counters."""
+        elapsed = time.perf_counter() - self.started
+        lines = [
+            f"{'Span':<24}{'calls':>8}{'total s':>10}{'avg ms':>10}{'max ms':>10}",
+            "-" * 62,
+        ]
+        for name, stats in sorted(self.spans.items(), key=lambda item: -item[1]['total']):
+            lines.append(
+                f"{name:<24}{stats['calls']:>8}{stats['total']:>10.3f}"
+                f"{stats['total'] * 1000 / stats['calls']:>10.2f}{stats['max'] * 1000:>10.2f}"
+            )
+        lines.append(f"{'(wall clock)':<24}{'':>8}{elapsed:>10.3f}")
+        if self.counters:
+            lines.append("")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"{name:<32}{value:>14,.0f}")
+        return '\n'.join(lines)
+
+    def export_json(self, path: Path) -> None:
+        """Write span totals and counters as JSON."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = self.snapshot()
+        data.pop('events')
+        data['wall_seconds'] = time.perf_counter() - self.started
+        path.write_text(json.dumps(data, indent=2), encoding='utf-8')
+
+    def export_chrome_trace(self, path: Path) -> None:
+        """Write recorded span events in the Chrome trace event format."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            events = sorted(self.events, key=lambda event: event['ts'])
+        path.write_text(json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'}), encoding='utf-8')
+
+
+# Shared instance used by the packager scripts
+metrics = Instrumentation()
+span = metrics.span
+timed = metrics.timed
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Link Graph
+
+Vault-wide index of wiki-links, built at packaging time so gatsby-node.js
+can read the graph instead of re-scanning every MDX file on each build.
+
+The working copy (scripts/.cache/link_graph_{vault hash}.json) keeps the
+raw link targets of every note in the vault index together with the note's
+size and mtime, so refresh() only re-reads notes that changed. build()
+derives the compact form Gatsby reads and write_export() saves it to
+content/link-graph.json. The export sits in the published content, so it
+only covers published notes (posts and snippets with a public page):
+links to anything else are left out, as if the note didn't exist. Links a
+page renders as plain text are left out too: snippets packaged at the
+default --depth 1 flatten all of their links (see build()'s page_links).
+
+    {
+      "version": 1,
+      "notes": {
+        "Post": {"slug": "post", "links": ["Game Theory"], "unresolved": ["Missing"]},
+        "Game Theory": {"slug": "game-theory", "backlinks": ["Post"]}
+      },
+      "unresolved": {"Missing": ["Post"]},
+      "slugs": {"post": "Post", "game-theory": "Game Theory"}
+    }
+
+- links: outgoing links to published notes that the page renders as links,
+  as that note's title
+- backlinks: published notes linking to this one
+- unresolved: link targets with no note in the vault, and which published
+  notes link to them
+- slugs: packaged slug -> title (the same slugify() the packager uses)
+
+Empty lists are left out to keep the file small.
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Callable, Dict, Any, Iterable, List, Optional, Set
+
+# Where working copies live (one file per vault path)
+CACHE_DIR = Path(__file__).parent / '.cache'
+
+# Compact export read by gatsby-node.js
+EXPORT_PATH = Path(__file__).parent.parent / 'content' / 'link-graph.json'
+
+# Bump when either file's layout changes
+GRAPH_VERSION = 1
+
+
+class LinkGraph:
+    """
+    Outgoing wiki-links of every note in a vault, refreshed incrementally.
+
+    - notes: vault-relative path -> {'mtime': ns, 'size': bytes, 'links': [targets]}
+    """
+
+    def __init__(self, vault_path: str, cache_path: Optional[Path] = None):
+        self.vault_path = Path(vault_path)
+        if cache_path is None:
+            vault_hash = hashlib.sha1(str(self.vault_path).encode('utf-8')).hexdigest()[:12]
+            cache_path = CACHE_DIR / f'link_graph_{vault_hash}.json'
+        self.cache_path = cache_path
+        self.notes: Dict[str, Dict[str, Any]] = {}
+        self.reparsed = 0
+
+    @classmethod
+    def load(cls, vault_path: str, cache_path: Optional[Path] = None) -> 'LinkGraph':
+        """Load the working copy (if any); call refresh() to bring it up to date."""
+        graph = cls(vault_path, cache_path)
+        try:
+            data = json.loads(graph.cache_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return graph
+        if data.get('version') == GRAPH_VERSION and data.get('vault_path') == str(graph.vault_path):
+            graph.notes = data.get('notes', {})
+        return graph
+
+    def refresh(self, documents: Iterable[Path], extract_links: Callable[[str], List[str]]) -> int:
+        """
+        Bring the graph up to date with documents (the vault index's notes),
+        re-reading only notes whose size or mtime changed and dropping notes
+        that are gone. extract_links returns a note's link targets.
+        Saves the working copy if anything changed; returns the number of
+        notes re-read.
+        """
+        self.reparsed = 0
+        notes: Dict[str, Dict[str, Any]] = {}
+        for path in documents:
+            try:
+                stat = os.stat(path)
+                rel_path = path.relative_to(self.vault_path).as_posix()
+            except (OSError, ValueError):
+                continue
+            entry = self.notes.get(rel_path)
+            if entry is None or entry['mtime'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+                try:
+                    text = path.read_text(encoding='utf-8')
+                except (OSError, UnicodeDecodeError):
+                    continue
+                entry = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'links': extract_links(text)}
+                self.reparsed += 1
+            notes[rel_path] = entry
+
+        if self.reparsed or notes.keys() != self.notes.keys():
+            self.notes = notes
+            self.save()
+        return self.reparsed
+
+    def build(
+        self,
+        resolve: Callable[[str], Optional[Path]],
+        slugify: Callable[[str], str],
+        published: Optional[Set[str]] = None,
+        page_links: Optional[Dict[str, Set[str]]] = None
+    ) -> Dict[str, Any]:
+        """
+        The export: forward links, backlinks, unresolved targets and slugs.
+        resolve maps a link target to a note path (e.g. find_document);
+        only notes whose slug is in published are exported (None: every note).
+        page_links maps a slug to the link targets its page renders as links,
+        for pages that don't render all of them; other notes keep every link.
+        """
+        def is_published(title: str) -> bool:
+            return published is None or slugify(title) in published
+
+        notes: Dict[str, Dict[str, Any]] = {}
+        unresolved: Dict[str, List[str]] = {}
+        backlinks: Dict[str, List[str]] = {}
+
+        for rel_path in sorted(self.notes):
+            title = Path(rel_path).stem
+            if not is_published(title):
+                continue
+            rendered = (page_links or {}).get(slugify(title))
+            links: List[str] = []
+            missing: List[str] = []
+            for target in self.notes[rel_path]['links']:
+                path = resolve(target)
+                if path is None:
+                    if target not in missing:
+                        missing.append(target)
+                        unresolved.setdefault(target, []).append(title)
+                elif rendered is not None and target not in rendered:
+                    continue
+                elif is_published(path.stem) and path.stem not in links:
+                    links.append(path.stem)
+                    backlinks.setdefault(path.stem, []).append(title)
+            note: Dict[str, Any] = {'slug': slugify(title)}
+            if links:
+                note['links'] = links
+            if missing:
+                note['unresolved'] = missing
+            notes[title] = note
+
+        for title, sources in backlinks.items():
+            if title in notes:
+                notes[title]['backlinks'] = sources
+
+        return {
+            'version': GRAPH_VERSION,
+            'notes': notes,
+            'unresolved': unresolved,
+            'slugs': {note['slug']: title for title, note in notes.items()},
+        }
+
+    def save(self) -> None:
+        """Write the working copy atomically."""
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            'version': GRAPH_VERSION,
+            'vault_path': str(self.vault_path),
+            'notes': self.notes,
+        }
+        tmp_path = self.cache_path.with_name(f'{self.cache_path.name}.{os.getpid()}.tmp')
+        tmp_path.write_text(json.dumps(data), encoding='utf-8')
+        os.replace(tmp_path, self.cache_path)
+
+
+def write_export(graph: Dict[str, Any], path: Path = EXPORT_PATH) -> bool:
+    """
+    Write the export atomically, unless the file already holds the same graph
+    (so Gatsby's file watcher isn't triggered for nothing).
+    Returns whether the file was written.
+    """
+    text = json.dumps(graph, ensure_ascii=False, separators=(',', ':'))
+    try:
+        if path.read_text(encoding='utf-8') == text:
+            return False
+    except OSError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    tmp_path.write_text(text, encoding='utf-8')
+    os.replace(tmp_path, path)
+    return True
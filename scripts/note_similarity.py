@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Note Similarity
+
+Embeds snippet bodies as vectors to find, for each snippet, the snippets
+most like it (written into its frontmatter as `related`) and pairs similar
+enough to be near-duplicates (e.g. p-value / e-value), flagged so one can
+be merged or hidden before publishing.
+
+Embeddings come from a local CPU model when sentence-transformers is
+installed (SIMILARITY_MODEL, default all-MiniLM-L6-v2), otherwise from
+hashed TF-IDF: word counts hashed into TFIDF_DIM buckets, weighted by
+inverse document frequency over the current snippets. Either way nothing
+leaves the machine. SIMILARITY_BACKEND=model|tfidf picks one explicitly.
+
+Vectors are cached by content hash in a NumPy memmap
+(scripts/.cache/note_vectors/{backend}/vectors.f32, with index.json
+mapping hashes to rows), so only new or changed snippets are embedded.
+Neighbours are found with batched matrix products over the normalised
+vectors.
+
+The results (related lists and duplicate pairs) are saved to
+scripts/.cache/note_vectors/related.json, which the packager reads
+without NumPy: snippets rebuilt later keep their related list, and
+package_post flags duplicates among a post's linked snippets.
+
+NumPy is optional; without it, update() is skipped and the last saved
+results are used.
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from search_index import tokenize
+
+# Where vectors and results live
+VECTORS_DIR = Path(__file__).parent / '.cache' / 'note_vectors'
+RESULTS_PATH = VECTORS_DIR / 'related.json'
+
+# Bump when the stored layout or the TF-IDF features change
+VECTORS_VERSION = 1
+
+SIMILARITY_BACKEND = os.getenv('SIMILARITY_BACKEND', 'auto')
+SIMILARITY_MODEL = os.getenv('SIMILARITY_MODEL', 'all-MiniLM-L6-v2')
+
+# Hashed TF-IDF dimensions
+TFIDF_DIM = 2048
+
+# Related snippets listed per snippet, and the least similarity worth listing
+RELATED_COUNT = int(os.getenv('RELATED_COUNT', '5'))
+RELATED_MIN_SIMILARITY = float(os.getenv('RELATED_MIN_SIMILARITY', '0.2'))
+
+# Cosine similarity above which two snippets are flagged as near-duplicates
+DUPLICATE_SIMILARITY = float(os.getenv('DUPLICATE_SIMILARITY', '0.85'))
+
+# Rows compared per matrix product (bounds memory at batch x snippets)
+SIMILARITY_BATCH = 1024
+
+
+def numpy_available() -> bool:
+    """Whether NumPy can be imported."""
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# ============================================================
+# Embedding Backends
+# ============================================================
+
+class TfidfEmbedder:
+    """Hashed, sublinear term counts; idf is applied in normalise() over the snippets compared."""
+
+    name = f'tfidf-{TFIDF_DIM}'
+    dim = TFIDF_DIM
+
+    def embed(self, texts: Sequence[str]) -> Any:
+        import numpy as np
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term in tokenize(text):
+                bucket = int.from_bytes(hashlib.blake2b(term.encode('utf-8'), digest_size=4).digest(), 'little')
+                vectors[row, bucket % self.dim] += 1
+        np.log1p(vectors, out=vectors)
+        return vectors
+
+    def normalise(self, vectors: Any) -> Any:
+        import numpy as np
+        df = np.count_nonzero(vectors, axis=0)
+        idf = np.log((1 + len(vectors)) / (1 + df)).astype(np.float32) + 1
+        return _unit_rows(vectors * idf)
+
+
+class ModelEmbedder:
+    """A sentence-transformers model run on the CPU."""
+
+    def __init__(self, model_name: str = SIMILARITY_MODEL):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device='cpu')
+        self.name = 'model-' + model_name.replace('/', '_')
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: Sequence[str]) -> Any:
+        import numpy as np
+        return np.asarray(self.model.encode(list(texts), batch_size=32), dtype=np.float32)
+
+    def normalise(self, vectors: Any) -> Any:
+        return _unit_rows(vectors)
+
+
+def _unit_rows(vectors: Any) -> Any:
+    import numpy as np
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def get_embedder(backend: str = SIMILARITY_BACKEND) -> Any:
+    """The embedder for backend ('model', 'tfidf' or 'auto': the model if installed)."""
+    if backend in ('auto', 'model'):
+        try:
+            return ModelEmbedder()
+        except ImportError:
+            if backend == 'model':
+                raise
+        except Exception as e:  # e.g. the model can't be downloaded
+            if backend == 'model':
+                raise
+            print(f"  ⚠️  Could not load {SIMILARITY_MODEL} ({e}); using TF-IDF")
+    return TfidfEmbedder()
+
+
+# ============================================================
+# Vector Cache
+# ============================================================
+
+class VectorStore:
+    """
+    Embeddings by content hash, in a float32 memmap that grows as needed.
+
+    - rows: content hash -> row in vectors.f32
+    """
+
+    def __init__(self, directory: Path, dim: int):
+        self.directory = directory
+        self.dim = dim
+        self.index_path = directory / 'index.json'
+        self.data_path = directory / 'vectors.f32'
+        self.rows: Dict[str, int] = {}
+
+    @classmethod
+    def load(cls, directory: Path, dim: int) -> 'VectorStore':
+        store = cls(directory, dim)
+        try:
+            data = json.loads(store.index_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return store
+        if data.get('version') == VECTORS_VERSION and data.get('dim') == dim and store.data_path.exists():
+            store.rows = data.get('rows', {})
+        return store
+
+    def _open(self, rows: int, mode: str = 'r+') -> Any:
+        import numpy as np
+        return np.memmap(self.data_path, dtype=np.float32, mode=mode, shape=(rows, self.dim))
+
+    def add(self, hashes: Sequence[str], vectors: Any) -> None:
+        """Append vectors for new hashes and save."""
+        if not hashes:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        start = len(self.rows)
+        with open(self.data_path, 'ab') as f:
+            f.truncate((start + len(hashes)) * self.dim * 4)
+        data = self._open(start + len(hashes))
+        data[start:] = vectors
+        data.flush()
+        del data
+        for offset, content_hash in enumerate(hashes):
+            self.rows[content_hash] = start + offset
+        self.save()
+
+    def get(self, hashes: Sequence[str]) -> Any:
+        """Vectors for hashes (all must be stored), as an in-memory array."""
+        import numpy as np
+        if not hashes:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        data = self._open(len(self.rows), 'r')
+        return np.array(data[[self.rows[h] for h in hashes]])
+
+    def compact(self, keep: Sequence[str]) -> None:
+        """Drop vectors of notes no longer compared, once they are most of the file."""
+        if len(self.rows) <= 2 * len(keep) + 64:
+            return
+        vectors = self.get(keep)
+        self.rows = {}
+        self.data_path.unlink()
+        self.add(list(keep), vectors)
+
+    def save(self) -> None:
+        """Write the row index atomically (after the vectors it points at)."""
+        data = {'version': VECTORS_VERSION, 'dim': self.dim, 'rows': self.rows}
+        tmp_path = self.index_path.with_name(f'{self.index_path.name}.{os.getpid()}.tmp')
+        tmp_path.write_text(json.dumps(data), encoding='utf-8')
+        os.replace(tmp_path, self.index_path)
+
+
+# ============================================================
+# Neighbours
+# ============================================================
+
+def nearest_neighbours(vectors: Any, k: int, batch_size: int = SIMILARITY_BATCH) -> Tuple[Any, Any]:
+    """
+    (indices, similarities) of each row's k most similar other rows, most
+    similar first, for unit-length rows. Compares batch_size rows at a time.
+    """
+    import numpy as np
+    n = len(vectors)
+    k = min(k, n - 1)
+    indices = np.zeros((n, max(k, 0)), dtype=np.int64)
+    similarities = np.zeros((n, max(k, 0)), dtype=np.float32)
+    if k <= 0:
+        return indices, similarities
+
+    for start in range(0, n, batch_size):
+        block = vectors[start:start + batch_size] @ vectors.T
+        rows = np.arange(len(block))
+        block[rows, start + rows] = -np.inf
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_similarities = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_similarities, axis=1)
+        indices[start:start + len(block)] = np.take_along_axis(top, order, axis=1)
+        similarities[start:start + len(block)] = np.take_along_axis(top_similarities, order, axis=1)
+    return indices, similarities
+
+
+def update(
+    snippets: Dict[str, Dict[str, Any]],
+    published: Optional[set] = None,
+    backend: str = SIMILARITY_BACKEND
+) -> Dict[str, Any]:
+    """
+    Embed new or changed snippets and recompute neighbours.
+    snippets: slug -> {'title', 'text', 'hash'}; only slugs in published
+    (default: all) are suggested as related. Saves and returns the results:
+
+    - related: slug -> [[slug, title, similarity], ...]
+    - duplicates: [[slug, slug, similarity], ...], most similar first
+    - embedded: number of snippets embedded this run
+    """
+    embedder = get_embedder(backend)
+    store = VectorStore.load(VECTORS_DIR / embedder.name, embedder.dim)
+
+    slugs = sorted(snippets)
+    hashes = [snippets[slug]['hash'] for slug in slugs]
+    missing = sorted({h: slug for h, slug in zip(hashes, slugs) if h not in store.rows}.items())
+    if missing:
+        store.add([h for h, _ in missing], embedder.embed([snippets[slug]['text'] for _, slug in missing]))
+    store.compact(hashes)
+
+    vectors = embedder.normalise(store.get(hashes))
+    indices, similarities = nearest_neighbours(vectors, RELATED_COUNT + 8)
+
+    published = set(slugs) if published is None else published
+    related: Dict[str, List[Any]] = {}
+    duplicates: List[Any] = []
+    for row, slug in enumerate(slugs):
+        entries = []
+        for other, similarity in zip(indices[row].tolist(), similarities[row].tolist()):
+            other_slug = slugs[other]
+            if similarity >= DUPLICATE_SIMILARITY and slug < other_slug:
+                duplicates.append([slug, other_slug, round(similarity, 3)])
+            if (other_slug in published and similarity >= RELATED_MIN_SIMILARITY
+                    and len(entries) < RELATED_COUNT):
+                entries.append([other_slug, snippets[other_slug]['title'], round(similarity, 3)])
+        if entries:
+            related[slug] = entries
+    duplicates.sort(key=lambda pair: -pair[2])
+
+    results = {
+        'version': VECTORS_VERSION,
+        'backend': embedder.name,
+        'related': related,
+        'duplicates': duplicates,
+    }
+    save_results(results)
+    return {**results, 'embedded': len(missing)}
+
+
+# ============================================================
+# Saved Results
+# ============================================================
+
+_results: Optional[Dict[str, Any]] = None
+
+
+def load_results() -> Dict[str, Any]:
+    """The last saved results (empty if there are none), read once per process."""
+    global _results
+    if _results is None:
+        try:
+            _results = json.loads(RESULTS_PATH.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            _results = {}
+    return _results
+
+
+def save_results(results: Dict[str, Any]) -> None:
+    global _results
+    RESULTS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = RESULTS_PATH.with_name(f'{RESULTS_PATH.name}.{os.getpid()}.tmp')
+    tmp_path.write_text(json.dumps(results, ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp_path, RESULTS_PATH)
+    _results = results
+
+
+def related_snippets(slug: str) -> List[Dict[str, str]]:
+    """Saved related list for a snippet, as [{'title', 'slug'}]."""
+    return [{'title': title, 'slug': other} for other, title, _ in load_results().get('related', {}).get(slug, [])]
+
+
+def duplicates_among(slugs: Sequence[str]) -> List[Tuple[str, str, float]]:
+    """Saved near-duplicate pairs involving any of slugs."""
+    wanted = set(slugs)
+    return [tuple(pair) for pair in load_results().get('duplicates', []) if pair[0] in wanted or pair[1] in wanted]
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+OpenAI Client
+
+One OpenAI client per process, shared by every quality check and review
+instead of constructing a new client for each request. A client owns an
+HTTP connection pool, so sharing it lets requests reuse keep-alive
+connections (and their TLS sessions) to the API.
+
+openai is a slow import, so it only happens when the first client is
+created; runs that never reach the API don't pay for it.
+"""
+
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+_lock = threading.Lock()
+
+# (pid, api_key, max_retries) -> client. Keyed by pid so forked worker
+# processes build their own client rather than sharing the parent's connections.
+_clients: Dict[Tuple[int, str, Optional[int]], Any] = {}
+
+
+def get_openai_client(api_key: str, max_retries: Optional[int] = None) -> Any:
+    """
+    The shared openai.OpenAI client for api_key, created on first use.
+    With max_retries, a variant with its own retry count that still shares
+    the base client's connection pool (max_retries=0 for callers that
+    schedule retries themselves).
+    """
+    pid = os.getpid()
+    client = _clients.get((pid, api_key, max_retries))
+    if client is None:
+        with _lock:
+            base = _clients.get((pid, api_key, None))
+            if base is None:
+                import openai
+                base = _clients[(pid, api_key, None)] = openai.OpenAI(api_key=api_key)
+            client = _clients.get((pid, api_key, max_retries))
+            if client is None:
+                client = _clients[(pid, api_key, max_retries)] = base.with_options(max_retries=max_retries)
+    return client
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+OpenAI Stub Server
+
+A tiny local stand-in for the parts of the OpenAI API the scripts use, so
+batch scoring and quality checks can be exercised without a real key or
+network access:
+
+- POST /v1/chat/completions
+- POST /v1/files               (multipart upload, purpose=batch)
+- GET  /v1/files/{id}/content
+- POST /v1/batches
+- GET  /v1/batches/{id}
+
+Verdicts are deterministic: the score grows with the note's word count.
+Batches report "in_progress" on the first poll and "completed" after that.
+With --throttle, that fraction of chat completions is answered with a 429
+and a Retry-After header instead, to exercise retries and backoff.
+
+Usage:
+    python scripts/openai_stub_server.py [--port 8808] [--throttle 0.3] [--retry-after 1]
+
+    OPENAI_BASE_URL=http://127.0.0.1:8808/v1 OPENAI_API_KEY=stub \\
+        python scripts/batch_quality.py
+"""
+
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional, Tuple
+
+
+def stub_verdict(prompt: str) -> Dict[str, Any]:
+    """Deterministic verdict: longer notes score higher."""
+    match = re.search(r'Document Content:\n(.*?)\n\nReturn a JSON object', prompt, re.DOTALL)
+    words = len((match.group(1) if match else prompt).split())
+    score = max(1, min(10, 2 + words // 40))
+    return {
+        "appropriate": True,
+        "technically_sound": True,
+        "has_substance": score >= 6,
+        "not_ai_generated": True,
+        "quality_score": score,
+        "reason": f"Stub verdict for a {words}-word note"
+    }
+
+
+def chat_completion(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a chat.completion response for a request body."""
+    prompt = body['messages'][-1]['content']
+    content = json.dumps(stub_verdict(prompt))
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": f"chatcmpl-stub-{abs(hash(prompt)) % 10**8}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get('model', 'stub'),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+
+class StubState:
+    """In-memory files and batches."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.counter = 0
+        # Fraction of chat completions rejected with a 429 (seeded, so runs repeat)
+        self.throttle = 0.0
+        self.retry_after = 1.0
+        self.random = random.Random(0)
+
+    def throttled(self) -> bool:
+        with self.lock:
+            return self.random.random() < self.throttle
+
+    def next_id(self, prefix: str) -> str:
+        with self.lock:
+            self.counter += 1
+            return f"{prefix}-stub{self.counter}"
+
+    def add_file(self, filename: str, purpose: str, data: bytes) -> Dict[str, Any]:
+        file_id = self.next_id('file')
+        meta = {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(data),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed"
+        }
+        self.files[file_id] = {'meta': meta, 'data': data}
+        return meta
+
+    def run_batch(self, batch: Dict[str, Any]) -> None:
+        """Answer every request in the batch input file."""
+        lines = self.files[batch['input_file_id']]['data'].decode('utf-8').splitlines()
+        output = []
+        for line in lines:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            output.append(json.dumps({
+                "id": self.next_id('batch_req'),
+                "custom_id": request['custom_id'],
+                "response": {
+                    "status_code": 200,
+                    "request_id": self.next_id('req'),
+                    "body": chat_completion(request['body'])
+                },
+                "error": None
+            }))
+        out_meta = self.add_file('batch_output.jsonl', 'batch_output', ('\n'.join(output) + '\n').encode('utf-8'))
+        batch.update({
+            "status": "completed",
+            "output_file_id": out_meta['id'],
+            "completed_at": int(time.time()),
+            "request_counts": {"total": len(output), "completed": len(output), "failed": 0}
+        })
+
+
+STATE = StubState()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Routes the handful of endpoints listed in the module docstring."""
+
+    def log_message(self, format: str, *args: Any) -> None:
+        print(f"  [stub] {self.command} {self.path}")
+
+    def _send(self, status: int, payload: Any, raw: bool = False, headers: Optional[Dict[str, str]] = None) -> None:
+        data = payload if raw else json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/octet-stream' if raw else 'application/json')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def _multipart(self) -> Tuple[Dict[str, str], Tuple[str, bytes]]:
+        """Parse a multipart upload into (form fields, (filename, file bytes))."""
+        header = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode('utf-8')
+        message = BytesParser(policy=HTTP).parsebytes(header + self._body())
+        fields, upload = {}, ('upload', b'')
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            if part.get_filename():
+                upload = (part.get_filename(), part.get_payload(decode=True))
+            else:
+                fields[name] = part.get_payload(decode=True).decode('utf-8')
+        return fields, upload
+
+    def do_POST(self) -> None:
+        path = self.path.split('?')[0].rstrip('/')
+        if path.endswith('/chat/completions'):
+            body = json.loads(self._body())
+            if STATE.throttled():
+                self._send(429, {"error": {"message": "Rate limit reached (stub)", "type": "requests",
+                                           "code": "rate_limit_exceeded"}},
+                           headers={'Retry-After': f'{STATE.retry_after:g}'})
+                return
+            self._send(200, chat_completion(body))
+        elif path.endswith('/files'):
+            fields, (filename, data) = self._multipart()
+            self._send(200, STATE.add_file(filename, fields.get('purpose', 'batch'), data))
+        elif path.endswith('/batches'):
+            body = json.loads(self._body())
+            if body.get('input_file_id') not in STATE.files:
+                self._send(404, {"error": {"message": "input file not found"}})
+                return
+            batch = {
+                "id": STATE.next_id('batch'),
+                "object": "batch",
+                "endpoint": body['endpoint'],
+                "input_file_id": body['input_file_id'],
+                "completion_window": body.get('completion_window', '24h'),
+                "status": "validating",
+                "created_at": int(time.time()),
+                "metadata": body.get('metadata'),
+                "request_counts": {"total": 0, "completed": 0, "failed": 0}
+            }
+            STATE.batches[batch['id']] = batch
+            self._send(200, batch)
+        else:
+            self._send(404, {"error": {"message": f"unknown endpoint {path}"}})
+
+    def do_GET(self) -> None:
+        path = self.path.split('?')[0].rstrip('/')
+        match = re.search(r'/batches/([^/]+)$', path)
+        if match and match.group(1) in STATE.batches:
+            batch = STATE.batches[match.group(1)]
+            if batch['status'] == 'validating':
+                batch['status'] = 'in_progress'
+            elif batch['status'] == 'in_progress':
+                STATE.run_batch(batch)
+            self._send(200, batch)
+            return
+        match = re.search(r'/files/([^/]+)/content$', path)
+        if match and match.group(1) in STATE.files:
+            self._send(200, STATE.files[match.group(1)]['data'], raw=True)
+            return
+        self._send(404, {"error": {"message": f"unknown endpoint {path}"}})
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Serve a local stub of the OpenAI API.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8808)
+    parser.add_argument('--throttle', type=float, default=0.0,
+                        help="Fraction of chat completions answered with a 429 (0-1)")
+    parser.add_argument('--retry-after', type=float, default=1.0,
+                        help="Retry-After seconds sent with a 429 (default: 1)")
+    args = parser.parse_args()
+    STATE.throttle = args.throttle
+    STATE.retry_after = args.retry_after
+
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"OpenAI stub listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
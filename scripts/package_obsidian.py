@@ -8,24 +8,69 @@ This script imports Obsidian documents into the Gatsby blog, handling:
 - Linked pages as "snippets" with LLM quality filtering
 
 Usage:
-    python scripts/package_obsidian.py
+    python scripts/package_obsidian.py [--force] [--refresh-quality] [--jobs N] [--depth N]
+        [--optimize-images] [--related] [--watch]
+
+Outputs whose source note, images and converter version are unchanged since
+the last run (see build_manifest.py) are skipped; --force rebuilds everything.
+Quality verdicts are cached (see quality_cache.py); --refresh-quality
+re-checks every linked document against the API. --jobs N packages posts
+in N worker processes. --depth N also packages the notes linked from
+snippets, breadth-first up to N links away from a post. --optimize-images
+resizes and re-encodes images (see image_optimizer.py). --watch keeps running and repackages posts whenever
+a note or image they are built from changes in the vault.
+
+Every run also refreshes the vault's link graph (see link_graph.py) and
+exports its published part to content/link-graph.json for gatsby-node.js,
+and updates the
+site's search index in static/search/ (see search_index.py). --related
+also lists each snippet's most similar snippets in its frontmatter and
+flags near-duplicates (see note_similarity.py).
 
 Configure POSTS_TO_PACKAGE list below with the titles of documents to import.
 """
 
+import io
 import os
 import re
+import sys
 import json
+import time
 import shutil
+import argparse
+import threading
 import hashlib
 import unicodedata
+import contextlib
+from itertools import repeat
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Tuple, List, Dict, Any
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv(Path(__file__).parent / '.env')
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple, List, Dict, Any, Set, Iterable, Iterator, Sequence, IO
+
+from vault_index import get_vault_index, IMAGE_EXTENSIONS
+from build_manifest import BuildManifest, text_hash
+from quality_cache import QualityCache, cache_key
+from ai_check_log import append_entry, PER_CHECK_FILES
+from instrumentation import metrics, span, timed
+from image_store import ImageStore
+from image_optimizer import ImageOptimizer, pillow_available, FORMATS as IMAGE_FORMATS
+from snippet_metadata import SnippetMetadata, read_metadata
+from content_store import get_content_store
+from openai_client import get_openai_client
+from rate_limiter import RateLimiter, AdaptiveConcurrency, backoff_delay, retry_after_seconds
+from token_budget import count_tokens, split_into_chunks
+from quality_prefilter import prefilter_verdict, prefilter_settings
+from link_graph import LinkGraph, write_export as write_link_graph
+from search_index import SearchIndex, indexable_text, write_export as write_search_index
+import note_similarity
+from note_similarity import numpy_available, related_snippets, duplicates_among
+
+# Load environment variables (dotenv is only imported when there is a .env)
+ENV_FILE = Path(__file__).parent / '.env'
+if ENV_FILE.exists():
+    from dotenv import load_dotenv
+    load_dotenv(ENV_FILE)
 
 # Configuration
 OBSIDIAN_VAULT_PATH = os.getenv('OBSIDIAN_VAULT_PATH', '/Users/jinyoungkim/Documents/Obsidian Vault')
@@ -34,9 +79,27 @@ BLOG_ROOT = Path(__file__).parent.parent
 POSTS_DIR = BLOG_ROOT / 'content' / 'posts'
 SNIPPETS_DIR = BLOG_ROOT / 'content' / 'snippets'
 
+# Snippets left out of the site (read by gatsby-node.js too)
+HIDDEN_SNIPPETS_PATH = Path(__file__).parent / 'hidden_snippets.json'
+
 # Quality check thresholds
 MIN_QUALITY_SCORE = 6
 
+# Maximum number of linked documents quality-checked at the same time
+QUALITY_CHECK_CONCURRENCY = int(os.getenv('QUALITY_CHECK_CONCURRENCY', '8'))
+
+# Client-side OpenAI budget (0 = unlimited); --jobs splits it between processes
+OPENAI_REQUESTS_PER_MINUTE = float(os.getenv('OPENAI_REQUESTS_PER_MINUTE', '500'))
+OPENAI_TOKENS_PER_MINUTE = float(os.getenv('OPENAI_TOKENS_PER_MINUTE', '200000'))
+
+# Retries for throttled, timed-out or 5xx quality checks, and the per-request timeout
+QUALITY_CHECK_RETRIES = int(os.getenv('QUALITY_CHECK_RETRIES', '5'))
+QUALITY_REQUEST_TIMEOUT = float(os.getenv('QUALITY_REQUEST_TIMEOUT', '60'))
+
+# Bump whenever the MDX output format changes so the build manifest
+# regenerates every post and snippet on the next run
+CONVERTER_VERSION = 3
+
 # ============================================================
 # POSTS TO PACKAGE - Add your document titles here
 # ============================================================
@@ -52,17 +115,42 @@ LOGS_DIR = Path(__file__).parent / 'logs'
 # Wiki-Link and Image Parsing
 # ============================================================
 
+# Longest link target, link text, embed name or $$ span the patterns below
+# accept. A stray [[ or an unclosed $$ is literal text once this much text
+# follows it, so streaming conversion never has to hold more than this back
+MAX_TOKEN_CHARS = 256 * 1024
+_UP_TO_MAX = '{1,%d}' % MAX_TOKEN_CHARS
+
 # Pattern: [[Target]] or [[Target|Display]]
-WIKI_LINK_PATTERN = re.compile(r'\[\[([^\]|]+)(?:\|([^\]]+))?\]\]')
+WIKI_LINK_PATTERN = re.compile(r'\[\[([^\]|]' + _UP_TO_MAX + r')(?:\|([^\]]' + _UP_TO_MAX + r'))?\]\]')
 
 # Pattern for Obsidian image embeds: ![[image.png]]
-IMAGE_EMBED_PATTERN = re.compile(r'!\[\[([^\]]+)\]\]')
+IMAGE_EMBED_PATTERN = re.compile(r'!\[\[([^\]]' + _UP_TO_MAX + r')\]\]')
 
 # Pattern for hashtags in body text: #tag (not inside links or code)
 HASHTAG_PATTERN = re.compile(r'(?:^|\s)#([a-zA-Z][a-zA-Z0-9_-]*)', re.MULTILINE)
 
-# Image extensions
-IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.bmp'}
+# Lines of only hashtags at the very start of a body
+LEADING_HASHTAGS_PATTERN = re.compile(r'^(\s*#[a-zA-Z][a-zA-Z0-9_-]*\s*)+\n')
+
+# LaTeX: $$display$$ (can span lines) and $inline$ (single line, not part of $$)
+DISPLAY_MATH_PATTERN = re.compile(r'\$\$([\s\S]*?)\$\$')
+INLINE_MATH_PATTERN = re.compile(r'(?<!\$)\$(?!\$)([^\$\n]+?)(?<!\$)\$(?!\$)')
+
+# Image embed or wiki-link, as seen by convert_to_mdx. Links never span an
+# embed (embeds used to be rewritten in an earlier pass), hence the (?!!\[\[).
+_EMBED_OR_LINK = (
+    r'!\[\[(?P<embed>[^\]]' + _UP_TO_MAX + r')\]\]'
+    r'|\[\[(?P<target>(?:(?!!\[\[)[^\]|])' + _UP_TO_MAX + r')'
+    r'(?:\|(?P<display>(?:(?!!\[\[)[^\]])' + _UP_TO_MAX + r'))?\]\]'
+)
+EMBED_OR_LINK_PATTERN = re.compile(_EMBED_OR_LINK)
+
+# Math spans rewrite_body handles, found once links are masked (see body_tokens)
+MATH_TOKEN_PATTERN = re.compile(
+    r'\$\$(?P<display_math>[\s\S]{0,%d}?)\$\$' % MAX_TOKEN_CHARS
+    + r'|(?<!\$)\$(?!\$)(?P<inline_math>[^\$\n]+?)(?<!\$)\$(?!\$)'
+)
 
 # Tags to filter out (in addition to FILTERED_TAGS in gatsby-node.js)
 FILTERED_TAGS = {'personal', 'insights'}
@@ -121,34 +209,52 @@ def extract_body_hashtags(content: str) -> List[str]:
     return tags
 
 
+# Display date lines, tried in order: "Date: Written 20th Feb 2025" or
+# "Date: 2025-02-20" (anything until newline), then "Written: date" or "Written date"
+DISPLAY_DATE_PATTERNS = [
+    re.compile(r'Date:\s*(.+?)(?:\n|$)', re.IGNORECASE),
+    re.compile(r'Written:?\s*(.+?)(?:\n|$)', re.IGNORECASE),
+]
+
+# Trailing "Status: ..." after a display date
+DISPLAY_DATE_STATUS_PATTERN = re.compile(r'\s*Status:.*$')
+
+# Frontmatter of a generated MDX file, and the `related:` block within it
+MDX_FRONTMATTER_PATTERN = re.compile(r'\A---\n(.*?)\n---', re.DOTALL)
+RELATED_BLOCK_PATTERN = re.compile(r'^related:\n(?:[ \t]+.*\n)*', re.MULTILINE)
+
+
+def clean_display_date(date_str: str) -> Optional[str]:
+    """Tidy the text after a display date label; None if it doesn't look like a date."""
+    date_str = date_str.strip()
+    # Clean up common artifacts
+    date_str = DISPLAY_DATE_STATUS_PATTERN.sub('', date_str)  # Remove "Status: ..."
+    date_str = date_str.strip()
+    
+    # Skip if it looks like LaTeX or code (contains $, \, or other markers)
+    if '$' in date_str or '\\' in date_str or '[[' in date_str:
+        return None
+    
+    # Skip if too long (likely not a date)
+    if len(date_str) > 50:
+        return None
+    
+    if date_str and len(date_str) > 3:
+        return date_str
+    return None
+
+
 def extract_display_date(content: str) -> Optional[str]:
     """
     Extract a display date from content like 'Date: Written 20th Feb 2025'.
     Returns the custom date string if found, None otherwise.
     """
-    # Look for patterns like "Date: Written 20th Feb 2025" or "Date: 2025-02-20"
-    patterns = [
-        r'Date:\s*(.+?)(?:\n|$)',  # "Date: anything until newline"
-        r'Written:?\s*(.+?)(?:\n|$)',  # "Written: date" or "Written date"
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, content, re.IGNORECASE)
+    # Only the first match of each pattern is considered
+    for pattern in DISPLAY_DATE_PATTERNS:
+        match = pattern.search(content)
         if match:
-            date_str = match.group(1).strip()
-            # Clean up common artifacts
-            date_str = re.sub(r'\s*Status:.*$', '', date_str)  # Remove "Status: ..."
-            date_str = date_str.strip()
-            
-            # Skip if it looks like LaTeX or code (contains $, \, or other markers)
-            if '$' in date_str or '\\' in date_str or '[[' in date_str:
-                continue
-                
-            # Skip if too long (likely not a date)
-            if len(date_str) > 50:
-                continue
-                
-            if date_str and len(date_str) > 3:
+            date_str = clean_display_date(match.group(1))
+            if date_str:
                 return date_str
     
     return None
@@ -165,49 +271,40 @@ def extract_frontmatter(content: str) -> Tuple[Dict[str, Any], str]:
     if content.startswith('---'):
         parts = content.split('---', 2)
         if len(parts) >= 3:
-            import yaml
-            try:
-                frontmatter = yaml.safe_load(parts[1]) or {}
-            except:
-                pass
+            frontmatter = parse_frontmatter_yaml(parts[1])
             body = parts[2].strip()
     
     return frontmatter, body
 
 
+def parse_frontmatter_yaml(text: str) -> Dict[str, Any]:
+    """Parse the YAML between the frontmatter fences ({} if it isn't valid)."""
+    import yaml
+    try:
+        return yaml.safe_load(text) or {}
+    except:
+        return {}
+
+
 # ============================================================
 # Vault Search Functions
 # ============================================================
 
+@timed('find_document')
 def find_document(title: str, vault_path: str = OBSIDIAN_VAULT_PATH) -> Optional[Path]:
     """
-    Recursively search vault for a document by title.
-    Searches for {title}.md (case-insensitive)
+    Look up a document by title in the vault index.
+    Matches {title}.md (case-insensitive)
     """
-    vault = Path(vault_path)
-    target_filename = f"{title}.md".lower()
-    
-    for md_file in vault.rglob('*.md'):
-        if md_file.name.lower() == target_filename:
-            return md_file
-    
-    return None
+    return get_vault_index(vault_path).find_document(title)
 
 
+@timed('find_image')
 def find_image(filename: str, vault_path: str = OBSIDIAN_VAULT_PATH) -> Optional[Path]:
     """
-    Recursively search vault for an image by filename.
+    Look up an image by filename in the vault index.
     """
-    vault = Path(vault_path)
-    target_filename = filename.lower()
-    
-    for img_file in vault.rglob('*'):
-        if img_file.is_file() and img_file.name.lower() == target_filename:
-            ext = img_file.suffix.lower()
-            if ext in IMAGE_EXTENSIONS:
-                return img_file
-    
-    return None
+    return get_vault_index(vault_path).find_image(filename)
 
 
 def find_all_linked_documents(content: str, vault_path: str = OBSIDIAN_VAULT_PATH) -> Dict[str, Optional[Path]]:
@@ -231,43 +328,21 @@ def find_all_linked_documents(content: str, vault_path: str = OBSIDIAN_VAULT_PAT
 # OpenAI Quality Check
 # ============================================================
 
-def check_quality(content: str, title: str, api_key: str = OPENAI_API_KEY) -> Dict[str, Any]:
-    """
-    Use OpenAI to assess document quality and appropriateness.
-    
-    Returns:
-    {
-        "appropriate": bool,  # Not too personal, not TMI
-        "technically_sound": bool,  # No obvious technical errors
-        "quality_score": int,  # 1-10 for grammar/information density
-        "passes": bool,  # Overall pass/fail
-        "reason": str  # Explanation
-    }
-    """
-    if not api_key:
-        print(f"  ⚠️  No OpenAI API key - skipping quality check for '{title}'")
-        return {
-            "appropriate": True,
-            "technically_sound": True,
-            "quality_score": 7,
-            "passes": True,
-            "reason": "No API key - auto-passed"
-        }
-    
-    try:
-        import openai
-        client = openai.OpenAI(api_key=api_key)
-        
-        # Truncate content if too long
-        max_chars = 8000
-        check_content = content[:max_chars] if len(content) > max_chars else content
-        
-        prompt = f"""Evaluate this document for publication as a knowledge snippet on a personal blog. Be moderately strict - only pass content that provides genuine standalone value to readers.
+# Model and prompt used for quality checks (both part of the verdict cache key)
+QUALITY_MODEL = "gpt-4o-mini"
+
+# Tokens of a note sent per quality-check request. Longer notes are split
+# into chunks of this size and up to QUALITY_MAX_CHUNKS of them, spread
+# evenly over the note, are scored in parallel (see split_for_check)
+QUALITY_CHUNK_TOKENS = int(os.getenv('QUALITY_CHUNK_TOKENS', '2000'))
+QUALITY_MAX_CHUNKS = int(os.getenv('QUALITY_MAX_CHUNKS', '4'))
+
+QUALITY_PROMPT_TEMPLATE = """Evaluate this document for publication as a knowledge snippet on a personal blog. Be moderately strict - only pass content that provides genuine standalone value to readers.
 
 Document Title: {title}
 
 Document Content:
-{check_content}
+{content}
 
 Return a JSON object with these fields:
 
@@ -302,56 +377,331 @@ Return a JSON object with these fields:
 
 Only return the JSON object, no other text."""
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=500
-        )
-        
-        result_text = response.choices[0].message.content.strip()
-        
-        # Parse JSON from response
-        # Handle potential markdown code blocks
-        if result_text.startswith('```'):
-            result_text = re.sub(r'^```json?\n?', '', result_text)
-            result_text = re.sub(r'\n?```$', '', result_text)
-        
-        result = json.loads(result_text)
-        
-        # Determine overall pass/fail (all criteria must pass)
-        passes = (
-            result.get('appropriate', False) and 
-            result.get('technically_sound', False) and 
-            result.get('has_substance', True) and  # New: must have actual content
-            result.get('not_ai_generated', True) and  # New: must be authentic
-            result.get('quality_score', 0) >= MIN_QUALITY_SCORE
-        )
-        result['passes'] = passes
-        
-        # Log the result
-        log_ai_check(title, result, check_content)
-        
-        return result
+# Shared verdict cache; main() sets refresh=True for --refresh-quality
+quality_cache = QualityCache()
+
+# Request budget and in-flight limit shared by every check_quality call
+request_limiter = RateLimiter(OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE)
+request_concurrency = AdaptiveConcurrency(QUALITY_CHECK_CONCURRENCY)
+
+# Content-addressed store that post images are hardlinked from
+image_store = ImageStore()
+
+# Resizes/re-encodes images before publishing; main() sets it for --optimize-images
+image_optimizer: Optional[ImageOptimizer] = None
+
+
+def split_for_check(content: str) -> List[str]:
+    """
+    The parts of a note a quality check scores: the whole note if it fits
+    QUALITY_CHUNK_TOKENS, otherwise paragraph-aligned chunks of that size,
+    at most QUALITY_MAX_CHUNKS of them spread evenly over the note.
+    """
+    chunks = split_into_chunks(content, QUALITY_CHUNK_TOKENS, QUALITY_MODEL)
+    if len(chunks) > QUALITY_MAX_CHUNKS:
+        step = len(chunks) / QUALITY_MAX_CHUNKS
+        chunks = [chunks[int(i * step)] for i in range(QUALITY_MAX_CHUNKS)]
+    return chunks
+
+
+def chunk_title(title: str, index: int, count: int) -> str:
+    """Title sent with one chunk of a note scored in parts."""
+    return title if count == 1 else f"{title} (part {index + 1} of {count})"
+
+
+def quality_cache_key(chunks: List[str], title: str) -> str:
+    """Cache key for a quality check of these chunks (see split_for_check)."""
+    content = chunks[0] if len(chunks) == 1 else json.dumps(chunks, ensure_ascii=False)
+    return cache_key(content, title, QUALITY_PROMPT_TEMPLATE, QUALITY_MODEL, MIN_QUALITY_SCORE)
+
+
+def quality_request_body(check_content: str, title: str) -> Dict[str, Any]:
+    """Chat completion parameters for a quality check (also used as Batch API request bodies)."""
+    return {
+        "model": QUALITY_MODEL,
+        "messages": [{"role": "user", "content": QUALITY_PROMPT_TEMPLATE.format(title=title, content=check_content)}],
+        "temperature": 0.3,
+        "max_tokens": 500
+    }
+
+
+def estimate_request_tokens(body: Dict[str, Any]) -> int:
+    """Token cost of a chat request: its prompt plus the reply budget."""
+    prompt_tokens = sum(count_tokens(message['content'], body['model']) for message in body['messages'])
+    return prompt_tokens + body.get('max_tokens', 0)
+
+
+def classify_request_error(error: Exception) -> Tuple[bool, bool, Optional[float]]:
+    """
+    How to handle a failed API request: (retry, throttled, retry_after).
+    Rate limits, timeouts, connection errors and 5xx responses are retried;
+    anything else (bad key, bad request, exhausted quota, unparseable reply)
+    is not.
+    """
+    import openai
+    
+    response = getattr(error, 'response', None)
+    retry_after = retry_after_seconds(getattr(response, 'headers', None))
+    if isinstance(error, openai.RateLimitError):
+        if getattr(error, 'code', None) == 'insufficient_quota':
+            return False, False, None
+        return True, True, retry_after
+    if isinstance(error, openai.APIConnectionError):  # includes timeouts
+        return True, False, None
+    if isinstance(error, openai.APIStatusError) and (error.status_code >= 500 or error.status_code in (408, 409)):
+        return True, False, retry_after
+    return False, False, None
+
+
+# Markdown code fences the model sometimes wraps its JSON in
+CODE_FENCE_OPEN_PATTERN = re.compile(r'^```json?\n?')
+CODE_FENCE_CLOSE_PATTERN = re.compile(r'\n?```$')
+
+
+def parse_quality_response(result_text: str) -> Dict[str, Any]:
+    """Parse the model's JSON verdict and decide overall pass/fail."""
+    result_text = result_text.strip()
+    
+    # Parse JSON from response
+    # Handle potential markdown code blocks
+    if result_text.startswith('```'):
+        result_text = CODE_FENCE_OPEN_PATTERN.sub('', result_text)
+        result_text = CODE_FENCE_CLOSE_PATTERN.sub('', result_text)
+    
+    result = json.loads(result_text)
+    result['passes'] = quality_passes(result)
+    return result
+
+
+def quality_passes(result: Dict[str, Any]) -> bool:
+    """Overall pass/fail for a verdict (all criteria must pass)."""
+    return bool(
+        result.get('appropriate', False) and 
+        result.get('technically_sound', False) and 
+        result.get('has_substance', True) and  # New: must have actual content
+        result.get('not_ai_generated', True) and  # New: must be authentic
+        (result.get('quality_score') or 0) >= MIN_QUALITY_SCORE
+    )
+
+
+def combine_chunk_verdicts(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    One verdict for a note from the verdicts on its chunks. A chunk that is
+    inappropriate or technically wrong fails the whole note; substance and
+    authenticity go by majority, and the score is the mean.
+    """
+    if len(results) == 1:
+        return results[0]
+    
+    def majority(field: str) -> bool:
+        return sum(bool(r.get(field, True)) for r in results) * 2 >= len(results)
+    
+    scores = [r.get('quality_score') or 0 for r in results]
+    result = {
+        'appropriate': all(r.get('appropriate', False) for r in results),
+        'technically_sound': all(r.get('technically_sound', False) for r in results),
+        'has_substance': majority('has_substance'),
+        'not_ai_generated': majority('not_ai_generated'),
+        'quality_score': round(sum(scores) / len(scores)),
+        'chunk_scores': scores,
+        'reason': ' | '.join(f"Part {i + 1}: {r.get('reason', '')}" for i, r in enumerate(results))
+    }
+    result['passes'] = quality_passes(result)
+    return result
+
+
+def request_verdict(client: Any, check_content: str, title: str) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """
+    Send one quality-check request, retrying throttled, timed-out and 5xx
+    requests with backoff. Returns (verdict, token usage); raises the error
+    once retries are exhausted or the error isn't retryable.
+    """
+    body = quality_request_body(check_content, title)
+    estimated = estimate_request_tokens(body)
+    attempt = 0
+    while True:
+        try:
+            request_limiter.acquire(estimated)
+            with request_concurrency.slot(), span('openai_request', title=title, attempt=attempt):
+                response = client.chat.completions.create(**body, timeout=QUALITY_REQUEST_TIMEOUT)
+            request_concurrency.succeeded()
+            metrics.count('openai_requests')
+            usage = {'prompt_tokens': 0, 'completion_tokens': 0}
+            if getattr(response, 'usage', None) is not None:
+                usage['prompt_tokens'] = response.usage.prompt_tokens or 0
+                usage['completion_tokens'] = response.usage.completion_tokens or 0
+                metrics.count('openai_prompt_tokens', usage['prompt_tokens'])
+                metrics.count('openai_completion_tokens', usage['completion_tokens'])
+                request_limiter.settle(estimated, usage['prompt_tokens'] + usage['completion_tokens'])
+            return parse_quality_response(response.choices[0].message.content), usage
         
-    except Exception as e:
-        print(f"  ⚠️  Quality check error for '{title}': {e}")
-        error_result = {
+        except Exception as e:
+            retry, throttled, retry_after = classify_request_error(e)
+            if throttled:
+                metrics.count('openai_throttled')
+                request_concurrency.throttled()
+            if not retry or attempt >= QUALITY_CHECK_RETRIES:
+                raise
+            delay = backoff_delay(attempt, retry_after)
+            attempt += 1
+            metrics.count('openai_retries')
+            print(f"  ⏳ Quality check for '{title}' failed ({e}); retry {attempt}/{QUALITY_CHECK_RETRIES} in {delay:.1f}s")
+            if throttled:
+                # Everyone backs off, not just this request
+                request_limiter.pause(delay)
+            else:
+                time.sleep(delay)
+
+
+def score_chunks(client: Any, chunks: List[str], title: str) -> List[Tuple[Dict[str, Any], Dict[str, int]]]:
+    """
+    Score the chunks of a long note in parallel (still within
+    request_concurrency). Returns (verdict, usage) per chunk, in order;
+    raises the first chunk's error if any chunk failed.
+    """
+    def score(index: int, chunk: str) -> Tuple[Any, Optional[Exception]]:
+        try:
+            return request_verdict(client, chunk, chunk_title(title, index, len(chunks))), None
+        except Exception as e:
+            return None, e
+    
+    # Keep each chunk's messages together, like check_linked_document does per link
+    stdout = sys.stdout
+    if isinstance(stdout, _ThreadLocalStdout):
+        run = stdout.captured
+    else:
+        def run(func, *args):
+            return func(*args), ''
+    
+    with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+        outcomes = list(pool.map(run, repeat(score), range(len(chunks)), chunks))
+    
+    for _, output in outcomes:
+        print(output, end='')
+    for (_, error), _ in outcomes:
+        if error is not None:
+            raise error
+    return [verdict for (verdict, _), _ in outcomes]
+
+
+@timed('check_quality')
+def check_quality(
+    content: str,
+    title: str,
+    api_key: str = OPENAI_API_KEY,
+    refresh: bool = False
+) -> Dict[str, Any]:
+    """
+    Use OpenAI to assess document quality and appropriateness.
+    
+    Notes that are obviously unpublishable (too short, mostly images,
+    links or bare bullets) are failed locally without a request (see
+    quality_prefilter.py).
+    
+    Notes longer than QUALITY_CHUNK_TOKENS are split into chunks that are
+    scored in parallel and combined (see split_for_check and
+    combine_chunk_verdicts), so a long note is judged on more than its
+    first page.
+    
+    Verdicts are cached by a hash of the chunks, title, prompt template,
+    model and MIN_QUALITY_SCORE; pass refresh=True to ignore the cached
+    verdict and ask the API again.
+    
+    Requests share the OPENAI_*_PER_MINUTE budget (see rate_limiter.py).
+    Throttled, timed-out and 5xx requests are retried with backoff; a check
+    that still fails is not auto-passed but returns passes=False with
+    "retry_needed": True, so the next run checks the note again.
+    
+    Returns:
+    {
+        "appropriate": bool,  # Not too personal, not TMI
+        "technically_sound": bool,  # No obvious technical errors
+        "quality_score": int,  # 1-10 for grammar/information density
+        "passes": bool,  # Overall pass/fail
+        "reason": str,  # Explanation
+        "usage": dict  # Prompt/completion tokens spent and chunks scored
+    }
+    """
+    rejected = prefilter_verdict(content)
+    if rejected is not None:
+        metrics.count('quality_prefiltered')
+        print(f"     🧹 Rejected locally: '{title}' ({rejected['reason']})")
+        log_ai_check(title, rejected, content, source='heuristic')
+        return rejected
+    
+    if not api_key:
+        print(f"  ⚠️  No OpenAI API key - skipping quality check for '{title}'")
+        return {
             "appropriate": True,
             "technically_sound": True,
             "quality_score": 7,
             "passes": True,
-            "reason": f"Error during check: {e} - auto-passed",
-            "error": str(e)
+            "reason": "No API key - auto-passed",
+            "unchecked": True
+        }
+    
+    chunks = split_for_check(content)
+    key = quality_cache_key(chunks, title)
+    cached = None if refresh else quality_cache.get(key)
+    if cached is not None:
+        metrics.count('quality_cache_hits')
+        print(f"     💾 Cached verdict for '{title}'")
+        log_ai_check(title, cached, chunks[0], source='cache')
+        return cached
+    
+    # Retries are scheduled in request_verdict (rate budget, backoff, Retry-After), not by the client
+    client = get_openai_client(api_key, max_retries=0)
+    try:
+        if len(chunks) == 1:
+            verdicts = [request_verdict(client, chunks[0], title)]
+        else:
+            metrics.count('quality_chunked_checks')
+            print(f"     🧩 Scoring '{title}' in {len(chunks)} chunks")
+            verdicts = score_chunks(client, chunks, title)
+    
+    except Exception as e:
+        # Not published, not cached and not recorded in the build
+        # manifest, so the next run checks it again
+        print(f"  ⚠️  Quality check error for '{title}': {e} - marked for retry")
+        metrics.count('quality_checks_failed')
+        error_result = {
+            "appropriate": False,
+            "technically_sound": False,
+            "quality_score": None,
+            "passes": False,
+            "reason": f"Error during check: {e} - retry needed",
+            "error": str(e),
+            "retry_needed": True
         }
-        log_ai_check(title, error_result, "")
+        log_ai_check(title, error_result, "", source='api')
         return error_result
+    
+    result = combine_chunk_verdicts([verdict for verdict, _ in verdicts])
+    result['usage'] = {
+        'prompt_tokens': sum(usage['prompt_tokens'] for _, usage in verdicts),
+        'completion_tokens': sum(usage['completion_tokens'] for _, usage in verdicts),
+        'chunks': len(chunks)
+    }
+    print(f"     🔢 Tokens for '{title}': {result['usage']['prompt_tokens']} prompt + "
+          f"{result['usage']['completion_tokens']} completion")
+    
+    quality_cache.put(key, result)
+    
+    # Log the result
+    log_ai_check(title, result, chunks[0], source='api')
+    
+    return result
 
 
 # ============================================================
 # MDX Conversion
 # ============================================================
 
+# Runs of characters not allowed in a slug, and the ASCII prefix kept for hash-based slugs
+SLUG_SEPARATOR_PATTERN = re.compile(r'[^a-z0-9]+')
+SLUG_PREFIX_PATTERN = re.compile(r'[a-zA-Z0-9]+')
+
+
 def slugify(text: str) -> str:
     """
     Convert text to URL-friendly slug.
@@ -365,7 +715,7 @@ def slugify(text: str) -> str:
     
     # Convert to lowercase and replace non-alphanumeric with hyphens
     slug = ascii_text.lower()
-    slug = re.sub(r'[^a-z0-9]+', '-', slug)
+    slug = SLUG_SEPARATOR_PATTERN.sub('-', slug)
     slug = slug.strip('-')
     
     # If slug is empty (e.g., all Korean characters), use hash-based fallback
@@ -373,7 +723,7 @@ def slugify(text: str) -> str:
         # Create a short hash from the original text
         text_hash = hashlib.md5(text.encode('utf-8')).hexdigest()[:8]
         # Try to extract any alphanumeric prefix from original
-        prefix_match = re.search(r'[a-zA-Z0-9]+', text)
+        prefix_match = SLUG_PREFIX_PATTERN.search(text)
         if prefix_match:
             slug = f"{prefix_match.group().lower()}-{text_hash}"
         else:
@@ -382,6 +732,11 @@ def slugify(text: str) -> str:
     return slug
 
 
+# Import added to posts that use the Math component
+MATH_IMPORT = 'import Math from "../../../src/components/Math"\n\n'
+
+
+@timed('convert_to_mdx')
 def convert_to_mdx(
     content: str,
     title: str,
@@ -390,7 +745,8 @@ def convert_to_mdx(
     tags: Optional[List[str]] = None,
     description: Optional[str] = None,
     linked_snippets: Optional[Dict[str, Dict]] = None,
-    images_map: Optional[Dict[str, str]] = None
+    images_map: Optional[Dict[str, str]] = None,
+    related: Optional[List[Dict[str, str]]] = None
 ) -> str:
     """
     Convert Obsidian markdown to MDX format with proper frontmatter.
@@ -404,22 +760,43 @@ def convert_to_mdx(
         description: Post description
         linked_snippets: Dict mapping link target to {slug, passes} for linked pages
         images_map: Dict mapping original image name to local filename
+        related: Similar snippets [{title, slug}] listed in the frontmatter
     
     Returns:
         Complete MDX content with frontmatter
     """
-    if date is None:
-        date = datetime.now().strftime('%Y-%m-%d')
-    
-    if tags is None:
-        tags = []
-    
     if linked_snippets is None:
         linked_snippets = {}
     
     if images_map is None:
         images_map = {}
     
+    frontmatter = mdx_frontmatter(title, date, display_date, tags, description, related)
+    
+    # Rewrite image embeds, wiki-links and LaTeX in a single pass
+    converted_content, has_math = rewrite_body(content, linked_snippets, images_map)
+    
+    # Add Math component import if content has math
+    math_import = MATH_IMPORT if has_math else ""
+    
+    return f"{frontmatter}\n\n{math_import}{converted_content}"
+
+
+def mdx_frontmatter(
+    title: str,
+    date: Optional[str] = None,
+    display_date: Optional[str] = None,
+    tags: Optional[List[str]] = None,
+    description: Optional[str] = None,
+    related: Optional[List[Dict[str, str]]] = None
+) -> str:
+    """MDX frontmatter block (fences included) for convert_to_mdx."""
+    if date is None:
+        date = datetime.now().strftime('%Y-%m-%d')
+    
+    if tags is None:
+        tags = []
+    
     # Build frontmatter
     frontmatter_lines = [
         '---',
@@ -442,70 +819,31 @@ def convert_to_mdx(
         for tag in tags:
             frontmatter_lines.append(f'  - {tag}')
     
+    frontmatter_lines.extend(related_frontmatter_lines(related))
     frontmatter_lines.append('---')
-    frontmatter = '\n'.join(frontmatter_lines)
-    
-    # First, convert Obsidian image embeds ![[image.png]] to standard markdown
-    # This must happen BEFORE processing wiki-links to avoid double processing
-    converted_content = content
-    
-    def replace_image_embed(match):
-        img_name = match.group(1).strip()
-        if img_name in images_map:
-            local_name = images_map[img_name]
-            return f'![{img_name}](./{local_name})'
-        else:
-            return f'*[Image: {img_name}]*'
-    
-    converted_content = IMAGE_EMBED_PATTERN.sub(replace_image_embed, converted_content)
-    
-    # Now process wiki-links (non-image)
-    # Re-parse since content has changed
-    links = parse_wiki_links(converted_content)
-    
-    # Process links in reverse order to maintain positions
-    for link in reversed(links):
-        target = link['target']
-        display = link['display'] or target
-        
-        # Skip if this is an image (shouldn't happen since we converted them above)
-        if link['is_image']:
-            continue
-        
-        # Document link
-        if target in linked_snippets:
-            snippet_info = linked_snippets[target]
-            if snippet_info['passes']:
-                # Accessible snippet
-                replacement = f'[{display}](/snippets/{snippet_info["slug"]}/)'
-            else:
-                # Inaccessible snippet - gray text
-                replacement = f'<span style={{{{color: "#999", cursor: "not-allowed"}}}}>{display}</span>'
-        else:
-            # Link to unknown page - just use text
-            replacement = display
-        
-        converted_content = (
-            converted_content[:link['start']] + 
-            replacement + 
-            converted_content[link['end']:]
-        )
-    
-    # Remove hashtag lines from the beginning of content (they're now in frontmatter)
-    # Match lines that are only hashtags at the start
-    converted_content = re.sub(r'^(\s*#[a-zA-Z][a-zA-Z0-9_-]*\s*)+\n', '', converted_content)
-    
-    # Convert LaTeX to Math component syntax for MDX compatibility
-    # This prevents $...$ from being interpreted as JSX expressions
-    has_math = '$' in converted_content
-    converted_content = convert_latex_for_mdx(converted_content)
-    
-    # Add Math component import if content has math
-    math_import = ""
-    if has_math:
-        math_import = 'import Math from "../../../src/components/Math"\n\n'
-    
-    return f"{frontmatter}\n\n{math_import}{converted_content}"
+    return '\n'.join(frontmatter_lines)
+
+
+def related_frontmatter_lines(related: Optional[List[Dict[str, str]]]) -> List[str]:
+    """The `related:` frontmatter block listing similar snippets (see note_similarity.py)."""
+    if not related:
+        return []
+    lines = ['related:']
+    for entry in related:
+        title_escaped = entry['title'].replace('"', '\\"')
+        lines.append(f'  - title: "{title_escaped}"')
+        lines.append(f'    slug: "{entry["slug"]}"')
+    return lines
+
+
+def set_related_frontmatter(mdx: str, related: Optional[List[Dict[str, str]]]) -> str:
+    """mdx with its `related:` frontmatter block replaced by one for related."""
+    match = MDX_FRONTMATTER_PATTERN.match(mdx)
+    if not match:
+        return mdx
+    lines = RELATED_BLOCK_PATTERN.sub('', match.group(1) + '\n').splitlines()
+    lines.extend(related_frontmatter_lines(related))
+    return '---\n' + '\n'.join(lines) + '\n---' + mdx[match.end():]
 
 
 def convert_latex_for_mdx(content: str) -> str:
@@ -518,116 +856,655 @@ def convert_latex_for_mdx(content: str) -> str:
     - $$display$$ -> <Math display>{"display"}</Math>
     """
     # First, handle display math ($$...$$) - must come before inline
-    # Match $$ on its own line or inline
-    def replace_display_math(match):
-        latex = match.group(1).strip()
-        # Escape special characters for JSX string
-        latex = latex.replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
-        return f'<Math display>{{"{latex}"}}</Math>'
-    
-    # Display math: $$...$$ (can span multiple lines)
-    content = re.sub(r'\$\$([\s\S]*?)\$\$', replace_display_math, content)
+    content = DISPLAY_MATH_PATTERN.sub(lambda m: render_math(m.group(1), display=True), content)
     
     # Then handle inline math ($...$)
-    def replace_inline_math(match):
-        latex = match.group(1).strip()
-        # Escape special characters for JSX string
-        latex = latex.replace('\\', '\\\\').replace('"', '\\"')
-        return f'<Math>{{"{latex}"}}</Math>'
-    
-    # Inline math: $...$ (not starting/ending with space, single line)
-    # Negative lookbehind/lookahead to avoid matching $$
-    content = re.sub(r'(?<!\$)\$(?!\$)([^\$\n]+?)(?<!\$)\$(?!\$)', replace_inline_math, content)
+    content = INLINE_MATH_PATTERN.sub(lambda m: render_math(m.group(1), display=False), content)
     
     return content
 
 
-# ============================================================
-# Main Packaging Functions
-# ============================================================
-
-def load_snippet_metadata(snippets_dir: Path = SNIPPETS_DIR) -> Dict[str, Any]:
-    """Load existing snippet metadata."""
-    meta_path = snippets_dir / '_metadata.json'
-    if meta_path.exists():
-        try:
-            return json.loads(meta_path.read_text(encoding='utf-8'))
-        except:
-            pass
-    return {}
+def render_math(latex: str, display: bool) -> str:
+    """Render one LaTeX span as a Math component with a JSX string literal."""
+    latex = latex.strip()
+    # Escape special characters for JSX string
+    latex = latex.replace('\\', '\\\\').replace('"', '\\"')
+    if display:
+        latex = latex.replace('\n', ' ')
+        return f'<Math display>{{"{latex}"}}</Math>'
+    return f'<Math>{{"{latex}"}}</Math>'
 
 
-def save_snippet_metadata(metadata: Dict[str, Any], snippets_dir: Path = SNIPPETS_DIR) -> None:
-    """Save snippet metadata to JSON file."""
-    snippets_dir.mkdir(parents=True, exist_ok=True)
-    meta_path = snippets_dir / '_metadata.json'
-    meta_path.write_text(json.dumps(metadata, indent=2), encoding='utf-8')
+def render_image_embed(img_name: str, images_map: Dict[str, str]) -> str:
+    """Render ![[image.png]] as standard markdown (or a placeholder if the image is missing)."""
+    img_name = img_name.strip()
+    if img_name in images_map:
+        local_name = images_map[img_name]
+        return f'![{img_name}](./{local_name})'
+    return f'*[Image: {img_name}]*'
 
 
-def log_ai_check(title: str, result: Dict[str, Any], content_preview: str = "") -> None:
-    """Log AI quality check results with timestamp."""
-    LOGS_DIR.mkdir(parents=True, exist_ok=True)
-    
-    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-    date_str = datetime.now().strftime('%Y-%m-%d')
-    
-    # Create date-based log file
-    log_file = LOGS_DIR / f'ai_checks_{date_str}.json'
+def render_wiki_link(target: str, display: Optional[str], linked_snippets: Dict[str, Dict]) -> Optional[str]:
+    """
+    Render [[Target|Display]] for MDX.
+    Returns None for image links, which are left untouched.
+    """
+    target = target.strip()
+    display = (display.strip() if display else None) or target
     
-    # Load existing logs for today
-    logs = []
-    if log_file.exists():
-        try:
-            logs = json.loads(log_file.read_text(encoding='utf-8'))
-        except:
-            logs = []
+    if any(target.lower().endswith(ext) for ext in IMAGE_EXTENSIONS):
+        return None
     
-    # Add new log entry
-    log_entry = {
-        'timestamp': timestamp,
-        'title': title,
-        'result': result,
-        'content_preview': content_preview[:500] if content_preview else ''
-    }
-    logs.append(log_entry)
+    # Document link
+    if target in linked_snippets:
+        snippet_info = linked_snippets[target]
+        if snippet_info['passes']:
+            # Accessible snippet
+            return f'[{display}](/snippets/{snippet_info["slug"]}/)'
+        # Inaccessible snippet - gray text
+        return f'<span style={{{{color: "#999", cursor: "not-allowed"}}}}>{display}</span>'
     
-    # Save updated logs
-    log_file.write_text(json.dumps(logs, indent=2), encoding='utf-8')
+    # Link to unknown page - just use text
+    return display
+
+
+def _render_embed_or_link(match: 're.Match', linked_snippets: Dict[str, Dict], images_map: Dict[str, str]) -> str:
+    """Render an EMBED_OR_LINK match."""
+    if match.group('embed') is not None:
+        return render_image_embed(match.group('embed'), images_map)
+    rendered = render_wiki_link(match.group('target'), match.group('display'), linked_snippets)
+    return match.group(0) if rendered is None else rendered
+
+
+def rewrite_body(
+    content: str,
+    linked_snippets: Dict[str, Dict],
+    images_map: Dict[str, str]
+) -> Tuple[str, bool]:
+    """
+    Rewrite a note body for MDX in one left-to-right pass into one buffer:
+    - ![[image]] embeds -> markdown images
+    - [[Target|Display]] -> snippet links, gray text or plain text
+    - $$...$$ / $...$ -> Math components
+    - leading hashtag lines are stripped (they're in the frontmatter)
+    
+    Links bind before math (see body_tokens): wiki-links inside a math span
+    are rewritten before the math is rendered, and math inside link text is
+    rendered after the link, as the old embed -> link -> LaTeX passes did.
+    
+    Returns (converted_body, has_math) where has_math mirrors checking the
+    link-rewritten text for '$'.
+    """
+    output, has_math = rewrite_tokens(content, body_tokens(content), linked_snippets, images_map)
+    converted = ''.join(output)
     
-    # Also create individual log file for easy debugging
-    safe_title = slugify(title)
-    individual_log = LOGS_DIR / f'{timestamp}_{safe_title}.json'
-    individual_log.write_text(json.dumps(log_entry, indent=2), encoding='utf-8')
+    # Remove hashtag lines from the beginning of content (they're now in frontmatter).
+    # Math spans start with '$' or '<', which end the match, so checking the
+    # finished buffer gives the same result as checking before math rendering.
+    leading_tags = LEADING_HASHTAGS_PATTERN.match(converted)
+    if leading_tags:
+        converted = converted[leading_tags.end():]
     
-    print(f"     📝 Logged to: {log_file.name}")
+    return converted, has_math
 
 
-def create_snippet(
-    title: str,
-    content: str,
-    frontmatter: Dict[str, Any],
-    quality_result: Dict[str, Any],
-    output_dir: Path = SNIPPETS_DIR
-) -> Dict[str, Any]:
+def body_tokens(content: str) -> List['re.Match']:
     """
-    Create a snippet from a linked document.
+    The embeds, wiki-links and math spans rewrite_tokens renders, in order.
     
-    Returns dict with:
-    - slug: URL slug
-    - path: Path to created file
-    - passes: Whether quality check passed
-    - quality: Full quality result
+    Links are found first and bind first: math spans are matched with the
+    '$' inside links masked, so a span never starts or ends inside a link.
+    In "costs $5 and the [[p-value|$p$-value]]" the $5 stays text and the
+    link renders as "<Math>{"p"}</Math>-value". Links wholly inside a math
+    span belong to the span.
     """
-    slug = slugify(title)
-    snippet_dir = output_dir / slug
-    snippet_dir.mkdir(parents=True, exist_ok=True)
+    links = list(EMBED_OR_LINK_PATTERN.finditer(content))
+    masked = content
+    if links and '$' in content:
+        pieces = []
+        pos = 0
+        for link in links:
+            pieces.append(content[pos:link.start()])
+            pieces.append(link.group(0).replace('$', ' '))
+            pos = link.end()
+        pieces.append(content[pos:])
+        masked = ''.join(pieces)
+    
+    tokens = []
+    i = 0
+    for math in MATH_TOKEN_PATTERN.finditer(masked):
+        while i < len(links) and links[i].start() < math.start():
+            tokens.append(links[i])
+            i += 1
+        tokens.append(math)
+        while i < len(links) and links[i].end() <= math.end():
+            i += 1
+    tokens.extend(links[i:])
+    return tokens
+
+
+def rewrite_tokens(
+    content: str,
+    matches: Iterable['re.Match'],
+    linked_snippets: Dict[str, Dict],
+    images_map: Dict[str, str]
+) -> Tuple[List[str], bool]:
+    """
+    The token pass of rewrite_body: renders the body_tokens found in content
+    and keeps the text between them. Math tokens may be matches on the
+    masked text, so their LaTeX is taken from content by position.
+    Returns (output pieces, has_math).
+    """
+    output = []
+    has_math = False
+    pos = 0
+    
+    def rewrite_links(text: str) -> str:
+        if '[[' not in text:
+            return text
+        return EMBED_OR_LINK_PATTERN.sub(lambda m: _render_embed_or_link(m, linked_snippets, images_map), text)
+    
+    for match in matches:
+        text = content[pos:match.start()]
+        output.append(text)
+        if '$' in text:
+            has_math = True
+        
+        if match.re is MATH_TOKEN_PATTERN:
+            has_math = True
+            group = 'display_math' if match.group('display_math') is not None else 'inline_math'
+            latex = content[match.start(group):match.end(group)]
+            output.append(render_math(rewrite_links(latex), display=group == 'display_math'))
+        else:
+            rendered = _render_embed_or_link(match, linked_snippets, images_map)
+            if '$' in rendered:
+                # e.g. [[p-value|$p$-value]]: render math inside the link text
+                has_math = True
+                rendered = convert_latex_for_mdx(rendered)
+            output.append(rendered)
+        pos = match.end()
     
-    # Generate MDX content
-    date = frontmatter.get('date', datetime.now().strftime('%Y-%m-%d'))
-    if isinstance(date, datetime):
-        date = date.strftime('%Y-%m-%d')
+    text = content[pos:]
+    output.append(text)
+    if '$' in text:
+        has_math = True
     
-    # Extract and merge tags from body + frontmatter
+    return output, has_math
+
+
+# ============================================================
+# Streaming Conversion (large notes)
+# ============================================================
+
+# Post notes at least this large are scanned and converted in chunks
+# straight from disk instead of being read into memory whole
+STREAMING_THRESHOLD = int(os.getenv('STREAMING_THRESHOLD_BYTES', str(4 * 1024 * 1024)))
+
+# Characters read from a note at a time while streaming
+STREAM_CHUNK_CHARS = 64 * 1024
+
+# A display date label followed only by whitespace so far: its match depends on what comes next
+_DISPLAY_DATE_TAIL = re.compile(r'(?:Date:|Written:?)\s*\Z', re.IGNORECASE)
+
+# How far a run of leading hashtags extends. Once that stops short of the end
+# of the output so far, LEADING_HASHTAGS_PATTERN can no longer change
+_LEADING_HASHTAGS_EXTENT = re.compile(r'(?:\s*#[a-zA-Z][a-zA-Z0-9_-]*)*\s*')
+
+# Longest text a token can span ([[target|display]] with both parts at
+# MAX_TOKEN_CHARS). A [[ or $$ with more text after it than this is settled
+_MAX_TOKEN_SPAN = 2 * MAX_TOKEN_CHARS + 5
+
+
+def iter_note_chunks(path: Path, start: int = 0, chunk_chars: int = STREAM_CHUNK_CHARS) -> Iterator[str]:
+    """
+    Read a note as text chunks, from character offset `start`.
+    Newlines are translated as by read_text.
+    """
+    metrics.count('bytes_read', path.stat().st_size)
+    with open(path, encoding='utf-8') as f:
+        while start > 0:
+            skipped = f.read(min(start, chunk_chars))
+            if not skipped:
+                return
+            start -= len(skipped)
+        while True:
+            chunk = f.read(chunk_chars)
+            if not chunk:
+                return
+            yield chunk
+
+
+def scan_note_frontmatter(path: Path) -> Tuple[Dict[str, Any], Optional[int], str]:
+    """
+    Streaming counterpart of extract_frontmatter + text_hash on a note.
+    Returns (frontmatter, body_start, source_hash), where body_start is the
+    offset just past the closing '---', or None if the note has no
+    frontmatter (its body is then the whole note, unstripped).
+    """
+    hasher = hashlib.sha256()
+    body_start = None
+    opens = None
+    offset = 0
+    tail = ''
+    for chunk in iter_note_chunks(path):
+        hasher.update(chunk.encode('utf-8'))
+        if opens is not False and body_start is None:
+            # Opening '---', then the second '---' (split('---', 2)); either may straddle chunks
+            window = tail + chunk
+            window_start = offset - len(tail)
+            if opens is None and len(window) >= 3:
+                opens = window.startswith('---')
+            if opens:
+                found = window.find('---', max(0, 3 - window_start))
+                if found != -1:
+                    body_start = window_start + found + 3
+            tail = window[-2:]
+        offset += len(chunk)
+    
+    frontmatter = {}
+    if body_start is not None:
+        with open(path, encoding='utf-8') as f:
+            frontmatter = parse_frontmatter_yaml(f.read(body_start - 3)[3:])
+    return frontmatter, body_start, hasher.hexdigest()
+
+
+def iter_body_chunks(path: Path, body_start: Optional[int]) -> Iterator[str]:
+    """
+    The body of a note (see scan_note_frontmatter) as text chunks, stripped
+    like extract_frontmatter strips it. Trailing whitespace is held back
+    until more text follows it.
+    """
+    chunks = iter_note_chunks(path, body_start or 0)
+    if body_start is None:
+        yield from chunks
+        return
+    
+    pending = None
+    for chunk in chunks:
+        if pending is None:
+            chunk = chunk.lstrip()
+            if not chunk:
+                continue
+            pending = ''
+        text = chunk.rstrip()
+        if text:
+            yield pending + text
+            pending = chunk[len(text):]
+        else:
+            pending += chunk
+
+
+def _stream_cut(
+    text: str,
+    limit: int,
+    matches: Sequence['re.Match'] = (),
+    tail: Optional['re.Pattern'] = None
+) -> int:
+    """
+    Where text streamed so far can be cut: the last line boundary at or
+    before `limit` such that
+    - every [[ before it (wiki-link or embed) has its first ] before it too,
+      or is too far back to still start one, so links are settled and none
+      straddles the cut
+    - none of `matches` straddles it
+    - `tail` (if given) doesn't match just before it
+    
+    Patterns that only look within a line are then unaffected by text after
+    the cut. Returns 0 if there is no such point yet.
+    """
+    cut = text.rfind('\n', 0, limit) + 1
+    while cut:
+        opening = text.rfind('[[', 0, cut)
+        if opening != -1 and cut - opening < _MAX_TOKEN_SPAN:
+            closing = text.find(']', opening, cut)
+            if closing == -1 or closing + 2 > cut:
+                cut = text.rfind('\n', 0, opening) + 1
+                continue
+        
+        last = next((m for m in reversed(matches) if m.start() < cut), None)
+        if last is not None and last.end() > cut:
+            cut = text.rfind('\n', 0, last.start()) + 1
+            continue
+        
+        if tail is not None:
+            pending = tail.search(text, 0, cut)
+            if pending:
+                cut = text.rfind('\n', 0, pending.start()) + 1
+                continue
+        return cut
+    return 0
+
+
+def _open_display_math(text: str, matches: Sequence['re.Match']) -> int:
+    """
+    Offset of the first $$ outside every token that could still open a
+    display span (no closing $$ yet, but within _MAX_TOKEN_SPAN of the end
+    of text), or len(text).
+    """
+    open_from = len(text) - _MAX_TOKEN_SPAN + 1
+    pos = 0
+    for match in list(matches) + [None]:
+        end = len(text) if match is None else match.start() + 1
+        found = text.find('$$', max(pos, open_from), end)
+        if found != -1:
+            return found
+        if match is not None:
+            pos = match.end()
+    return len(text)
+
+
+def _scan_references(text: str, images: Dict[str, None], links: Dict[str, None]) -> None:
+    """
+    Add the image names (embeds and image wiki-links) and other wiki-link
+    targets in text to the ordered sets `images` and `links`, in order of
+    appearance.
+    """
+    found = [(m.start(), m.group(1)) for m in IMAGE_EMBED_PATTERN.finditer(text)]
+    for link in parse_wiki_links(text):
+        if link['is_image']:
+            found.append((link['start'], link['target']))
+        else:
+            links.setdefault(link['target'])
+    for _, name in sorted(found):
+        images.setdefault(name)
+
+
+def scan_body(body: str) -> Dict[str, Any]:
+    """
+    Body hashtags, display date, image names ('images') and wiki-link
+    targets ('links') of a post body. Images and links are listed once
+    each, in order of first appearance.
+    """
+    images: Dict[str, None] = {}
+    links: Dict[str, None] = {}
+    _scan_references(body, images, links)
+    return {
+        'tags': extract_body_hashtags(body),
+        'display_date': extract_display_date(body),
+        'images': list(images),
+        'links': list(links),
+    }
+
+
+def scan_body_stream(chunks: Iterable[str]) -> Dict[str, Any]:
+    """
+    scan_body over a body arriving in chunks. The body is scanned a run of
+    whole lines at a time, cut where no match can straddle the cut; what
+    is kept is bounded by the distinct tags, images and links.
+    """
+    result = {'tags': [], 'display_date': None}
+    seen_tags = set()
+    dates: List[Optional[str]] = [None] * len(DISPLAY_DATE_PATTERNS)
+    images: Dict[str, None] = {}
+    links: Dict[str, None] = {}
+    
+    def scan(segment: str) -> None:
+        for tag in extract_body_hashtags(segment):
+            if tag.lower() not in seen_tags:
+                result['tags'].append(tag)
+                seen_tags.add(tag.lower())
+        for i, pattern in enumerate(DISPLAY_DATE_PATTERNS):
+            if dates[i] is None:
+                match = pattern.search(segment)
+                if match:
+                    dates[i] = match.group(1)
+        _scan_references(segment, images, links)
+    
+    buffer = ''
+    retry_at = 0
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) < retry_at:
+            continue
+        cut = _stream_cut(buffer, len(buffer), tail=_DISPLAY_DATE_TAIL)
+        if not cut:
+            # Nothing settled (e.g. a [[ with no ] yet): wait for twice the text
+            retry_at = 2 * len(buffer)
+            continue
+        scan(buffer[:cut])
+        buffer = buffer[cut:]
+        retry_at = 0
+    scan(buffer)
+    result.update(images=list(images), links=list(links))
+    
+    # First match of each pattern, as extract_display_date
+    for date_str in dates:
+        if date_str is not None:
+            result['display_date'] = clean_display_date(date_str)
+            if result['display_date']:
+                break
+    return result
+
+
+def rewrite_body_stream(
+    chunks: Iterable[str],
+    out: IO[str],
+    linked_snippets: Dict[str, Dict],
+    images_map: Dict[str, str]
+) -> bool:
+    """
+    rewrite_body over a body arriving in chunks, writing the converted text
+    to `out` as it goes. The output is identical to rewrite_body's.
+    
+    Text is converted a run of whole lines at a time, cut only where no
+    token (embed, link or math span) straddles the cut or could still change
+    as more text arrives, so memory stays around a chunk plus the longest
+    token. Returns has_math.
+    """
+    has_math = False
+    head: Optional[str] = ''  # output held back until the leading hashtags are settled
+    
+    def emit(pieces: List[str], final: bool) -> None:
+        nonlocal head
+        if head is None:
+            out.writelines(pieces)
+            return
+        head += ''.join(pieces)
+        if final or _LEADING_HASHTAGS_EXTENT.match(head).end() + 2 <= len(head):
+            leading_tags = LEADING_HASHTAGS_PATTERN.match(head)
+            out.write(head[leading_tags.end():] if leading_tags else head)
+            head = None
+    
+    buffer = ''
+    retry_at = 0
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) < retry_at:
+            continue
+        matches = body_tokens(buffer)
+        cut = _stream_cut(buffer, _open_display_math(buffer, matches), matches)
+        if not cut:
+            # Nothing settled (e.g. an unclosed $$): wait for twice the text
+            retry_at = 2 * len(buffer)
+            continue
+        settled = [m for m in matches if m.end() <= cut]
+        output, segment_math = rewrite_tokens(buffer[:cut], settled, linked_snippets, images_map)
+        has_math = has_math or segment_math
+        emit(output, final=False)
+        buffer = buffer[cut:]
+        retry_at = 0
+    
+    output, segment_math = rewrite_tokens(buffer, body_tokens(buffer), linked_snippets, images_map)
+    emit(output, final=True)
+    return has_math or segment_math
+
+
+@timed('convert_to_mdx_stream')
+def convert_to_mdx_stream(
+    chunks: Iterable[str],
+    output_path: Path,
+    title: str,
+    date: Optional[str] = None,
+    display_date: Optional[str] = None,
+    tags: Optional[List[str]] = None,
+    description: Optional[str] = None,
+    linked_snippets: Optional[Dict[str, Dict]] = None,
+    images_map: Optional[Dict[str, str]] = None
+) -> None:
+    """
+    convert_to_mdx for a body arriving in chunks (see iter_body_chunks),
+    written straight to output_path.
+    
+    The body is converted into a temporary file first, since whether the
+    Math import goes at the top is only known at the end; the post is then
+    assembled next to output_path and moved into place.
+    """
+    frontmatter = mdx_frontmatter(title, date, display_date, tags, description)
+    body_path = output_path.with_name(f'.{output_path.name}.{os.getpid()}.body')
+    tmp_path = output_path.with_name(f'.{output_path.name}.{os.getpid()}.tmp')
+    try:
+        with open(body_path, 'w', encoding='utf-8', newline='') as body_file:
+            has_math = rewrite_body_stream(chunks, body_file, linked_snippets or {}, images_map or {})
+        
+        math_import = MATH_IMPORT if has_math else ""
+        with span('write_file', path=output_path.name):
+            with open(tmp_path, 'wb') as out, open(body_path, 'rb') as body_file:
+                out.write(f"{frontmatter}\n\n{math_import}".encode('utf-8'))
+                shutil.copyfileobj(body_file, out)
+            os.replace(tmp_path, output_path)
+    finally:
+        body_path.unlink(missing_ok=True)
+        tmp_path.unlink(missing_ok=True)
+    metrics.count('bytes_written', output_path.stat().st_size)
+    metrics.count('files_written')
+
+
+# ============================================================
+# Main Packaging Functions
+# ============================================================
+
+def read_note(path: Path) -> str:
+    """Read a vault note (timed, bytes counted)."""
+    with span('read_file'):
+        text = path.read_text(encoding='utf-8')
+    metrics.count('bytes_read', path.stat().st_size)
+    return text
+
+
+def write_output(path: Path, text: str) -> None:
+    """Write a generated MDX file (timed, bytes counted)."""
+    data = text.encode('utf-8')
+    with span('write_file', path=path.name):
+        path.write_bytes(data)
+    metrics.count('bytes_written', len(data))
+    metrics.count('files_written')
+
+
+def scan_post(doc_path: Path) -> Dict[str, Any]:
+    """
+    Read what packaging needs from a post note: 'frontmatter', 'source'
+    (text hash) and the scan_body results. Notes of STREAMING_THRESHOLD
+    bytes or more are scanned in chunks and their body isn't kept: 'body'
+    is then None and 'body_start' says where to stream it from.
+    """
+    if doc_path.stat().st_size >= STREAMING_THRESHOLD:
+        frontmatter, body_start, source = scan_note_frontmatter(doc_path)
+        post = scan_body_stream(iter_body_chunks(doc_path, body_start))
+        post.update(frontmatter=frontmatter, source=source, body=None, body_start=body_start)
+        return post
+    
+    content = read_note(doc_path)
+    frontmatter, body = extract_frontmatter(content)
+    post = scan_body(body)
+    post.update(frontmatter=frontmatter, source=text_hash(content), body=body, body_start=None)
+    return post
+
+
+def load_snippet_metadata(snippets_dir: Path = SNIPPETS_DIR) -> Dict[str, Any]:
+    """Load existing snippet metadata."""
+    return read_metadata(snippets_dir / '_metadata.json')
+
+
+def save_snippet_metadata(metadata: Dict[str, Any], snippets_dir: Path = SNIPPETS_DIR) -> None:
+    """
+    Save snippet metadata: the entries replace every stored snippet (slugs
+    not in metadata are deleted) and _metadata.json is re-exported.
+    """
+    store = get_content_store()
+    store.put_snippets(metadata, replace=True)
+    store.export_metadata(snippets_dir / '_metadata.json')
+    _snippet_metadata.pop(snippets_dir, None)
+
+
+_snippet_metadata: Dict[Path, SnippetMetadata] = {}
+
+
+def get_snippet_metadata(snippets_dir: Path = SNIPPETS_DIR) -> SnippetMetadata:
+    """Return the metadata store shared by this run (loaded once per directory)."""
+    if snippets_dir not in _snippet_metadata:
+        _snippet_metadata[snippets_dir] = SnippetMetadata.load(snippets_dir / '_metadata.json')
+    return _snippet_metadata[snippets_dir]
+
+
+def log_ai_check(
+    title: str,
+    result: Dict[str, Any],
+    content_preview: str = "",
+    source: str = "api"
+) -> None:
+    """
+    Log AI quality check results with timestamp.
+    source records where the verdict came from ("api", "cache", "batch" or
+    "heuristic" for quality_prefilter.py rejections).
+    Entries are appended to the daily JSONL log (see ai_check_log.py), so
+    this is safe to call from concurrent quality-check threads and processes.
+    """
+    now = datetime.now()
+    timestamp = now.strftime('%Y-%m-%d_%H-%M-%S')
+    
+    log_entry = {
+        'timestamp': timestamp,
+        'title': title,
+        'source': source,
+        'result': result,
+        'content_preview': content_preview[:500] if content_preview else ''
+    }
+    log_file = append_entry(log_entry, now.strftime('%Y-%m-%d'), LOGS_DIR)
+    
+    # Optionally also create individual log file for easy debugging
+    if PER_CHECK_FILES:
+        individual_log = LOGS_DIR / f'{timestamp}_{slugify(title)}.json'
+        individual_log.write_text(json.dumps(log_entry, indent=2), encoding='utf-8')
+    
+    print(f"     📝 Logged to: {log_file.name}")
+
+
+@timed('create_snippet')
+def create_snippet(
+    title: str,
+    content: str,
+    frontmatter: Dict[str, Any],
+    quality_result: Dict[str, Any],
+    output_dir: Path = SNIPPETS_DIR,
+    metadata: Optional[Dict[str, Any]] = None,
+    linked_snippets: Optional[Dict[str, Dict]] = None,
+    content_hash: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Create a snippet from a linked document.
+    
+    The snippet's entry goes into `metadata` if given, else into the shared
+    metadata store, which is written out at the next flush. Links to notes
+    in `linked_snippets` become snippet links; other links are plain text.
+    content_hash (the hash of the whole note) is stored with the verdict so
+    review_snippets.py can tell when a note changed since its review.
+    
+    Returns dict with:
+    - slug: URL slug
+    - path: Path to created file
+    - passes: Whether quality check passed
+    - quality: Full quality result
+    """
+    slug = slugify(title)
+    snippet_dir = output_dir / slug
+    snippet_dir.mkdir(parents=True, exist_ok=True)
+    
+    # Generate MDX content
+    date = frontmatter.get('date', datetime.now().strftime('%Y-%m-%d'))
+    if isinstance(date, datetime):
+        date = date.strftime('%Y-%m-%d')
+    
+    # Extract and merge tags from body + frontmatter
     body_tags = extract_body_hashtags(content)
     frontmatter_tags = frontmatter.get('tags', []) or []
     
@@ -652,44 +1529,254 @@ def create_snippet(
         date=str(date),
         display_date=display_date,
         tags=all_tags,
-        description=description
+        description=description,
+        linked_snippets=linked_snippets,
+        related=related_snippets(slug)
     )
     
     # Write file
     output_file = snippet_dir / 'index.mdx'
-    output_file.write_text(mdx_content, encoding='utf-8')
+    write_output(output_file, mdx_content)
     
     # Update metadata
-    metadata = load_snippet_metadata(output_dir)
+    record_snippet_verdict(slug, title, quality_result, metadata, content_hash, output_dir)
+    
+    return {
+        'slug': slug,
+        'path': output_file,
+        'passes': quality_result['passes'],
+        'quality': quality_result
+    }
+
+
+def record_snippet_verdict(
+    slug: str,
+    title: str,
+    quality_result: Dict[str, Any],
+    metadata: Optional[Dict[str, Any]] = None,
+    content_hash: Optional[str] = None,
+    output_dir: Path = SNIPPETS_DIR
+) -> None:
+    """Set a snippet's metadata entry from its quality verdict (see create_snippet)."""
+    if metadata is None:
+        metadata = get_snippet_metadata(output_dir)
     metadata[slug] = {
         'title': title,
         'passes': quality_result['passes'],
         'quality_score': quality_result.get('quality_score'),
         'reason': quality_result.get('reason', '')
     }
-    save_snippet_metadata(metadata, output_dir)
+    if quality_result.get('retry_needed'):
+        metadata[slug]['retry_needed'] = True
+    if content_hash:
+        metadata[slug]['content_hash'] = content_hash
+
+
+class _ThreadLocalStdout:
+    """
+    sys.stdout replacement that lets worker threads buffer their own output,
+    so per-link messages can be printed in link order once each worker is done.
+    """
     
-    return {
-        'slug': slug,
-        'path': output_file,
-        'passes': quality_result['passes'],
-        'quality': quality_result
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+    
+    def write(self, text: str) -> int:
+        buffer = getattr(self._local, 'buffer', None)
+        return (buffer if buffer is not None else self.stream).write(text)
+    
+    def flush(self) -> None:
+        self.stream.flush()
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.stream, name)
+    
+    def captured(self, func, *args, **kwargs) -> Tuple[Any, str]:
+        """Run func, returning (result, everything it printed)."""
+        self._local.buffer = io.StringIO()
+        try:
+            return func(*args, **kwargs), self._local.buffer.getvalue()
+        finally:
+            self._local.buffer = None
+
+
+def check_linked_document(
+    target: str,
+    vault_path: str,
+    manifest: BuildManifest,
+    force: bool = False,
+    follow_links: bool = False,
+    refresh_quality: bool = False
+) -> Optional[Dict[str, Any]]:
+    """
+    Read one linked document and quality-check it (unless the build manifest
+    says its snippet is unchanged). Safe to run in a worker thread; writing
+    the snippet is left to the caller.
+    
+    With refresh_quality=True (--refresh-quality) unchanged snippets are
+    quality-checked against the API again too; 'rechecked' is then set and
+    write_linked_snippet records the new verdict without rewriting the MDX.
+    
+    With follow_links=True (graph mode) the snippet's own links are returned
+    too, and its 'links' input is left for write_linked_snippet to compare
+    once the linked snippets are known.
+    
+    Returns None if the document is not in the vault, else a dict with:
+    - target, snippet_file, inputs: manifest bookkeeping
+    - reason: why the snippet needs rebuilding (None if unchanged)
+    - quality: the (possibly recorded) quality verdict
+    - rechecked: True if an unchanged snippet's verdict was refreshed
+    - frontmatter, body: the parsed document (only when rebuilding)
+    - content, links: raw note and linked note titles (only with follow_links)
+    """
+    linked_doc_path = find_document(target, vault_path)
+    if not linked_doc_path:
+        print(f"  ⚠️  Linked doc not found: {target}")
+        return None
+    
+    # Read linked document
+    linked_content = read_note(linked_doc_path)
+    
+    # Skip snippets built from the same note by the same converter
+    snippet_file = SNIPPETS_DIR / slugify(target) / 'index.mdx'
+    snippet_inputs = {
+        'converter': CONVERTER_VERSION,
+        'source': text_hash(linked_content),
+        'min_score': MIN_QUALITY_SCORE,
+        'prefilter': prefilter_settings(),
     }
+    linked = {
+        'target': target,
+        'snippet_file': snippet_file,
+        'inputs': snippet_inputs,
+        'reason': 'forced rebuild' if force else manifest.check(
+            snippet_file, snippet_inputs),
+    }
+    if follow_links:
+        linked['content'] = linked_content
+        linked['links'] = list(dict.fromkeys(
+            l['target'] for l in parse_wiki_links(linked_content) if not l['is_image']))
+    if linked['reason'] is None:
+        linked['quality'] = manifest.get(snippet_file)['quality']
+        if not refresh_quality:
+            print(f"  ⏭️  Unchanged linked doc: {target}")
+            return linked
+        print(f"  🔄 Re-checking unchanged linked doc: {target}")
+        _, body = extract_frontmatter(linked_content)
+    else:
+        print(f"  📝 Processing linked doc: {target} ({linked['reason']})")
+        linked['frontmatter'], linked['body'] = extract_frontmatter(linked_content)
+        body = linked['body']
+    
+    # Quality check
+    quality = check_quality(body, target, refresh=refresh_quality)
+    if linked['reason'] is None:
+        # Keep the recorded verdict if the new check couldn't be done
+        if 'error' not in quality and not quality.get('unchecked'):
+            linked['quality'] = quality
+            linked['rechecked'] = True
+        quality = linked['quality']
+    status = "✅ PASS" if quality['passes'] else "❌ FAIL"
+    if quality.get('retry_needed'):
+        status = "🔁 RETRY NEEDED"
+    print(f"     Quality check: {status} (score: {quality.get('quality_score', 'N/A')})")
+    linked['quality'] = quality
+    
+    return linked
+
+
+def write_linked_snippet(
+    linked: Dict[str, Any],
+    manifest: BuildManifest,
+    metadata: Optional[Dict[str, Any]] = None,
+    snippet_links: Optional[Dict[str, Dict]] = None
+) -> Dict[str, Any]:
+    """
+    Write the snippet for a check_linked_document result (if it needs
+    rebuilding) and record it in the manifest. In graph mode,
+    `snippet_links` maps the snippet's own links to their snippets and
+    becomes part of its manifest inputs.
+    Returns the {'slug', 'passes'} entry posts link against.
+    """
+    target = linked['target']
+    quality = linked['quality']
+    
+    if snippet_links is not None:
+        linked['inputs']['links'] = snippet_links
+        if linked['reason'] is None:
+            linked['reason'] = manifest.check(linked['snippet_file'], linked['inputs'])
+            if linked['reason'] is not None:
+                print(f"  🔗 Relinking snippet: {target} ({linked['reason']})")
+                linked['frontmatter'], linked['body'] = extract_frontmatter(linked['content'])
+    
+    if linked['reason'] is None:
+        if linked.get('rechecked'):
+            record_snippet_verdict(slugify(target), target, quality, metadata, linked['inputs']['source'])
+            manifest.update(linked['snippet_file'], quality=quality)
+        return {'slug': slugify(target), 'passes': quality['passes']}
+    
+    # Create snippet
+    snippet_result = create_snippet(
+        title=target,
+        content=linked['body'],
+        frontmatter=linked['frontmatter'],
+        quality_result=quality,
+        metadata=metadata,
+        linked_snippets=snippet_links,
+        content_hash=linked['inputs']['source']
+    )
+    
+    # Errored or skipped checks are retried next run rather than recorded
+    if 'error' not in quality and not quality.get('unchecked'):
+        manifest.record(linked['snippet_file'], linked['inputs'], quality=quality)
+    
+    return {'slug': snippet_result['slug'], 'passes': snippet_result['passes']}
+
+
+_build_manifest: Optional[BuildManifest] = None
+
+
+def get_build_manifest() -> BuildManifest:
+    """Return the (lazily loaded) build manifest shared by this run."""
+    global _build_manifest
+    if _build_manifest is None:
+        _build_manifest = BuildManifest.load(root=BLOG_ROOT)
+    return _build_manifest
 
 
 def package_post(
     title: str,
     vault_path: str = OBSIDIAN_VAULT_PATH,
     output_dir: Path = POSTS_DIR,
-    process_snippets: bool = True
+    process_snippets: bool = True,
+    force: bool = False,
+    manifest: Optional[BuildManifest] = None,
+    concurrency: int = QUALITY_CHECK_CONCURRENCY,
+    linked_snippets: Optional[Dict[str, Dict[str, Any]]] = None
 ) -> Optional[Dict[str, Any]]:
     """
     Package an Obsidian document as a blog post.
     
+    Outputs whose inputs (source note, images, linked snippets, converter
+    version) match the build manifest are left untouched unless force=True.
+    
+    Linked documents are read and quality-checked by up to `concurrency`
+    worker threads; snippets are written one at a time in link order.
+    Pass `linked_snippets` (target -> {'slug', 'passes'}) when the snippets
+    have already been built, as package_posts_parallel does.
+    
+    The shared manifest and snippet metadata are saved before returning; a
+    manifest passed in by the caller is left for the caller to save.
+    
     Returns dict with packaging results or None if document not found.
     """
     print(f"\n📦 Packaging: {title}")
     
+    save_manifest = manifest is None
+    if save_manifest:
+        manifest = get_build_manifest()
+    
     # Find document
     doc_path = find_document(title, vault_path)
     if not doc_path:
@@ -698,17 +1785,20 @@ def package_post(
     
     print(f"  📄 Found: {doc_path}")
     
-    # Read content
-    content = doc_path.read_text(encoding='utf-8')
-    frontmatter, body = extract_frontmatter(content)
+    # Read content (large notes are scanned in chunks, not kept in memory)
+    post = scan_post(doc_path)
+    frontmatter = post['frontmatter']
     
     # Create post directory
     slug = slugify(title)
     post_dir = output_dir / slug
     post_dir.mkdir(parents=True, exist_ok=True)
+    output_file = post_dir / 'index.mdx'
+    previous = manifest.get(output_file) or {}
+    previous_images = previous.get('inputs', {}).get('images', {})
     
-    # Extract hashtags from body and merge with frontmatter tags
-    body_tags = extract_body_hashtags(body)
+    # Merge hashtags from the body with frontmatter tags
+    body_tags = post['tags']
     frontmatter_tags = frontmatter.get('tags', []) or []
     
     # Merge tags (body tags + frontmatter tags, deduplicated)
@@ -723,107 +1813,737 @@ def package_post(
     all_tags = [t for t in all_tags if t.lower() not in FILTERED_TAGS]
     print(f"  🏷️  Tags: {all_tags}")
     
-    # Extract display date from body
-    display_date = extract_display_date(body)
+    # Display date from the body
+    display_date = post['display_date']
     if display_date:
         print(f"  📅 Display date: {display_date}")
     
-    # Find all image embeds (![[image.png]])
-    image_embeds = IMAGE_EMBED_PATTERN.findall(body)
+    # Image embeds (![[image.png]]) and image wiki-links, then linked notes,
+    # each once in order of appearance
+    all_images = post['images']
+    links = post['links']
+    print(f"  🔗 Found {len(links)} linked notes, {len(all_images)} images")
     
-    # Also check wiki-links for images
-    links = parse_wiki_links(body)
-    image_links = [l['target'] for l in links if l['is_image']]
-    
-    # Combine all image references
-    all_images = list(set(image_embeds + image_links))
-    print(f"  🔗 Found {len(links)} wiki-links, {len(all_images)} images")
-    
-    # Process images
-    images_map = {}
+    # Locate images and hash their sources
+    found_images = []
     for img_name in all_images:
         img_path = find_image(img_name, vault_path)
         if img_path:
-            # Sanitize filename for filesystem (replace spaces with underscores)
-            safe_name = img_name.replace(' ', '_')
-            dest_path = post_dir / safe_name
-            shutil.copy2(img_path, dest_path)
-            images_map[img_name] = safe_name
-            print(f"  🖼️  Copied image: {img_name} -> {safe_name}")
+            found_images.append((img_name, img_path, manifest.file_hash(img_path)))
         else:
             print(f"  ⚠️  Image not found: {img_name}")
     
-    # Process linked documents as snippets
-    linked_snippets = {}
-    if process_snippets:
-        doc_links = [l for l in links if not l['is_image']]
-        for link in doc_links:
-            target = link['target']
-            if target in linked_snippets:
-                continue
-            
-            linked_doc_path = find_document(target, vault_path)
-            if linked_doc_path:
-                print(f"  📝 Processing linked doc: {target}")
-                
-                # Read linked document
-                linked_content = linked_doc_path.read_text(encoding='utf-8')
-                linked_fm, linked_body = extract_frontmatter(linked_content)
-                
-                # Quality check
-                quality = check_quality(linked_body, target)
-                status = "✅ PASS" if quality['passes'] else "❌ FAIL"
-                print(f"     Quality check: {status} (score: {quality.get('quality_score', 'N/A')})")
-                
-                # Create snippet
-                snippet_result = create_snippet(
-                    title=target,
-                    content=linked_body,
-                    frontmatter=linked_fm,
-                    quality_result=quality
-                )
-                
-                linked_snippets[target] = {
-                    'slug': snippet_result['slug'],
-                    'passes': snippet_result['passes']
-                }
-            else:
-                print(f"  ⚠️  Linked doc not found: {target}")
+    # Optionally resize/re-encode them (cached by source hash, in a process pool)
+    optimized = {}
+    if image_optimizer is not None and found_images:
+        with span('optimize_images'):
+            optimized = image_optimizer.optimize_all([(path, sha) for _, path, sha in found_images])
     
-    # Convert to MDX
-    date = frontmatter.get('date', datetime.now().strftime('%Y-%m-%d'))
-    if isinstance(date, datetime):
-        date = date.strftime('%Y-%m-%d')
-    
-    description = frontmatter.get('description', '')
+    # Process images: publish from the image store, skipping destinations
+    # that already hold the same content. image_hashes are of the published
+    # files, so changing optimizer settings rebuilds the post.
+    images_map = {}
+    image_hashes = {}
+    for img_name, img_path, source_sha in found_images:
+        # Sanitize filename for filesystem (replace spaces with underscores)
+        safe_name = img_name.replace(' ', '_')
+        publish_path, publish_sha = img_path, source_sha
+        if optimized.get(source_sha):
+            publish_path = optimized[source_sha]
+            publish_sha = manifest.file_hash(publish_path)
+            optimized_name = image_optimizer.output_name(safe_name)
+            if optimized_name in images_map.values():
+                optimized_name = safe_name + Path(optimized_name).suffix
+            safe_name = optimized_name
+        
+        dest_path = post_dir / safe_name
+        image_hashes[img_name] = publish_sha
+        images_map[img_name] = safe_name
+        if not force and dest_path.exists() and (
+            previous_images.get(img_name) == image_hashes[img_name]
+            or manifest.file_hash(dest_path) == image_hashes[img_name]
+        ):
+            continue
+        with span('publish_image', image=img_name):
+            method = image_store.publish(publish_path, publish_sha, dest_path)
+        if method is None:
+            continue
+        metrics.count(f'images_{method}')
+        if method == 'copied':
+            metrics.count('bytes_written', dest_path.stat().st_size)
+        print(f"  🖼️  {method.capitalize()} image: {img_name} -> {safe_name}")
     
-    mdx_content = convert_to_mdx(
-        content=body,
-        title=title,
-        date=str(date),
-        display_date=display_date,
-        tags=all_tags,  # Use merged tags from body + frontmatter
-        description=description,
-        linked_snippets=linked_snippets,
-        images_map=images_map
-    )
+    # Process linked documents as snippets
+    if linked_snippets is not None:
+        process_snippets = False
+    linked_snippets = dict(linked_snippets or {})
+    if process_snippets:
+        # Unique targets in link order
+        targets = links
+        
+        # Read and check linked docs concurrently; write snippets in link order
+        stdout = _ThreadLocalStdout(sys.stdout)
+        sys.stdout = stdout
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+                futures = [
+                    pool.submit(stdout.captured, check_linked_document, target, vault_path, manifest, force,
+                                False, quality_cache.refresh)
+                    for target in targets
+                ]
+                for future in futures:
+                    linked, output = future.result()
+                    stdout.stream.write(output)
+                    if linked is not None:
+                        linked_snippets[linked['target']] = write_linked_snippet(linked, manifest)
+        finally:
+            sys.stdout = stdout.stream
+    
+    # Flag linked snippets that the last similarity run found near-duplicated
+    for a, b, similarity in duplicates_among([info['slug'] for info in linked_snippets.values()]):
+        print(f"  👯 Near-duplicate snippets: {a} / {b} (similarity {similarity:.2f})")
+    
+    # Skip the post itself if nothing it is built from changed
+    post_inputs = {
+        'converter': CONVERTER_VERSION,
+        'source': post['source'],
+        'images': image_hashes,
+        'links': linked_snippets,
+    }
+    reason = 'forced rebuild' if force else manifest.check(output_file, post_inputs)
+    
+    if reason is None:
+        print(f"  ⏭️  Unchanged: {output_file}")
+    else:
+        # Convert to MDX
+        date = frontmatter.get('date', datetime.now().strftime('%Y-%m-%d'))
+        if isinstance(date, datetime):
+            date = date.strftime('%Y-%m-%d')
+        
+        description = frontmatter.get('description', '')
+        
+        mdx_args = dict(
+            title=title,
+            date=str(date),
+            display_date=display_date,
+            tags=all_tags,  # Use merged tags from body + frontmatter
+            description=description,
+            linked_snippets=linked_snippets,
+            images_map=images_map
+        )
+        
+        # Write post
+        if post['body'] is None:
+            convert_to_mdx_stream(iter_body_chunks(doc_path, post['body_start']), output_file, **mdx_args)
+        else:
+            write_output(output_file, convert_to_mdx(content=post['body'], **mdx_args))
+        manifest.record(output_file, post_inputs)
+        print(f"  ✅ Created: {output_file} ({reason})")
+    get_content_store().put_post(slug, title, post['source'])
     
-    # Write post
-    output_file = post_dir / 'index.mdx'
-    output_file.write_text(mdx_content, encoding='utf-8')
-    print(f"  ✅ Created: {output_file}")
+    if save_manifest:
+        with span('save_state'):
+            manifest.save()
+            get_snippet_metadata().flush()
     
     return {
         'title': title,
         'slug': slug,
         'path': output_file,
         'images': list(images_map.keys()),
-        'snippets': linked_snippets
+        'snippets': linked_snippets,
+        'rebuilt': reason is not None,
+        'reason': reason
     }
 
 
+# ============================================================
+# Multi-Process Packaging
+# ============================================================
+
+def _init_worker(
+    refresh_quality: bool,
+    record_events: bool,
+    optimizer: Optional[ImageOptimizer],
+    jobs: int
+) -> None:
+    """Carry command-line settings over to a worker process, with its share of the API budget."""
+    global image_optimizer
+    quality_cache.refresh = refresh_quality
+    metrics.record_events = record_events
+    image_optimizer = optimizer
+    request_limiter.scale(1 / jobs)
+
+
+def _snippet_job(target: str, vault_path: str, force: bool) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any], Dict[str, Any], str, Dict[str, Any]]:
+    """
+    Worker: check and write one linked document's snippet.
+    Returns (linked entry or None, metadata entries, manifest changes, output, metrics).
+    """
+    metrics.reset()
+    manifest = BuildManifest.load(root=BLOG_ROOT)
+    metadata: Dict[str, Any] = {}
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        linked = check_linked_document(target, vault_path, manifest, force,
+                                       refresh_quality=quality_cache.refresh)
+        entry = write_linked_snippet(linked, manifest, metadata) if linked else None
+    return entry, metadata, manifest.take_changes(), output.getvalue(), metrics.snapshot()
+
+
+def _post_job(
+    title: str,
+    vault_path: str,
+    linked_snippets: Dict[str, Dict[str, Any]],
+    force: bool
+) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any], str, Dict[str, Any]]:
+    """
+    Worker: package one post against already-built snippets.
+    Returns (package_post result, manifest changes, output, metrics).
+    """
+    metrics.reset()
+    manifest = BuildManifest.load(root=BLOG_ROOT)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        result = package_post(title, vault_path, force=force, manifest=manifest,
+                              linked_snippets=linked_snippets)
+    return result, manifest.take_changes(), output.getvalue(), metrics.snapshot()
+
+
+def package_posts_parallel(
+    titles: List[str],
+    jobs: int,
+    vault_path: str = OBSIDIAN_VAULT_PATH,
+    force: bool = False,
+    refresh_quality: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Package several posts across `jobs` worker processes.
+    
+    Runs in two phases so workers never write the same file:
+    1. every snippet linked from any of the posts is checked and written
+       once, however many posts link it;
+    2. the posts themselves are converted against those snippets.
+    
+    Workers hand their _metadata.json entries and manifest changes back to
+    this process, which merges and saves them (and adds their timings to
+    the shared metrics); the daily AI log is guarded by a file lock.
+    Output is printed in the order the posts are listed.
+    """
+    # Imported here: it pulls in multiprocessing, which only --jobs needs
+    from concurrent.futures import ProcessPoolExecutor
+    
+    manifest = get_build_manifest()
+    titles = list(dict.fromkeys(titles))
+    
+    # Linked documents of every post, in link order
+    post_targets: Dict[str, List[str]] = {}
+    for title in titles:
+        doc_path = find_document(title, vault_path)
+        if not doc_path:
+            continue
+        post_targets[title] = scan_post(doc_path)['links']
+    targets = list(dict.fromkeys(t for post in post_targets.values() for t in post))
+    
+    print(f"\n🧵 Packaging {len(titles)} posts ({len(targets)} linked docs) with {jobs} worker processes")
+    
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(refresh_quality, metrics.record_events, image_optimizer, jobs)) as pool:
+        # Phase 1: each snippet once
+        snippets: Dict[str, Dict[str, Any]] = {}
+        metadata = get_snippet_metadata()
+        checked = pool.map(_snippet_job, targets, repeat(vault_path), repeat(force))
+        for target, (entry, meta, changes, output, worker_metrics) in zip(targets, checked):
+            sys.stdout.write(output)
+            metrics.merge(worker_metrics)
+            if entry is not None:
+                snippets[target] = entry
+            metadata.update(meta)
+            manifest.merge(changes)
+        metadata.flush()
+        manifest.save()
+        
+        # Phase 2: posts
+        post_snippets = [
+            {t: snippets[t] for t in post_targets.get(title, []) if t in snippets}
+            for title in titles
+        ]
+        packaged = pool.map(_post_job, titles, repeat(vault_path), post_snippets, repeat(force))
+        for result, changes, output, worker_metrics in packaged:
+            sys.stdout.write(output)
+            metrics.merge(worker_metrics)
+            manifest.merge(changes)
+            if result:
+                results.append(result)
+        manifest.save()
+    
+    return results
+
+
+# ============================================================
+# Snippet Graph Packaging
+# ============================================================
+
+def crawl_snippet_graph(
+    targets: List[str],
+    max_depth: int,
+    vault_path: str = OBSIDIAN_VAULT_PATH,
+    manifest: Optional[BuildManifest] = None,
+    force: bool = False,
+    concurrency: int = QUALITY_CHECK_CONCURRENCY
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Check every note reachable from `targets` (depth 1) by following wiki-links
+    breadth-first, up to `max_depth` links away.
+    
+    A single visited set and work queue cover the whole crawl, so each note
+    is read and quality-checked once however many posts or snippets link it.
+    Each level is checked by up to `concurrency` threads; output is printed
+    in queue order.
+    
+    Returns check_linked_document results keyed by title, in visit order.
+    """
+    if manifest is None:
+        manifest = get_build_manifest()
+    
+    graph: Dict[str, Dict[str, Any]] = {}
+    visited = set(targets)
+    level = list(dict.fromkeys(targets))
+    depth = 1
+    
+    stdout = _ThreadLocalStdout(sys.stdout)
+    sys.stdout = stdout
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            while level:
+                print(f"\n🕸️  Depth {depth}: {len(level)} notes")
+                futures = [
+                    pool.submit(stdout.captured, check_linked_document, target, vault_path, manifest, force,
+                                True, quality_cache.refresh)
+                    for target in level
+                ]
+                next_level = []
+                for future in futures:
+                    linked, output = future.result()
+                    stdout.stream.write(output)
+                    if linked is None:
+                        continue
+                    graph[linked['target']] = linked
+                    if depth < max_depth:
+                        for target in linked['links']:
+                            if target not in visited:
+                                visited.add(target)
+                                next_level.append(target)
+                level = next_level
+                depth += 1
+    finally:
+        sys.stdout = stdout.stream
+    
+    return graph
+
+
+def package_posts_graph(
+    titles: List[str],
+    max_depth: int,
+    vault_path: str = OBSIDIAN_VAULT_PATH,
+    force: bool = False,
+    concurrency: int = QUALITY_CHECK_CONCURRENCY
+) -> List[Dict[str, Any]]:
+    """
+    Package posts together with every snippet within `max_depth` links of
+    them (see crawl_snippet_graph). Snippets link to the other snippets in
+    the graph instead of flattening those links to plain text.
+    """
+    manifest = get_build_manifest()
+    titles = list(dict.fromkeys(titles))
+    
+    # Direct links of every post
+    post_targets: Dict[str, List[str]] = {}
+    for title in titles:
+        doc_path = find_document(title, vault_path)
+        if not doc_path:
+            continue
+        post_targets[title] = scan_post(doc_path)['links']
+    
+    targets = [t for post in post_targets.values() for t in post]
+    graph = crawl_snippet_graph(targets, max_depth, vault_path, manifest, force, concurrency)
+    print(f"\n🕸️  Snippet graph: {len(graph)} notes within depth {max_depth}")
+    
+    # Every snippet's pass/fail is known now, so links between snippets can be rendered
+    snippets = {target: {'slug': slugify(target), 'passes': linked['quality']['passes']}
+                for target, linked in graph.items()}
+    for linked in graph.values():
+        snippet_links = {t: snippets[t] for t in linked['links'] if t in snippets}
+        write_linked_snippet(linked, manifest, snippet_links=snippet_links)
+    
+    results = []
+    for title in titles:
+        post_snippets = {t: snippets[t] for t in post_targets.get(title, []) if t in snippets}
+        result = package_post(title, vault_path, force=force, linked_snippets=post_snippets)
+        if result:
+            results.append(result)
+    
+    with span('save_state'):
+        manifest.save()
+        get_snippet_metadata().flush()
+    return results
+
+
+def package_posts(
+    titles: List[str],
+    vault_path: str = OBSIDIAN_VAULT_PATH,
+    depth: int = 1,
+    jobs: int = 1,
+    force: bool = False,
+    concurrency: int = QUALITY_CHECK_CONCURRENCY,
+    refresh_quality: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Package posts with their snippet graph when depth > 1, across `jobs`
+    worker processes when jobs > 1, and one at a time otherwise.
+    """
+    if depth > 1:
+        return package_posts_graph(titles, depth, vault_path, force=force, concurrency=concurrency)
+    if jobs > 1:
+        return package_posts_parallel(titles, jobs, vault_path, force=force, refresh_quality=refresh_quality)
+    results = []
+    for title in titles:
+        result = package_post(title, vault_path, force=force, concurrency=concurrency)
+        if result:
+            results.append(result)
+    return results
+
+
+# ============================================================
+# Link Graph
+# ============================================================
+
+def note_link_targets(text: str) -> List[str]:
+    """Targets of the document wiki-links in a note's body (images excluded)."""
+    _, body = extract_frontmatter(text)
+    return [link['target'] for link in parse_wiki_links(body) if not link['is_image']]
+
+
+def published_slugs() -> Set[str]:
+    """Slugs of the packaged posts and of the snippets with a public page."""
+    posts = {path.parent.name for path in POSTS_DIR.glob('*/index.mdx')}
+    snippets = {path.parent.name for path in SNIPPETS_DIR.glob('*/index.mdx')}
+    return posts | (snippets - unpublished_snippets())
+
+
+def snippet_page_links() -> Dict[str, Set[str]]:
+    """
+    Link targets each packaged snippet's page renders as links, by slug.
+    Snippets only get links when packaged in graph mode (--depth > 1), where
+    their manifest inputs record the snippets they link to; otherwise every
+    link is flattened to plain text.
+    """
+    manifest = get_build_manifest()
+    page_links = {}
+    for path in SNIPPETS_DIR.glob('*/index.mdx'):
+        record = manifest.get(path) or {}
+        links = record.get('inputs', {}).get('links') or {}
+        page_links[path.parent.name] = {target for target, snippet in links.items() if snippet['passes']}
+    return page_links
+
+
+@timed('update_link_graph')
+def update_link_graph(vault_path: str = OBSIDIAN_VAULT_PATH) -> Dict[str, Any]:
+    """
+    Refresh the vault's link graph, re-reading only notes changed since the
+    last run, and export the part covering published posts and snippets to
+    content/link-graph.json for gatsby-node.js. Returns the exported graph.
+    """
+    index = get_vault_index(vault_path)
+    graph = LinkGraph.load(vault_path)
+    graph.refresh(index.documents.values(), note_link_targets)
+    exported = graph.build(index.find_document, slugify, published_slugs(), snippet_page_links())
+    written = write_link_graph(exported)
+    
+    link_count = sum(len(note.get('links', ())) for note in exported['notes'].values())
+    print(f"🕸️  Link graph: {len(exported['notes'])} notes, {link_count} links, "
+          f"{len(exported['unresolved'])} unresolved targets "
+          f"({graph.reparsed} notes re-read{', exported' if written else ', unchanged'})")
+    return exported
+
+
+# ============================================================
+# Search Index
+# ============================================================
+
+def unpublished_snippets() -> Set[str]:
+    """Slugs of snippets without a public page: hidden ones and ones that failed their check."""
+    try:
+        hidden = set(json.loads(HIDDEN_SNIPPETS_PATH.read_text(encoding='utf-8')).get('hidden', []))
+    except (OSError, ValueError):
+        hidden = set()
+    failed = {slug for slug, entry in get_snippet_metadata().items() if entry.get('passes') is False}
+    return hidden | failed
+
+
+@timed('update_search_index')
+def update_search_index() -> Dict[str, Any]:
+    """
+    Re-index the posts and snippets whose MDX changed since the last run and
+    update the sharded search index in static/search/ (see search_index.py).
+    Returns the exported manifest.
+    """
+    index = SearchIndex.load()
+    index.refresh(slugify)
+    manifest, shards = index.build({('snippet', slug) for slug in unpublished_snippets()})
+    changed = write_search_index(manifest, shards)
+    
+    documents = sum(doc is not None for doc in manifest['docs'])
+    terms = sum(len(shard) for shard in shards.values())
+    print(f"🔎 Search index: {documents} documents, {terms} terms in {len(shards)} shards "
+          f"({index.reindexed} re-indexed, {changed} files updated)")
+    return manifest
+
+
+# ============================================================
+# Related Snippets
+# ============================================================
+
+@timed('update_related_snippets')
+def update_related_snippets() -> Dict[str, Any]:
+    """
+    Embed new or changed snippets, recompute each snippet's most similar
+    published snippets and near-duplicate pairs (see note_similarity.py),
+    and rewrite the `related:` frontmatter of snippets whose list changed.
+    Returns the similarity results.
+    """
+    snippets = {}
+    for path in sorted(SNIPPETS_DIR.glob('*/index.mdx')):
+        mdx = path.read_text(encoding='utf-8')
+        title, text = indexable_text(mdx)
+        snippets[path.parent.name] = {'title': title or path.parent.name, 'text': text, 'hash': text_hash(text)}
+    
+    published = set(snippets) - unpublished_snippets()
+    results = note_similarity.update(snippets, published)
+    
+    rewritten = 0
+    for slug in snippets:
+        path = SNIPPETS_DIR / slug / 'index.mdx'
+        mdx = path.read_text(encoding='utf-8')
+        updated = set_related_frontmatter(mdx, related_snippets(slug))
+        if updated != mdx:
+            write_output(path, updated)
+            rewritten += 1
+    
+    print(f"🧭 Related snippets: {len(snippets)} snippets ({results['backend']}, "
+          f"{results['embedded']} embedded, {rewritten} rewritten)")
+    for a, b, similarity in results['duplicates']:
+        print(f"  👯 Near-duplicate snippets: {a} / {b} (similarity {similarity:.2f})")
+    return results
+
+
+# ============================================================
+# Watch Mode
+# ============================================================
+
+# Seconds between polls of the vault
+WATCH_POLL_INTERVAL = 0.2
+
+# Keep polling at this interval until a poll finds nothing new, so an
+# editor's burst of saves triggers one repackage
+WATCH_DEBOUNCE = 0.05
+
+
+def post_dependencies(title: str, vault_path: str = OBSIDIAN_VAULT_PATH, depth: int = 1) -> Set[Path]:
+    """
+    Vault files a post is built from: its note, its images and the notes up
+    to `depth` links away (see package_posts_graph).
+    """
+    doc_path = find_document(title, vault_path)
+    if not doc_path:
+        return set()
+    
+    try:
+        post = scan_post(doc_path)
+    except OSError:
+        return {doc_path}
+    
+    deps = {doc_path}
+    for path in [find_image(name, vault_path) for name in post['images']]:
+        if path:
+            deps.add(path)
+    
+    # Linked notes, breadth-first like crawl_snippet_graph
+    visited = set()
+    level = list(post['links'])
+    for distance in range(1, depth + 1):
+        next_level = []
+        for target in level:
+            if target in visited:
+                continue
+            visited.add(target)
+            path = find_document(target, vault_path)
+            if not path:
+                continue
+            deps.add(path)
+            if distance < depth:
+                try:
+                    next_level.extend(note_link_targets(read_note(path)))
+                except OSError:
+                    pass
+        level = next_level
+    return deps
+
+
+class VaultWatcher:
+    """
+    Polls the files the watched posts depend on (by mtime and size) and
+    reports which posts are affected by a change.
+    
+    Directory changes (notes added, removed or renamed) are picked up by
+    refreshing the vault index, after which every post's dependencies are
+    recomputed, so a post starts tracking a linked note as soon as it is
+    created.
+    """
+    
+    def __init__(self, titles: List[str], vault_path: str = OBSIDIAN_VAULT_PATH, depth: int = 1):
+        self.titles = list(dict.fromkeys(titles))
+        self.vault_path = vault_path
+        self.depth = depth
+        self.index = get_vault_index(vault_path)
+        self.deps: Dict[str, Set[Path]] = {}
+        self.snapshot: Dict[Path, Optional[Tuple[int, int]]] = {}
+        for title in self.titles:
+            self._track(title)
+    
+    @staticmethod
+    def _stat(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def _track(self, title: str) -> bool:
+        """Recompute a post's dependencies. Returns True if they changed."""
+        deps = post_dependencies(title, self.vault_path, self.depth)
+        changed = deps != self.deps.get(title)
+        self.deps[title] = deps
+        for path in deps:
+            if path not in self.snapshot:
+                self.snapshot[path] = self._stat(path)
+        return changed
+    
+    def poll(self) -> Set[str]:
+        """Titles of posts whose inputs changed since the last poll."""
+        affected = set()
+        
+        if self.index.refresh():
+            affected.update(title for title in self.titles if self._track(title))
+        
+        for path, previous in list(self.snapshot.items()):
+            current = self._stat(path)
+            if current != previous:
+                self.snapshot[path] = current
+                affected.update(title for title, deps in self.deps.items() if path in deps)
+        
+        # Edited posts may now link different notes and images
+        for title in affected:
+            self._track(title)
+        
+        return affected
+
+
+def watch(
+    titles: List[str],
+    vault_path: str = OBSIDIAN_VAULT_PATH,
+    poll_interval: float = WATCH_POLL_INTERVAL,
+    related: bool = False,
+    depth: int = 1,
+    jobs: int = 1,
+    concurrency: int = QUALITY_CHECK_CONCURRENCY
+) -> None:
+    """
+    Repackage posts whenever a note or image they are built from changes.
+    The build manifest keeps each repackage down to the outputs that
+    actually changed. Posts are repackaged the way the first run packaged
+    them (depth, jobs; see package_posts) but always incrementally, since
+    --force only applies to the first run. With depth > 1 notes
+    up to `depth` links away are watched too. With related=True, related
+    snippets are recomputed after each repackage. Runs until interrupted.
+    """
+    watcher = VaultWatcher(titles, vault_path, depth)
+    print(f"\n👀 Watching {len(watcher.snapshot)} files for {len(watcher.titles)} posts "
+          f"(polling every {poll_interval}s, Ctrl+C to stop)")
+    
+    try:
+        while True:
+            time.sleep(poll_interval)
+            affected = watcher.poll()
+            if not affected:
+                continue
+            
+            # Debounce: wait for the burst of writes to settle
+            while True:
+                time.sleep(WATCH_DEBOUNCE)
+                more = watcher.poll()
+                if not more:
+                    break
+                affected |= more
+            
+            started = time.perf_counter()
+            package_posts([title for title in watcher.titles if title in affected], vault_path,
+                          depth=depth, jobs=jobs, concurrency=concurrency)
+            update_link_graph(vault_path)
+            if related:
+                update_related_snippets()
+            update_search_index()
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"\n⚡ Repackaged {len(affected)} post(s) in {elapsed:.0f} ms")
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching.")
+
+
 def main():
     """Main entry point."""
+    parser = argparse.ArgumentParser(description="Package Obsidian documents into the blog.")
+    parser.add_argument('--force', action='store_true',
+                        help="Rebuild every output even if the build manifest says it is unchanged")
+    parser.add_argument('--refresh-quality', action='store_true',
+                        help="Ignore cached quality verdicts and re-run every check against the API")
+    parser.add_argument('--concurrency', type=int, default=QUALITY_CHECK_CONCURRENCY,
+                        help=f"Linked documents to quality-check in parallel (default: {QUALITY_CHECK_CONCURRENCY})")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="Worker processes for packaging posts (default: 1, sequential)")
+    parser.add_argument('--depth', type=int, default=1,
+                        help="Follow links from snippets too, up to N links from a post (default: 1, direct links only)")
+    parser.add_argument('--watch', action='store_true',
+                        help="After packaging, keep repackaging posts as their notes and images change")
+    parser.add_argument('--optimize-images', action='store_true',
+                        help="Resize and re-encode images before publishing them (needs Pillow)")
+    parser.add_argument('--image-format', choices=sorted(IMAGE_FORMATS), default='webp',
+                        help="Format for --optimize-images (default: webp)")
+    parser.add_argument('--max-image-width', type=int, default=1600,
+                        help="Maximum width for --optimize-images (default: 1600)")
+    parser.add_argument('--related', action='store_true',
+                        help="List similar snippets in each snippet's frontmatter and flag near-duplicates (needs NumPy)")
+    parser.add_argument('--metrics', type=Path, metavar='FILE',
+                        help="Write span timings and counters to FILE as JSON")
+    parser.add_argument('--trace', type=Path, metavar='FILE',
+                        help="Write a Chrome trace (chrome://tracing, ui.perfetto.dev) to FILE")
+    args = parser.parse_args()
+    
+    metrics.record_events = args.trace is not None
+    
+    global image_optimizer
+    if args.optimize_images:
+        if pillow_available():
+            image_optimizer = ImageOptimizer(args.image_format, args.max_image_width)
+        else:
+            print("⚠️  Pillow is not installed - publishing images unoptimized (pip install Pillow)")
+    
+    if args.related and not numpy_available():
+        print("⚠️  NumPy is not installed - keeping the last related snippets (pip install numpy)")
+        args.related = False
+    
+    quality_cache.refresh = args.refresh_quality
+    
     print("=" * 60)
     print("Obsidian to Blog Packager")
     print("=" * 60)
@@ -836,20 +2556,32 @@ def main():
     print(f"\nVault path: {OBSIDIAN_VAULT_PATH}")
     print(f"Posts to package: {len(POSTS_TO_PACKAGE)}")
     
+    # Index the vault once; later lookups are dictionary hits
+    vault_index = get_vault_index(OBSIDIAN_VAULT_PATH)
+    print(f"Vault index: {len(vault_index.documents)} documents, {len(vault_index.images)} images "
+          f"({vault_index.rescanned_dirs} directories rescanned)")
+    
     # Ensure output directories exist
     POSTS_DIR.mkdir(parents=True, exist_ok=True)
     SNIPPETS_DIR.mkdir(parents=True, exist_ok=True)
     
-    results = []
-    for title in POSTS_TO_PACKAGE:
-        result = package_post(title)
-        if result:
-            results.append(result)
+    if args.depth > 1 and args.jobs > 1:
+        print("\n⚠️  --jobs is ignored with --depth; the graph is crawled with --concurrency threads")
+    results = package_posts(POSTS_TO_PACKAGE, depth=args.depth, jobs=args.jobs, force=args.force,
+                            concurrency=args.concurrency, refresh_quality=args.refresh_quality)
+    
+    print()
+    update_link_graph(OBSIDIAN_VAULT_PATH)
+    if args.related:
+        update_related_snippets()
+    update_search_index()
     
     print("\n" + "=" * 60)
     print("Summary")
     print("=" * 60)
     print(f"Posts packaged: {len(results)}/{len(POSTS_TO_PACKAGE)}")
+    print(f"Posts regenerated: {sum(1 for r in results if r['rebuilt'])} "
+          f"(unchanged: {sum(1 for r in results if not r['rebuilt'])})")
     
     if results:
         print("\nCreated posts:")
@@ -860,6 +2592,31 @@ def main():
                     status = "✅" if info['passes'] else "🔒"
                     print(f"      {status} {name} -> /snippets/{info['slug']}/")
     
+    evicted = quality_cache.prune()
+    if evicted:
+        print(f"\n🧹 Evicted {evicted} stale quality verdicts from cache")
+    unused_images = image_store.prune(get_build_manifest().image_hashes())
+    if unused_images:
+        print(f"🧹 Removed {unused_images} unused images from the image store")
+    
+    print("\n" + "=" * 60)
+    print("Timings")
+    print("=" * 60)
+    print(metrics.summary())
+    if args.metrics:
+        metrics.export_json(args.metrics)
+        print(f"\n📊 Metrics: {args.metrics}")
+    if args.trace:
+        metrics.export_chrome_trace(args.trace)
+        print(f"📊 Trace: {args.trace}")
+    
+    if args.watch:
+        # --force and --refresh-quality apply to this run, not to every repackage
+        quality_cache.refresh = False
+        watch(POSTS_TO_PACKAGE, OBSIDIAN_VAULT_PATH, related=args.related, depth=args.depth,
+              jobs=args.jobs, concurrency=args.concurrency)
+        return
+    
     print("\n🚀 Run 'npm run build' to regenerate the site.")
 
 
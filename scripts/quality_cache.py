@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Quality Check Cache
+
+Content-addressed, on-disk cache of check_quality verdicts. The key is a
+hash of everything that can change the verdict: the (truncated) note
+content, its title, the prompt template, the model and the pass
+threshold. A note linked from five posts is therefore scored once, and is
+not rescored on later runs until it changes.
+
+Each verdict is stored as scripts/.cache/quality/<key>.json. prune()
+drops entries older than max_age_days and then the oldest entries until
+the cache fits in max_bytes.
+"""
+
+import os
+import json
+import time
+import threading
+import hashlib
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+# Default cache location
+CACHE_DIR = Path(__file__).parent / '.cache' / 'quality'
+
+# Eviction limits
+DEFAULT_MAX_AGE_DAYS = 90
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+
+
+def cache_key(content: str, title: str, template: str, model: str, min_score: int) -> str:
+    """Hash of every input that affects a quality verdict."""
+    payload = json.dumps([content, title, template, model, min_score], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class QualityCache:
+    """
+    Directory of cached verdicts.
+
+    With refresh=True, get() always misses (forcing a fresh API call) but
+    put() still stores the new verdict.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path = CACHE_DIR,
+        max_age_days: float = DEFAULT_MAX_AGE_DAYS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        refresh: bool = False
+    ):
+        self.cache_dir = cache_dir
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        self.refresh = refresh
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f'{key}.json'
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached verdict for key, or None on a miss or expired entry."""
+        if self.refresh:
+            return None
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get('created', 0) > self.max_age_days * 86400:
+            return None
+        return entry.get('result')
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Store a verdict atomically."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp_path.write_text(json.dumps({'created': time.time(), 'result': result}), encoding='utf-8')
+        os.replace(tmp_path, path)
+
+    def prune(self) -> int:
+        """
+        Evict expired entries, then the oldest ones until the cache fits in max_bytes.
+        Returns the number of entries removed.
+        """
+        if not self.cache_dir.exists():
+            return 0
+
+        now = time.time()
+        max_age = self.max_age_days * 86400
+        removed = 0
+        entries: List[tuple] = []
+
+        for path in self.cache_dir.glob('*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > max_age:
+                path.unlink(missing_ok=True)
+                removed += 1
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+
+        return removed
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Quality Pre-filter
+
+Rejects linked notes that are obviously unpublishable before a quality
+check spends an API request on them. The rules mirror the failure modes
+QUALITY_PROMPT_TEMPLATE lists (too short, mostly image embeds, mostly
+wiki-links, bare bullet points), measured on the note body:
+
+- text_chars: characters of text once embeds, link markup and URLs are removed
+- image_ratio: share of non-blank lines that are only image embeds
+- link_ratio: share of the text that is wiki-link text
+- bullet_ratio: share of text lines that are list items
+
+Only clear failures are decided locally; every other note still goes to
+the model, which also judges what heuristics can't (appropriateness,
+accuracy, voice). Thresholds can be set through the PREFILTER_*
+environment variables, and QUALITY_PREFILTER=0 turns the pre-filter off.
+"""
+
+import os
+import re
+from typing import Any, Dict, Optional
+
+QUALITY_PREFILTER = os.getenv('QUALITY_PREFILTER', '1') != '0'
+
+# Bump when the rules change (part of the snippets' build manifest inputs)
+PREFILTER_VERSION = 1
+
+# Notes with less text than this are rejected outright
+PREFILTER_MIN_CHARS = int(os.getenv('PREFILTER_MIN_CHARS', '100'))
+
+# Image-heavy and bullet-only notes are only rejected when they are also short
+PREFILTER_SHORT_CHARS = int(os.getenv('PREFILTER_SHORT_CHARS', '400'))
+PREFILTER_MAX_IMAGE_RATIO = float(os.getenv('PREFILTER_MAX_IMAGE_RATIO', '0.5'))
+PREFILTER_MAX_BULLET_RATIO = float(os.getenv('PREFILTER_MAX_BULLET_RATIO', '0.9'))
+
+# Notes that are mostly link text are rejected at any length (e.g. index pages)
+PREFILTER_MAX_LINK_RATIO = float(os.getenv('PREFILTER_MAX_LINK_RATIO', '0.6'))
+
+# Score given to rejected notes ("too brief, fragmented, image-heavy")
+PREFILTER_SCORE = 2
+
+# ![[image.png]] and ![alt](url)
+IMAGE_EMBED_PATTERN = re.compile(r'!\[\[[^\]]*\]\]|!\[[^\]]*\]\([^)]*\)')
+
+# [[Target]] / [[Target|Display]]
+WIKI_LINK_PATTERN = re.compile(r'\[\[([^\]|]+)(?:\|([^\]]+))?\]\]')
+
+URL_PATTERN = re.compile(r'https?://\S+')
+
+# - item, * item, + item, 1. item, 1) item (tasks included)
+BULLET_PATTERN = re.compile(r'^\s*(?:[-*+]|\d+[.)])\s+')
+
+HEADING_PATTERN = re.compile(r'^\s*#{1,6}\s')
+
+# What counts as text: letters, digits and combining marks
+TEXT_CHAR_PATTERN = re.compile(r'[^\W_]', re.UNICODE)
+
+
+def text_chars(text: str) -> int:
+    return len(TEXT_CHAR_PATTERN.findall(text))
+
+
+def note_features(body: str) -> Dict[str, Any]:
+    """Size and shape measurements of a note body (see the module docstring)."""
+    lines = [line for line in body.splitlines() if line.strip()]
+    image_lines = [line for line in lines if not IMAGE_EMBED_PATTERN.sub('', line).strip()]
+    text_lines = [line for line in lines
+                  if line not in image_lines and not HEADING_PATTERN.match(line)]
+    bullet_lines = [line for line in text_lines if BULLET_PATTERN.match(line)]
+
+    text = URL_PATTERN.sub('', IMAGE_EMBED_PATTERN.sub('', body))
+    link_chars = sum(text_chars(match.group(2) or match.group(1))
+                     for match in WIKI_LINK_PATTERN.finditer(text))
+    chars = text_chars(WIKI_LINK_PATTERN.sub(lambda m: m.group(2) or m.group(1), text))
+
+    return {
+        'text_chars': chars,
+        'lines': len(lines),
+        'image_ratio': round(len(image_lines) / len(lines), 3) if lines else 0.0,
+        'link_ratio': round(link_chars / chars, 3) if chars else 0.0,
+        'bullet_ratio': round(len(bullet_lines) / len(text_lines), 3) if text_lines else 0.0,
+    }
+
+
+def rejection_reason(features: Dict[str, Any]) -> Optional[str]:
+    """Why a note with these features is obviously unpublishable, or None if it may be."""
+    chars = features['text_chars']
+    if chars < PREFILTER_MIN_CHARS:
+        return f"Too short to stand alone ({chars} characters of text)"
+    if features['link_ratio'] >= PREFILTER_MAX_LINK_RATIO:
+        return f"Mostly references other pages ({features['link_ratio']:.0%} of the text is wiki-links)"
+    if chars < PREFILTER_SHORT_CHARS:
+        if features['image_ratio'] >= PREFILTER_MAX_IMAGE_RATIO:
+            return (f"Mostly image embeds ({features['image_ratio']:.0%} of lines) "
+                    f"with little text ({chars} characters)")
+        if features['bullet_ratio'] >= PREFILTER_MAX_BULLET_RATIO:
+            return f"Brief bullet points without explanation ({chars} characters of text)"
+    return None
+
+
+def prefilter_verdict(body: str) -> Optional[Dict[str, Any]]:
+    """
+    A failing quality verdict for an obviously unpublishable note, or None
+    if the note needs a real quality check (or the pre-filter is off).
+    Fields the heuristics can't judge are None.
+    """
+    if not QUALITY_PREFILTER:
+        return None
+    features = note_features(body)
+    reason = rejection_reason(features)
+    if reason is None:
+        return None
+    return {
+        "appropriate": None,
+        "technically_sound": None,
+        "has_substance": False,
+        "not_ai_generated": None,
+        "quality_score": PREFILTER_SCORE,
+        "passes": False,
+        "reason": f"Pre-filter: {reason}",
+        "heuristic": features
+    }
+
+
+def prefilter_settings() -> Optional[Dict[str, Any]]:
+    """The rules in effect, for build manifest inputs (None when the pre-filter is off)."""
+    if not QUALITY_PREFILTER:
+        return None
+    return {
+        'version': PREFILTER_VERSION,
+        'min_chars': PREFILTER_MIN_CHARS,
+        'short_chars': PREFILTER_SHORT_CHARS,
+        'image_ratio': PREFILTER_MAX_IMAGE_RATIO,
+        'bullet_ratio': PREFILTER_MAX_BULLET_RATIO,
+        'link_ratio': PREFILTER_MAX_LINK_RATIO,
+    }
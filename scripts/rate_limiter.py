@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Rate Limiter
+
+Client-side scheduling for API requests made from many threads at once:
+
+- RateLimiter: requests-per-minute and tokens-per-minute budgets (token
+  buckets). acquire() blocks until a request fits both, and pause() holds
+  every caller back after the server says to slow down.
+- AdaptiveConcurrency: a limit on requests in flight that halves whenever
+  the API throttles us and grows back by one after a run of successes.
+- backoff_delay() / retry_after_seconds(): how long to wait before a retry,
+  exponential with full jitter unless the server sent Retry-After.
+
+    limiter = RateLimiter(requests_per_minute=500, tokens_per_minute=200_000)
+    concurrency = AdaptiveConcurrency(8)
+
+    limiter.acquire(estimated_tokens)
+    with concurrency.slot():
+        response = send()
+    limiter.settle(estimated_tokens, response.usage.total_tokens)
+
+Budgets are per process; split them across worker processes with scale().
+"""
+
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from contextlib import contextmanager
+from typing import Iterator, Mapping, Optional
+
+# Exponential backoff: BACKOFF_BASE * 2**attempt seconds, at most BACKOFF_CAP
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+
+
+class RateLimiter:
+    """Token buckets for requests and tokens per minute (0 = unlimited)."""
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self._lock = threading.Lock()
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def scale(self, factor: float) -> None:
+        """Shrink (or grow) both budgets, e.g. to 1/N for each of N processes."""
+        with self._lock:
+            self.requests_per_minute *= factor
+            self.tokens_per_minute *= factor
+            self._requests = min(self._requests, self.requests_per_minute)
+            self._tokens = min(self._tokens, self.tokens_per_minute)
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        Wait until one request of about `tokens` tokens fits the budgets,
+        then take it. Returns the seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                delay = self._paused_until - now
+                if self.requests_per_minute and self._requests < 1:
+                    delay = max(delay, (1 - self._requests) * 60 / self.requests_per_minute)
+                # A request larger than the whole budget only waits for a full bucket
+                needed = min(tokens, self.tokens_per_minute)
+                if self.tokens_per_minute and self._tokens < needed:
+                    delay = max(delay, (needed - self._tokens) * 60 / self.tokens_per_minute)
+                if delay <= 0:
+                    if self.requests_per_minute:
+                        self._requests -= 1
+                    if self.tokens_per_minute:
+                        self._tokens -= tokens
+                    return waited
+            time.sleep(delay)
+            waited += delay
+
+    def settle(self, estimated: int, actual: int) -> None:
+        """Correct the token budget once a request's real usage is known."""
+        if self.tokens_per_minute:
+            with self._lock:
+                self._tokens = min(self.tokens_per_minute, self._tokens + estimated - actual)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller back for `seconds` (e.g. a 429's Retry-After)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class AdaptiveConcurrency:
+    """
+    Limit on concurrent requests: halved on throttling (down to `minimum`),
+    raised by one after `increase_after` successes in a row (up to `maximum`).
+    """
+
+    def __init__(self, maximum: int, minimum: int = 1, increase_after: int = 10):
+        self._cond = threading.Condition()
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.increase_after = increase_after
+        self.limit = self.maximum
+        self._in_flight = 0
+        self._successes = 0
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold one of the `limit` request slots for the enclosed block."""
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def succeeded(self) -> None:
+        with self._cond:
+            self._successes += 1
+            if self._successes >= self.increase_after and self.limit < self.maximum:
+                self.limit += 1
+                self._successes = 0
+                self._cond.notify_all()
+
+    def throttled(self) -> None:
+        with self._cond:
+            self.limit = max(self.minimum, self.limit // 2)
+            self._successes = 0
+
+
+def retry_after_seconds(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """Seconds asked for by retry-after-ms / Retry-After (delta or HTTP date), if any."""
+    if not headers:
+        return None
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(
+    attempt: int,
+    retry_after: Optional[float] = None,
+    base: float = BACKOFF_BASE,
+    cap: float = BACKOFF_CAP
+) -> float:
+    """
+    Seconds to wait before retry number `attempt` (0-based): the server's
+    Retry-After if given, else exponential backoff with full jitter.
+    """
+    if retry_after is not None:
+        return retry_after
+    return random.uniform(0, min(cap, base * 2 ** attempt))
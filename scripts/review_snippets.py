@@ -7,30 +7,45 @@ detailed improvement suggestions in REVIEW_SNIPPET_{name}.md files in the
 Obsidian vault.
 
 Usage:
-    python scripts/review_snippets.py
+    python scripts/review_snippets.py [--jobs N] [--force]
 
 The script will:
 1. Find all snippets that failed or scored below threshold
-2. Generate detailed feedback using GPT-4o
-3. Create REVIEW_SNIPPET_{name}.md files in Obsidian vault
+2. Skip those whose note and score haven't changed since their last review
+3. Generate detailed feedback using GPT-4o, N reviews at a time
+4. Create REVIEW_SNIPPET_{name}.md files in Obsidian vault
+
+Snippets, their verdicts and finished reviews come from the content store
+(see content_store.py). Reviews are recorded as they complete, so an
+interrupted run picks up where it left off. A review stays current until
+the packager records a new verdict or note hash for its snippet, or the
+review model changes. --force regenerates every review.
 """
 
 import os
-import json
 import re
+import argparse
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Optional, Dict, Any, List
-from dotenv import load_dotenv
+from typing import Optional, Dict, Any
 
-# Load environment variables
-load_dotenv(Path(__file__).parent / '.env')
+from vault_index import get_vault_index
+from content_store import ContentStore, get_content_store
+from openai_client import get_openai_client
+from build_manifest import text_hash
+from token_budget import count_tokens, truncate_to_tokens
+
+# Load environment variables (dotenv is only imported when there is a .env)
+ENV_FILE = Path(__file__).parent / '.env'
+if ENV_FILE.exists():
+    from dotenv import load_dotenv
+    load_dotenv(ENV_FILE)
 
 # Configuration
 OBSIDIAN_VAULT_PATH = os.getenv('OBSIDIAN_VAULT_PATH', '/Users/jinyoungkim/Documents/Obsidian Vault')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
 SNIPPETS_DIR = Path(__file__).parent.parent / 'content' / 'snippets'
-LOGS_DIR = Path(__file__).parent / 'logs'
 
 # Review threshold - generate reviews for snippets scoring at or below this
 REVIEW_THRESHOLD = 7
@@ -39,70 +54,43 @@ REVIEW_THRESHOLD = 7
 # o1 is OpenAI's most capable model (~$15/M input, $60/M output tokens)
 REVIEW_MODEL = "o1"
 
+# Reviews generated at once (each o1 call can take minutes)
+REVIEW_CONCURRENCY = int(os.getenv('REVIEW_CONCURRENCY', '4'))
 
-def find_document(title: str, vault_path: str = OBSIDIAN_VAULT_PATH) -> Optional[Path]:
-    """Find a document in the vault by title."""
-    vault = Path(vault_path)
-    target_filename = f"{title}.md".lower()
-    
-    for md_file in vault.rglob('*.md'):
-        if md_file.name.lower() == target_filename:
-            return md_file
-    return None
+# Tokens of the note included in a review prompt
+REVIEW_MAX_TOKENS = int(os.getenv('REVIEW_MAX_TOKENS', '8000'))
 
+# Characters dropped from review filenames, and runs turned into underscores
+UNSAFE_FILENAME_PATTERN = re.compile(r'[^\w\s-]')
+FILENAME_SEPARATOR_PATTERN = re.compile(r'[-\s]+')
 
-def get_recent_quality_checks() -> Dict[str, Dict[str, Any]]:
-    """
-    Get the most recent quality check results for each snippet.
-    Returns dict mapping snippet title to its quality result.
-    """
-    results = {}
-    
-    # Find all log files
-    if not LOGS_DIR.exists():
-        return results
-    
-    log_files = sorted(LOGS_DIR.glob('ai_checks_*.json'), reverse=True)
-    
-    for log_file in log_files:
-        try:
-            with open(log_file, 'r', encoding='utf-8') as f:
-                logs = json.load(f)
-                
-            for entry in logs:
-                title = entry.get('title', '')
-                if title and title not in results:
-                    results[title] = {
-                        'result': entry.get('result', {}),
-                        'content_preview': entry.get('content_preview', ''),
-                        'timestamp': entry.get('timestamp', '')
-                    }
-        except Exception as e:
-            print(f"  Warning: Could not read {log_file}: {e}")
-    
-    return results
+
+def find_document(title: str, vault_path: str = OBSIDIAN_VAULT_PATH) -> Optional[Path]:
+    """Find a document in the vault by title."""
+    return get_vault_index(vault_path).find_document(title)
 
 
 def generate_review(title: str, content: str, quality_result: Dict[str, Any]) -> str:
     """
     Generate detailed review suggestions using GPT-4o.
-    Returns markdown-formatted review content.
+    Returns markdown-formatted review content; API errors are raised so
+    the job can be retried.
     """
     if not OPENAI_API_KEY:
         return f"# Review for {title}\n\n⚠️ No OpenAI API key configured. Cannot generate review."
     
-    try:
-        import openai
-        client = openai.OpenAI(api_key=OPENAI_API_KEY)
-        
-        # Truncate content if too long
-        max_chars = 12000
-        review_content = content[:max_chars] if len(content) > max_chars else content
-        
-        score = quality_result.get('quality_score', 'N/A')
-        reason = quality_result.get('reason', 'No reason provided')
-        
-        prompt = f"""You are a thoughtful editor helping improve personal knowledge notes for publication on a digital garden blog. The author has their own voice and style - your job is to help them improve while preserving their authentic perspective.
+    client = get_openai_client(OPENAI_API_KEY)
+    
+    # Trim the note to the review token budget
+    review_content = truncate_to_tokens(content, REVIEW_MAX_TOKENS, REVIEW_MODEL)
+    if review_content != content:
+        print(f"   ✂️  {title}: note is {count_tokens(content, REVIEW_MODEL)} tokens; reviewing the first {REVIEW_MAX_TOKENS}")
+        review_content += "\n\n[... truncated ...]"
+    
+    score = quality_result.get('quality_score', 'N/A')
+    reason = quality_result.get('reason', 'No reason provided')
+    
+    prompt = f"""You are a thoughtful editor helping improve personal knowledge notes for publication on a digital garden blog. The author has their own voice and style - your job is to help them improve while preserving their authentic perspective.
 
 DOCUMENT TITLE: {title}
 
@@ -153,21 +141,27 @@ Any concepts, examples, or sections that would significantly enhance the documen
 
 Remember: Preserve the author's voice and style. These are personal notes being shared, not academic papers. The goal is clarity and value, not perfection."""
 
-        # o1 models don't support temperature parameter
-        response = client.chat.completions.create(
-            model=REVIEW_MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            max_completion_tokens=16000  # o1 uses max_completion_tokens instead of max_tokens
-        )
-        
-        review_text = response.choices[0].message.content.strip()
-        
-        # Format as markdown file
-        header = f"""---
+    # o1 models don't support temperature parameter
+    response = client.chat.completions.create(
+        model=REVIEW_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        max_completion_tokens=16000  # o1 uses max_completion_tokens instead of max_tokens
+    )
+    
+    review_text = response.choices[0].message.content.strip()
+    usage = response.usage
+    prompt_tokens = usage.prompt_tokens if usage else 0
+    completion_tokens = usage.completion_tokens if usage else 0
+    print(f"   🔢 {title}: {prompt_tokens} prompt + {completion_tokens} completion tokens")
+    
+    # Format as markdown file
+    header = f"""---
 title: Review - {title}
 date: {datetime.now().strftime('%Y-%m-%d')}
 type: review
 original_score: {score}
+prompt_tokens: {prompt_tokens}
+completion_tokens: {completion_tokens}
 ---
 
 # Review: {title}
@@ -179,10 +173,16 @@ original_score: {score}
 ---
 
 """
-        return header + review_text
-        
-    except Exception as e:
-        return f"# Review for {title}\n\n⚠️ Error generating review: {e}"
+    return header + review_text
+
+
+def review_path(title: str, vault_path: str = OBSIDIAN_VAULT_PATH) -> Path:
+    """Path of the REVIEW_SNIPPET_{title}.md file for a snippet."""
+    # Sanitize title for filename
+    safe_title = UNSAFE_FILENAME_PATTERN.sub('', title).strip()
+    safe_title = FILENAME_SEPARATOR_PATTERN.sub('_', safe_title)
+    
+    return Path(vault_path) / f"REVIEW_SNIPPET_{safe_title}.md"
 
 
 def create_review_file(title: str, review_content: str, vault_path: str = OBSIDIAN_VAULT_PATH) -> Path:
@@ -190,16 +190,12 @@ def create_review_file(title: str, review_content: str, vault_path: str = OBSIDI
     Create a REVIEW_SNIPPET_{title}.md file in the Obsidian vault.
     Returns the path to the created file.
     """
-    vault = Path(vault_path)
+    filepath = review_path(title, vault_path)
     
-    # Sanitize title for filename
-    safe_title = re.sub(r'[^\w\s-]', '', title).strip()
-    safe_title = re.sub(r'[-\s]+', '_', safe_title)
-    
-    filename = f"REVIEW_SNIPPET_{safe_title}.md"
-    filepath = vault / filename
-    
-    filepath.write_text(review_content, encoding='utf-8')
+    # Replaced atomically, so an interrupted run never leaves half a review
+    tmp_path = filepath.with_name(f'.{filepath.name}.{os.getpid()}.tmp')
+    tmp_path.write_text(review_content, encoding='utf-8')
+    os.replace(tmp_path, filepath)
     return filepath
 
 
@@ -211,8 +207,33 @@ def get_snippet_content(title: str, vault_path: str = OBSIDIAN_VAULT_PATH) -> Op
     return None
 
 
+def review_snippet(item: Dict[str, Any], store: ContentStore, vault_path: str = OBSIDIAN_VAULT_PATH) -> Path:
+    """
+    Generate and write one review, then record the finished job.
+    item holds the snippet's title, score, quality result, note content and its hash.
+    """
+    print(f"   🤖 {item['title']}: generating review...")
+    review_content = generate_review(item['title'], item['content'], item['result'])
+    filepath = create_review_file(item['title'], review_content, vault_path)
+    store.record_review(
+        item['title'], 'done',
+        content_hash=item['content_hash'],
+        score=item['score'],
+        model=REVIEW_MODEL,
+        review_file=filepath.name
+    )
+    return filepath
+
+
 def main():
     """Main entry point."""
+    parser = argparse.ArgumentParser(description="Generate improvement reviews for low-scoring snippets.")
+    parser.add_argument('--jobs', type=int, default=REVIEW_CONCURRENCY,
+                        help=f"Reviews generated at once (default: {REVIEW_CONCURRENCY})")
+    parser.add_argument('--force', action='store_true',
+                        help="Regenerate reviews even if the note and score are unchanged")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("Snippet Review Generator")
     print("=" * 60)
@@ -220,72 +241,95 @@ def main():
     print(f"Review threshold: score <= {REVIEW_THRESHOLD}")
     print(f"Obsidian vault: {OBSIDIAN_VAULT_PATH}")
     
-    # Get recent quality checks
-    quality_checks = get_recent_quality_checks()
-    
-    if not quality_checks:
-        print("\n⚠️  No quality check logs found. Run package_obsidian.py first.")
+    # Snippets that failed or scored at or below the threshold
+    store = get_content_store()
+    store.import_metadata(SNIPPETS_DIR / '_metadata.json')
+    if not store.has_snippets():
+        print("\n⚠️  No snippet verdicts found. Run package_obsidian.py first.")
         return
     
-    print(f"\nFound {len(quality_checks)} snippets with quality checks.")
-    
-    # Find snippets that need review
-    needs_review = []
-    for title, data in quality_checks.items():
-        result = data.get('result', {})
-        score = result.get('quality_score', 10)
-        passes = result.get('passes', True)
-        
-        # Review if: failed OR scored at or below threshold
-        if not passes or score <= REVIEW_THRESHOLD:
-            needs_review.append({
-                'title': title,
-                'score': score,
-                'passes': passes,
-                'result': result
-            })
-    
+    needs_review = store.review_candidates(REVIEW_THRESHOLD, REVIEW_MODEL)
     if not needs_review:
         print("\n✅ All snippets scored above threshold. No reviews needed.")
         return
     
-    # Sort by score (lowest first)
-    needs_review.sort(key=lambda x: x['score'])
-    
     print(f"\n📝 {len(needs_review)} snippets need review:")
     for item in needs_review:
-        status = "❌ FAIL" if not item['passes'] else f"⚠️  Score {item['score']}"
+        status = "❌ FAIL" if not item['passes'] else f"⚠️  Score {item['quality_score']}"
         print(f"   - {item['title']}: {status}")
     
+    # Skip snippets whose review is still current for their note and score
+    pending = []
+    up_to_date = 0
+    for item in needs_review:
+        if item['current'] and not args.force and review_path(item['title']).exists():
+            up_to_date += 1
+            continue
+        content = get_snippet_content(item['title'])
+        if not content:
+            print(f"   ⚠️  {item['title']}: could not find document in vault, skipping")
+            continue
+        item['content'] = content
+        item['score'] = item['quality_score']
+        item['result'] = {'quality_score': item['quality_score'], 'reason': item['reason']}
+        if item['content_hash'] is None:
+            # Verdicts imported from an old _metadata.json have no note hash yet
+            item['content_hash'] = text_hash(content)
+            review = store.get_review(item['title']) or {}
+            current = (review.get('status') == 'done' and review.get('content_hash') == item['content_hash']
+                       and review.get('score') == item['score'] and review.get('model') == REVIEW_MODEL)
+            if current and not args.force and review_path(item['title']).exists():
+                up_to_date += 1
+                continue
+        pending.append(item)
+    
+    if up_to_date:
+        print(f"\n⏭️  {up_to_date} reviews are up to date (note and score unchanged)")
+    if not pending:
+        print("\n✅ No reviews to generate.")
+        return
+    if not OPENAI_API_KEY:
+        print("\n⚠️  No OpenAI API key configured.")
+        return
+    
+    workers = max(1, min(args.jobs, len(pending)))
     print("\n" + "-" * 60)
-    print("Generating reviews...")
+    print(f"Generating {len(pending)} reviews with {REVIEW_MODEL} ({workers} at a time)...")
     print("-" * 60)
     
     created_files = []
+    failed = []
     
-    for item in needs_review:
-        title = item['title']
-        print(f"\n📄 Reviewing: {title}")
-        
-        # Get full content from Obsidian
-        content = get_snippet_content(title)
-        if not content:
-            print(f"   ⚠️  Could not find document in vault, skipping")
-            continue
-        
-        # Generate review
-        print(f"   🤖 Generating review with {REVIEW_MODEL}...")
-        review_content = generate_review(title, content, item['result'])
-        
-        # Create review file
-        filepath = create_review_file(title, review_content)
-        created_files.append(filepath)
-        print(f"   ✅ Created: {filepath.name}")
+    pool = ThreadPoolExecutor(max_workers=workers)
+    futures = {pool.submit(review_snippet, item, store): item for item in pending}
+    try:
+        for done, future in enumerate(as_completed(futures), 1):
+            item = futures[future]
+            try:
+                filepath = future.result()
+            except Exception as e:
+                # Recorded as failed, so the next run retries it
+                store.record_review(item['title'], 'failed', content_hash=item['content_hash'],
+                            score=item['score'], model=REVIEW_MODEL, error=str(e))
+                failed.append(item['title'])
+                print(f"   ❌ [{done}/{len(futures)}] {item['title']}: {e}")
+                continue
+            created_files.append(filepath)
+            print(f"   ✅ [{done}/{len(futures)}] Created: {filepath.name}")
+    except KeyboardInterrupt:
+        pool.shutdown(wait=False, cancel_futures=True)
+        print("\n⏸️  Interrupted - waiting for reviews in flight (Ctrl-C again to abandon them).")
+        print("   Finished reviews are saved; run again to resume.")
+        raise
+    pool.shutdown()
     
     print("\n" + "=" * 60)
     print("Summary")
     print("=" * 60)
     print(f"Reviews generated: {len(created_files)}")
+    print(f"Reviews up to date: {up_to_date}")
+    if failed:
+        print(f"Reviews failed (retried next run): {len(failed)}")
     
     if created_files:
         print("\nCreated files:")
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Search Index
+
+Inverted index over the packaged posts and snippets, built at packaging
+time so the site can offer search without tokenising every MDX file on
+each Gatsby build.
+
+The working copy (scripts/.cache/search_index.json) keeps each MDX file's
+size, mtime and term counts, so refresh() only re-tokenises files that
+changed. write_export() turns it into static/search/, which Gatsby copies
+to the site as-is:
+
+    manifest.json    {"version": 1,
+                      "docs": [["/post/", "Post", "post", 1840], null, ...],
+                      "shards": [["", "3f2a9c1e"], ["formal", "0b7d41c2"], ...]}
+    0b7d41c2.json    {"formal": [3, 1], ..., "game": [0, 7, 4, 1], "games": [2, 1], ...}
+
+- docs: document id -> [url, title, kind, length in words]; ids stay
+  stable across runs (null marks a free or unpublished slot)
+- shards: the sorted term list cut into consecutive ranges, as
+  [first term, file] pairs. A term starts a new shard when its hash says
+  so (about one in SHARD_TERMS), so shards stay evenly sized in any script
+  and adding a term only changes the shard it falls into. Files are named
+  by a hash of their content, so unchanged shards keep their name (and
+  browser cache) across runs.
+- each term maps to a flat [doc id, weight, doc id, weight, ...] list,
+  where weight is the term count (title terms count TITLE_WEIGHT extra)
+
+A browser loads the manifest, then for each query word only the shard
+the word sorts into and any following shards whose first term starts with
+the word; every term beginning with the word is in one of those.
+
+Math (<Math> spans, $...$), JSX tags and expressions, import lines,
+link URLs and frontmatter (apart from the title) are not indexed.
+
+Usage (re-index content/ without packaging):
+    python scripts/search_index.py
+"""
+
+import os
+import re
+import json
+import hashlib
+from pathlib import Path
+from collections import Counter
+from typing import Callable, Dict, Any, Iterable, List, Optional, Set, Tuple
+
+# Where the working copy lives
+CACHE_PATH = Path(__file__).parent / '.cache' / 'search_index.json'
+
+# Content that is indexed, and where the export goes
+CONTENT_DIR = Path(__file__).parent.parent / 'content'
+EXPORT_DIR = Path(__file__).parent.parent / 'static' / 'search'
+
+# Bump when the working copy, the export or the tokenizer changes
+INDEX_VERSION = 1
+
+# Average number of terms per shard
+SHARD_TERMS = 256
+
+# Extra count given to each occurrence of a term in the title
+TITLE_WEIGHT = 10
+
+# Longer "words" are usually hashes or run-together URLs
+MAX_TERM_LENGTH = 32
+
+STOP_WORDS = frozenset("""
+    a an and are as at be but by for from has have he her his i if in into is it its
+    me my not of on or our she so than that the their them then there these they this
+    to was we were what when which who will with you your
+""".split())
+
+FRONTMATTER_PATTERN = re.compile(r'\A---\n(.*?)\n---\n', re.DOTALL)
+TITLE_PATTERN = re.compile(r'^title:\s*["\']?(.*?)["\']?\s*$', re.MULTILINE)
+SLUG_PATTERN = re.compile(r'^slug:\s*["\']?(.*?)["\']?\s*$', re.MULTILINE)
+IMPORT_PATTERN = re.compile(r'^(?:import|export)\s.*$', re.MULTILINE)
+MATH_COMPONENT_PATTERN = re.compile(r'<Math\b[^>]*>.*?</Math>', re.DOTALL)
+TEX_PATTERN = re.compile(r'\$\$.*?\$\$|\$[^$\n]+\$', re.DOTALL)
+JSX_EXPRESSION_PATTERN = re.compile(r'\{[^{}\n]*\}')
+TAG_PATTERN = re.compile(r'</?[A-Za-z][^<>]*>')
+LINK_URL_PATTERN = re.compile(r'\]\([^)]*\)')
+BARE_URL_PATTERN = re.compile(r'https?://\S+')
+TERM_PATTERN = re.compile(r'[^\W_]+')
+
+
+def indexable_text(mdx: str) -> Tuple[str, str]:
+    """(title, body text) of an MDX file, with math, JSX and markup removed."""
+    title = ''
+    match = FRONTMATTER_PATTERN.match(mdx)
+    if match:
+        title_match = TITLE_PATTERN.search(match.group(1))
+        title = title_match.group(1) if title_match else ''
+        mdx = mdx[match.end():]
+    text = IMPORT_PATTERN.sub(' ', mdx)
+    text = MATH_COMPONENT_PATTERN.sub(' ', text)
+    text = TEX_PATTERN.sub(' ', text)
+    text = JSX_EXPRESSION_PATTERN.sub(' ', text)
+    text = TAG_PATTERN.sub(' ', text)
+    text = LINK_URL_PATTERN.sub('] ', text)
+    text = BARE_URL_PATTERN.sub(' ', text)
+    return title, text
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words of text, without stop words and one-letter words."""
+    return [
+        term for term in TERM_PATTERN.findall(text.lower())
+        if 1 < len(term) <= MAX_TERM_LENGTH and term not in STOP_WORDS
+    ]
+
+
+def document_terms(mdx: str) -> Tuple[str, int, Dict[str, int]]:
+    """(title, body length in words, term -> weight) for an MDX file."""
+    title, body = indexable_text(mdx)
+    words = tokenize(body)
+    counts = Counter(words)
+    for term in tokenize(title):
+        counts[term] += TITLE_WEIGHT
+    return title, len(words), dict(counts)
+
+
+def content_files(content_dir: Path = CONTENT_DIR) -> Iterable[Tuple[str, Path]]:
+    """(kind, path) of every post and snippet MDX file under content_dir."""
+    for kind, folder in (('post', 'posts'), ('snippet', 'snippets')):
+        base = content_dir / folder
+        if not base.is_dir():
+            continue
+        for entry in sorted(base.iterdir()):
+            if entry.name.startswith(('_', '.')):
+                continue
+            for name in ('index.mdx', 'index.md'):
+                if (entry / name).is_file():
+                    yield kind, entry / name
+                    break
+
+
+class SearchIndex:
+    """
+    Term counts of every packaged document, refreshed incrementally.
+
+    - docs: content-relative path -> {'mtime', 'size', 'id', 'kind', 'title', 'slug', 'length', 'terms'}
+    """
+
+    def __init__(self, content_dir: Path = CONTENT_DIR, cache_path: Path = CACHE_PATH):
+        self.content_dir = content_dir
+        self.cache_path = cache_path
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.reindexed = 0
+
+    @classmethod
+    def load(cls, content_dir: Path = CONTENT_DIR, cache_path: Path = CACHE_PATH) -> 'SearchIndex':
+        """Load the working copy (if any); call refresh() to bring it up to date."""
+        index = cls(content_dir, cache_path)
+        try:
+            data = json.loads(cache_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return index
+        if data.get('version') == INDEX_VERSION and data.get('content_dir') == str(content_dir):
+            index.docs = data.get('docs', {})
+        return index
+
+    def refresh(self, slugify: Callable[[str], str]) -> int:
+        """
+        Re-tokenise documents whose size or mtime changed, add new ones and
+        drop deleted ones. slugify gives a post's URL slug from its title
+        when its frontmatter has no slug. Saves the working copy if anything
+        changed; returns the number of documents re-tokenised.
+        """
+        self.reindexed = 0
+        docs: Dict[str, Dict[str, Any]] = {}
+        for kind, path in content_files(self.content_dir):
+            rel_path = path.relative_to(self.content_dir).as_posix()
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            doc = self.docs.get(rel_path)
+            if doc is None or doc['mtime'] != stat.st_mtime_ns or doc['size'] != stat.st_size:
+                try:
+                    mdx = path.read_text(encoding='utf-8')
+                except (OSError, UnicodeDecodeError):
+                    continue
+                title, length, terms = document_terms(mdx)
+                slug = path.parent.name
+                if kind == 'post':
+                    match = FRONTMATTER_PATTERN.match(mdx)
+                    slug_match = match and SLUG_PATTERN.search(match.group(1))
+                    slug = slug_match.group(1).strip('/') if slug_match else slugify(title or slug)
+                doc = {
+                    'mtime': stat.st_mtime_ns,
+                    'size': stat.st_size,
+                    'id': doc['id'] if doc else None,
+                    'kind': kind,
+                    'title': title or path.parent.name,
+                    'slug': slug,
+                    'length': length,
+                    'terms': terms,
+                }
+                self.reindexed += 1
+            docs[rel_path] = doc
+
+        # New documents take the lowest free ids, so existing ids (and the
+        # shards that mention them) stay put
+        used = {doc['id'] for doc in docs.values() if doc['id'] is not None}
+        free = (i for i in range(len(docs) + 1) if i not in used)
+        for doc in docs.values():
+            if doc['id'] is None:
+                doc['id'] = next(free)
+
+        if self.reindexed or docs.keys() != self.docs.keys():
+            self.docs = docs
+            self.save()
+        return self.reindexed
+
+    def build(self, hidden: Set[Tuple[str, str]] = frozenset()) -> Tuple[Dict[str, Any], Dict[str, Dict[str, List[int]]]]:
+        """
+        (manifest without shard hashes, shard prefix -> {term: postings}).
+        hidden holds (kind, directory name) pairs left out of the export,
+        e.g. snippets that failed their quality check.
+        """
+        size = max((doc['id'] for doc in self.docs.values()), default=-1) + 1
+        docs: List[Optional[List[str]]] = [None] * size
+        postings: Dict[str, List[int]] = {}
+        for rel_path in sorted(self.docs, key=lambda p: self.docs[p]['id']):
+            doc = self.docs[rel_path]
+            if (doc['kind'], Path(rel_path).parent.name) in hidden:
+                continue
+            url = f"/{doc['slug']}/" if doc['kind'] == 'post' else f"/snippets/{doc['slug']}/"
+            docs[doc['id']] = [url, doc['title'], doc['kind'], doc['length']]
+            for term, weight in doc['terms'].items():
+                postings.setdefault(term, []).extend((doc['id'], weight))
+
+        manifest = {'version': INDEX_VERSION, 'docs': docs}
+        return manifest, shard_terms(postings)
+
+    def save(self) -> None:
+        """Write the working copy atomically."""
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        data = {'version': INDEX_VERSION, 'content_dir': str(self.content_dir), 'docs': self.docs}
+        tmp_path = self.cache_path.with_name(f'{self.cache_path.name}.{os.getpid()}.tmp')
+        tmp_path.write_text(json.dumps(data), encoding='utf-8')
+        os.replace(tmp_path, self.cache_path)
+
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def starts_shard(term: str, shard_terms: int = SHARD_TERMS) -> bool:
+    """Whether term begins a new shard (decided by its hash alone)."""
+    return int(hashlib.sha1(term.encode('utf-8')).hexdigest()[:8], 16) % shard_terms == 0
+
+
+def shard_terms(
+    postings: Dict[str, List[int]],
+    shard_terms: int = SHARD_TERMS
+) -> Dict[str, Dict[str, List[int]]]:
+    """Split the sorted terms into shards, keyed by the shard's first term ('' for the first)."""
+    shards: Dict[str, Dict[str, List[int]]] = {}
+    current: Dict[str, List[int]] = shards.setdefault('', {})
+    for term in sorted(postings):
+        if current and starts_shard(term, shard_terms):
+            current = shards.setdefault(term, {})
+        current[term] = postings[term]
+    return shards
+
+
+def _write(path: Path, text: str) -> None:
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    tmp_path.write_text(text, encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+def write_export(
+    manifest: Dict[str, Any],
+    shards: Dict[str, Dict[str, List[int]]],
+    export_dir: Path = EXPORT_DIR
+) -> int:
+    """
+    Write new shard files, then the manifest (so it never names a shard
+    that isn't there yet), then remove shard files no longer named.
+    Unchanged files are left alone. Returns the number of files written
+    or removed.
+    """
+    export_dir.mkdir(parents=True, exist_ok=True)
+    changed = 0
+    names = []
+    for first_term, terms in shards.items():
+        text = _dumps(terms)
+        name = hashlib.sha1(text.encode('utf-8')).hexdigest()[:8]
+        names.append([first_term, name])
+        path = export_dir / f'{name}.json'
+        if not path.exists():
+            _write(path, text)
+            changed += 1
+
+    manifest_path = export_dir / 'manifest.json'
+    text = _dumps({**manifest, 'shards': names})
+    try:
+        unchanged = manifest_path.read_text(encoding='utf-8') == text
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        _write(manifest_path, text)
+        changed += 1
+
+    used = {name for _, name in names}
+    for path in export_dir.glob('*.json'):
+        if path.stem != 'manifest' and path.stem not in used:
+            path.unlink()
+            changed += 1
+    return changed
+
+
+def main():
+    """Re-index content/ and update static/search/ (same as a packager run does)."""
+    from package_obsidian import update_search_index
+    update_search_index()
+
+
+if __name__ == '__main__':
+    main()
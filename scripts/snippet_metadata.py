@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Snippet Metadata Store
+
+content/snippets/_metadata.json maps each snippet slug to its title and
+quality verdict; gatsby-node.js reads it to decide which snippets are
+published. The verdicts themselves live in the content store (see
+content_store.py); this class is the packager's dict-like view of them.
+It keeps updates in memory and writes them in one transaction at flush(),
+either at the end of a run or every `checkpoint_every` updates, then
+re-exports _metadata.json from the store.
+
+Entries may carry a content_hash (the hash of the note the verdict is
+for), which is stored but not exported. Each load first imports
+_metadata.json if it changed since the store last wrote it, so hand edits
+and pulled changes are kept rather than overwritten by the next flush.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+from content_store import ContentStore, get_content_store
+
+# Default metadata location
+METADATA_PATH = Path(__file__).parent.parent / 'content' / 'snippets' / '_metadata.json'
+
+# Pending updates that trigger an automatic flush
+DEFAULT_CHECKPOINT_EVERY = 50
+
+
+def read_metadata(path: Path) -> Dict[str, Any]:
+    """Read a metadata file; a missing or unreadable file gives {}."""
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+class SnippetMetadata:
+    """
+    Dict-like view of the snippet verdicts in the content store, with batched writes.
+    """
+
+    def __init__(
+        self,
+        path: Path = METADATA_PATH,
+        checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+        store: Optional[ContentStore] = None
+    ):
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        self.store = store or get_content_store()
+        self.entries: Dict[str, Any] = {}
+        self._pending: Dict[str, Any] = {}
+
+    @classmethod
+    def load(
+        cls,
+        path: Path = METADATA_PATH,
+        checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+        store: Optional[ContentStore] = None
+    ) -> 'SnippetMetadata':
+        """Load every snippet's entry from the store once (after importing an edited _metadata.json)."""
+        metadata = cls(path, checkpoint_every, store)
+        metadata.store.import_metadata(path)
+        metadata.entries = metadata.store.snippet_metadata()
+        return metadata
+
+    def __getitem__(self, slug: str) -> Any:
+        return self.entries[slug]
+
+    def __setitem__(self, slug: str, entry: Any) -> None:
+        self.entries[slug] = entry
+        self._pending[slug] = entry
+        if self.checkpoint_every and len(self._pending) >= self.checkpoint_every:
+            self.flush()
+
+    def __contains__(self, slug: object) -> bool:
+        return slug in self.entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, slug: str, default: Optional[Any] = None) -> Any:
+        return self.entries.get(slug, default)
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return iter(list(self.entries.items()))
+
+    def update(self, entries: Dict[str, Any]) -> None:
+        """Set several entries (e.g. ones handed back by worker processes)."""
+        for slug, entry in entries.items():
+            self[slug] = entry
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._pending)
+
+    def flush(self) -> None:
+        """Write pending updates to the store and re-export _metadata.json."""
+        if not self._pending:
+            return
+        self.store.put_snippets(self._pending)
+        self.entries = self.store.export_metadata(self.path)
+        self._pending = {}
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Synthetic Vault Generator
+
+Writes a fake Obsidian vault of a given shape so the packager can be
+benchmarked (and exercised) without the real vault:
+
+- notes spread over nested folders up to `depth` levels deep
+- YAML frontmatter with a date and tags, plus body hashtags
+- `links_per_note` wiki-links per note, some with display text
+- image embeds pointing at small generated PNG files
+- inline ($...$) and display ($$...$$) LaTeX at a given density
+
+Generation is seeded, so the same arguments always give the same vault.
+
+Usage:
+    python scripts/synthetic_vault.py OUTPUT_DIR [--notes 500] [--links 8]
+        [--images 50] [--latex 0.3] [--depth 3] [--seed 0]
+"""
+
+import random
+import struct
+import zlib
+import argparse
+from pathlib import Path
+from typing import Dict, Any, List
+
+WORDS = (
+    "model data value function market risk theory proof signal policy agent "
+    "reward gradient prior posterior sample error bound price game strategy "
+    "equilibrium network layer token attention loss estimate variance mean"
+).split()
+
+INLINE_MATH = [r"x^2", r"\alpha + \beta", r"p(x \mid y)", r"\mathbb{E}[X]", r"O(n \log n)"]
+DISPLAY_MATH = [
+    r"\sum_{i=1}^{n} x_i = n \bar{x}",
+    r"P(A \mid B) = \frac{P(B \mid A) P(A)}{P(B)}",
+    r"\nabla_\theta J(\theta) = \mathbb{E}\left[\nabla_\theta \log \pi_\theta(a \mid s) R\right]",
+]
+
+
+def tiny_png(seed: int) -> bytes:
+    """A valid 4x4 grayscale PNG whose pixels depend on seed."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    rows = b''.join(b'\x00' + bytes((seed * 7 + r * 4 + c) % 256 for c in range(4)) for r in range(4))
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', 4, 4, 8, 0, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows))
+            + chunk(b'IEND', b''))
+
+
+def note_title(i: int) -> str:
+    return f"Note {i:05d}"
+
+
+def note_folder(depth: int, rng: random.Random) -> Path:
+    """Folder for a note: a random path of up to `depth` nested topic folders."""
+    levels = rng.randint(0, depth)
+    return Path(*[f"topic-{rng.randint(0, 3)}" for _ in range(levels)]) if levels else Path()
+
+
+def sentence(rng: random.Random, latex_density: float) -> str:
+    words = rng.choices(WORDS, k=rng.randint(8, 18))
+    if rng.random() < latex_density:
+        words.insert(rng.randrange(len(words)), f"${rng.choice(INLINE_MATH)}$")
+    return ' '.join(words).capitalize() + '.'
+
+
+def note_body(
+    notes: int,
+    links_per_note: int,
+    image_names: List[str],
+    latex_density: float,
+    rng: random.Random
+) -> str:
+    """Markdown for one note (frontmatter included)."""
+    tags = rng.sample(WORDS, 2)
+    lines = [
+        '---',
+        f'date: 2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+        f'tags: [{", ".join(tags)}]',
+        '---',
+        f'#{rng.choice(WORDS)} #{rng.choice(WORDS)}',
+        '',
+    ]
+
+    links = []
+    for _ in range(links_per_note):
+        target = note_title(rng.randrange(notes))
+        links.append(f'[[{target}|{rng.choice(WORDS)}]]' if rng.random() < 0.3 else f'[[{target}]]')
+
+    # One paragraph per link (at least three)
+    for p in range(max(3, links_per_note)):
+        text = ' '.join(sentence(rng, latex_density) for _ in range(rng.randint(2, 5)))
+        if p < len(links):
+            text += f' See {links[p]}.'
+        lines.extend([text, ''])
+        if rng.random() < latex_density / 2:
+            lines.extend(['$$', rng.choice(DISPLAY_MATH), '$$', ''])
+        if image_names and rng.random() < 0.2:
+            lines.extend([f'![[{rng.choice(image_names)}]]', ''])
+    return '\n'.join(lines) + '\n'
+
+
+def generate_vault(
+    root: Path,
+    notes: int = 500,
+    links_per_note: int = 8,
+    images: int = 50,
+    latex_density: float = 0.3,
+    depth: int = 3,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Write a synthetic vault under root. Returns a summary with the note
+    titles, image names and total bytes written.
+    """
+    rng = random.Random(seed)
+    root.mkdir(parents=True, exist_ok=True)
+
+    image_names = [f"figure {i:04d}.png" for i in range(images)]
+    written = 0
+    for i, name in enumerate(image_names):
+        folder = root / 'attachments' / f'set-{i % 4}'
+        folder.mkdir(parents=True, exist_ok=True)
+        data = tiny_png(i)
+        (folder / name).write_bytes(data)
+        written += len(data)
+
+    titles = [note_title(i) for i in range(notes)]
+    for title in titles:
+        folder = root / note_folder(depth, rng)
+        folder.mkdir(parents=True, exist_ok=True)
+        text = note_body(notes, links_per_note, image_names, latex_density, rng)
+        (folder / f'{title}.md').write_text(text, encoding='utf-8')
+        written += len(text.encode('utf-8'))
+
+    return {
+        'root': str(root),
+        'titles': titles,
+        'images': image_names,
+        'bytes': written,
+    }
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Generate a synthetic Obsidian vault.")
+    parser.add_argument('output', type=Path, help="Directory to write the vault into")
+    parser.add_argument('--notes', type=int, default=500)
+    parser.add_argument('--links', type=int, default=8, help="Wiki-links per note")
+    parser.add_argument('--images', type=int, default=50)
+    parser.add_argument('--latex', type=float, default=0.3, help="Chance of math per sentence (0-1)")
+    parser.add_argument('--depth', type=int, default=3, help="Maximum folder nesting")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    info = generate_vault(args.output, args.notes, args.links, args.images, args.latex, args.depth, args.seed)
+    print(f"✅ Wrote {len(info['titles'])} notes and {len(info['images'])} images "
+          f"({info['bytes'] / 1024:.0f} KB) to {info['root']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Token Budget
+
+Counts tokens locally so prompts can be sized to a token budget instead of
+a character count:
+
+- count_tokens(): tokens in a piece of text for a model
+- truncate_to_tokens(): the longest prefix that fits a budget
+- split_into_chunks(): consecutive pieces that each fit a budget, cut at
+  paragraph boundaries where possible (then lines, then anywhere)
+
+Uses tiktoken when it is installed and its encoding can be loaded (the
+first load downloads it, so set TIKTOKEN_CACHE_DIR to keep it offline).
+Otherwise tokens are estimated at CHARS_PER_TOKEN characters each, which
+is close for English prose but undercounts math-heavy notes.
+"""
+
+import re
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+# Estimate used without tiktoken
+CHARS_PER_TOKEN = 4
+
+# Encoding for models tiktoken doesn't know by name
+DEFAULT_ENCODING = 'o200k_base'
+
+# Split point after each blank line (paragraphs keep their trailing newlines)
+PARAGRAPH_BREAK_PATTERN = re.compile(r'(?<=\n\n)')
+
+_lock = threading.Lock()
+
+# model -> tiktoken Encoding, or None where the estimate is used
+_encodings: Dict[Optional[str], Any] = {}
+
+
+def get_encoding(model: Optional[str] = None) -> Optional[Any]:
+    """The tiktoken encoding for model, or None if tiktoken is unavailable."""
+    if model not in _encodings:
+        with _lock:
+            if model not in _encodings:
+                _encodings[model] = _load_encoding(model)
+    return _encodings[model]
+
+
+def _load_encoding(model: Optional[str]) -> Optional[Any]:
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding(DEFAULT_ENCODING)
+        except KeyError:
+            return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:  # e.g. the encoding file can't be downloaded
+        print(f"  ⚠️  Could not load tiktoken encoding ({e}); estimating tokens")
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Number of tokens text encodes to for model."""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """The longest prefix of text that is at most max_tokens tokens."""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    # A cut inside a multi-byte character decodes to U+FFFD; drop it
+    return encoding.decode(tokens[:max_tokens]).rstrip('\ufffd')
+
+
+def _pieces(text: str, max_tokens: int, model: Optional[str]) -> Iterator[str]:
+    """text as paragraphs, with any paragraph over budget split into lines, then hard-cut."""
+    for paragraph in PARAGRAPH_BREAK_PATTERN.split(text):
+        if count_tokens(paragraph, model) <= max_tokens:
+            yield paragraph
+            continue
+        for line in paragraph.splitlines(keepends=True):
+            while count_tokens(line, model) > max_tokens:
+                head = truncate_to_tokens(line, max_tokens, model) or line[0]
+                yield head
+                line = line[len(head):]
+            if line:
+                yield line
+
+
+def split_into_chunks(text: str, max_tokens: int, model: Optional[str] = None) -> List[str]:
+    """
+    Split text into consecutive chunks of at most about max_tokens tokens
+    (tokens are counted per piece, so a joined chunk can differ by a few).
+    Text within budget comes back as a single unchanged chunk.
+    """
+    if count_tokens(text, model) <= max_tokens:
+        return [text]
+
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for piece in _pieces(text, max_tokens, model):
+        tokens = count_tokens(piece, model)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(''.join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        chunks.append(''.join(current))
+    return [chunk.strip() for chunk in chunks if chunk.strip()]
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Vault Index
+
+Walks the Obsidian vault once and maps lowercased filenames to paths, so
+document and image lookups are dictionary hits instead of a full
+vault.rglob() per lookup.
+
+The index is saved to scripts/.cache/ together with the mtime of every
+directory. A directory's mtime changes whenever an entry is added, removed
+or renamed inside it, so later runs only re-list the directories that
+changed and reuse the cached listing for everything else.
+
+Usage:
+    from vault_index import get_vault_index
+
+    index = get_vault_index(vault_path)
+    index.find_document("Game Theory")
+    index.find_image("diagram.png")
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Optional, Dict, List, Any
+
+# Image extensions
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.bmp'}
+
+# Where persisted indexes live (one file per vault path)
+CACHE_DIR = Path(__file__).parent / '.cache'
+
+# Bump when the on-disk format changes to force a full rescan
+INDEX_VERSION = 1
+
+
+def is_markdown(name: str) -> bool:
+    """Whether a filename belongs in the markdown bucket."""
+    return name.lower().endswith('.md')
+
+
+def is_image(name: str) -> bool:
+    """Whether a filename belongs in the image bucket."""
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+class VaultIndex:
+    """
+    Filename index of an Obsidian vault.
+
+    - documents: lowercased "{title}.md" -> Path
+    - images: lowercased image filename -> Path
+
+    When several files share a name, the first one found in a depth-first
+    walk (sorted by name) wins, which mirrors the old rglob() behaviour of
+    returning the first match.
+    """
+
+    def __init__(self, vault_path: str, cache_path: Optional[Path] = None):
+        self.vault_path = Path(vault_path)
+        if cache_path is None:
+            vault_hash = hashlib.sha1(str(self.vault_path).encode('utf-8')).hexdigest()[:12]
+            cache_path = CACHE_DIR / f'vault_index_{vault_hash}.json'
+        self.cache_path = cache_path
+
+        self.documents: Dict[str, Path] = {}
+        self.images: Dict[str, Path] = {}
+
+        # Relative directory path -> {'mtime': ns, 'files': [...], 'dirs': [...]}
+        self._dirs: Dict[str, Dict[str, Any]] = {}
+        self.rescanned_dirs = 0
+
+    @classmethod
+    def load(cls, vault_path: str, cache_path: Optional[Path] = None) -> 'VaultIndex':
+        """Load the persisted index (if any) and bring it up to date."""
+        index = cls(vault_path, cache_path)
+        index._load_cache()
+        index.refresh()
+        return index
+
+    # --------------------------------------------------------
+    # Lookups
+    # --------------------------------------------------------
+
+    def find_document(self, title: str) -> Optional[Path]:
+        """Find {title}.md anywhere in the vault (case-insensitive)."""
+        return self.documents.get(f"{title}.md".lower())
+
+    def find_image(self, filename: str) -> Optional[Path]:
+        """Find an image anywhere in the vault by filename (case-insensitive)."""
+        return self.images.get(filename.lower())
+
+    # --------------------------------------------------------
+    # Scanning
+    # --------------------------------------------------------
+
+    def refresh(self) -> int:
+        """
+        Re-walk the vault, re-listing only directories whose mtime changed.
+        Saves the index if anything was rescanned.
+        Returns the number of directories that were rescanned.
+        """
+        self.rescanned_dirs = 0
+        if not self.vault_path.is_dir():
+            self.documents = {}
+            self.images = {}
+            self._dirs = {}
+            return 0
+
+        old_dirs = self._dirs
+        new_dirs: Dict[str, Dict[str, Any]] = {}
+        documents: Dict[str, Path] = {}
+        images: Dict[str, Path] = {}
+
+        # Depth-first, pre-order walk (same order rglob visits directories)
+        stack = ['']
+        while stack:
+            rel_dir = stack.pop()
+            abs_dir = self.vault_path / rel_dir if rel_dir else self.vault_path
+
+            try:
+                mtime = os.stat(abs_dir).st_mtime_ns
+            except OSError:
+                continue
+
+            entry = old_dirs.get(rel_dir)
+            if entry is None or entry['mtime'] != mtime:
+                entry = self._scan_dir(abs_dir, mtime)
+                if entry is None:
+                    continue
+                self.rescanned_dirs += 1
+            new_dirs[rel_dir] = entry
+
+            for name in entry['files']:
+                path = abs_dir / name
+                key = name.lower()
+                if is_markdown(name):
+                    documents.setdefault(key, path)
+                elif is_image(name):
+                    images.setdefault(key, path)
+
+            for name in reversed(entry['dirs']):
+                stack.append(f"{rel_dir}/{name}" if rel_dir else name)
+
+        self.documents = documents
+        self.images = images
+        if self.rescanned_dirs or len(new_dirs) != len(old_dirs):
+            self._dirs = new_dirs
+            self.save()
+        return self.rescanned_dirs
+
+    @staticmethod
+    def _scan_dir(abs_dir: Path, mtime: int) -> Optional[Dict[str, Any]]:
+        """List one directory, keeping only markdown/image files and real subdirectories."""
+        files: List[str] = []
+        dirs: List[str] = []
+        try:
+            with os.scandir(abs_dir) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir() and not entry.is_symlink():
+                            dirs.append(entry.name)
+                        elif entry.is_file() and (is_markdown(entry.name) or is_image(entry.name)):
+                            files.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            return None
+
+        return {'mtime': mtime, 'files': sorted(files), 'dirs': sorted(dirs)}
+
+    # --------------------------------------------------------
+    # Persistence
+    # --------------------------------------------------------
+
+    def _load_cache(self) -> None:
+        """Load directory listings from disk; ignore missing or stale caches."""
+        if not self.cache_path.exists():
+            return
+        try:
+            data = json.loads(self.cache_path.read_text(encoding='utf-8'))
+        except Exception:
+            return
+        if data.get('version') != INDEX_VERSION or data.get('vault_path') != str(self.vault_path):
+            return
+        self._dirs = data.get('dirs', {})
+
+    def save(self) -> None:
+        """Write the index to disk atomically."""
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            'version': INDEX_VERSION,
+            'vault_path': str(self.vault_path),
+            'dirs': self._dirs,
+        }
+        tmp_path = self.cache_path.with_name(f'{self.cache_path.name}.{os.getpid()}.tmp')
+        tmp_path.write_text(json.dumps(data), encoding='utf-8')
+        os.replace(tmp_path, self.cache_path)
+
+
+# One index per vault path per process
+_INDEXES: Dict[str, VaultIndex] = {}
+
+
+def get_vault_index(vault_path: str) -> VaultIndex:
+    """Return the (lazily loaded) index for a vault path."""
+    key = str(vault_path)
+    index = _INDEXES.get(key)
+    if index is None:
+        index = VaultIndex.load(vault_path)
+        _INDEXES[key] = index
+    return index
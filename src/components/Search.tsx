@@ -0,0 +1,201 @@
+/** @jsx jsx */
+import { jsx } from "theme-ui"
+import * as React from "react"
+import { useEffect, useRef, useState } from "react"
+import { Link } from "gatsby"
+
+// Reads the index scripts/search_index.py writes to static/search/:
+// manifest.json lists the documents and the term-range shards, and each
+// shard maps terms to flat [docId, weight, ...] postings. Nothing is
+// fetched until the first search, and then only the shards a query needs.
+
+type Manifest = {
+  version: number
+  docs: ([string, string, string, number] | null)[]
+  shards: [string, string][]
+}
+
+type Postings = Record<string, number[]>
+
+type Result = {
+  url: string
+  title: string
+  kind: string
+  score: number
+}
+
+const BASE = "/search"
+const MAX_RESULTS = 20
+// Matches for a word that only start with it count this much of an exact match
+const PREFIX_WEIGHT = 0.5
+// BM25 term-frequency saturation and length normalisation
+const K1 = 1.2
+const B = 0.75
+// Longest indexed term, in code points (MAX_TERM_LENGTH in scripts/search_index.py)
+const MAX_TERM_LENGTH = 32
+// Must match STOP_WORDS in scripts/search_index.py
+const STOP_WORDS = new Set(
+  `a an and are as at be but by for from has have he her his i if in into is it its
+  me my not of on or our she so than that the their them then there these they this
+  to was we were what when which who will with you your`.split(/\s+/)
+)
+
+let manifestRequest: Promise<Manifest> | null = null
+const shardRequests = new Map<string, Promise<Postings>>()
+
+const fetchJson = <T,>(url: string): Promise<T> =>
+  fetch(url).then((response) => {
+    if (!response.ok) throw new Error(`${url}: ${response.status}`)
+    return response.json() as Promise<T>
+  })
+
+const loadManifest = () => {
+  if (!manifestRequest) {
+    manifestRequest = fetchJson<Manifest>(`${BASE}/manifest.json`).catch((error) => {
+      manifestRequest = null
+      throw error
+    })
+  }
+  return manifestRequest
+}
+
+const loadShard = (name: string) => {
+  let request = shardRequests.get(name)
+  if (!request) {
+    request = fetchJson<Postings>(`${BASE}/${name}.json`)
+    shardRequests.set(name, request)
+  }
+  return request
+}
+
+// Same rules as tokenize() in scripts/search_index.py
+export const tokenize = (text: string): string[] =>
+  (text.toLowerCase().match(/[\p{L}\p{N}\p{M}]+/gu) || []).filter((word) => {
+    const length = Array.from(word).length
+    return length > 1 && length <= MAX_TERM_LENGTH && !STOP_WORDS.has(word)
+  })
+
+// Shards that can hold terms starting with word: the one word sorts into
+// and any following ones whose first term starts with it
+const shardsFor = (manifest: Manifest, word: string): string[] => {
+  const { shards } = manifest
+  let low = 0
+  let high = shards.length - 1
+  while (low < high) {
+    const mid = (low + high + 1) >> 1
+    if (shards[mid][0] <= word) low = mid
+    else high = mid - 1
+  }
+  const names = [shards[low][1]]
+  for (let i = low + 1; i < shards.length && shards[i][0].startsWith(word); i++) {
+    names.push(shards[i][1])
+  }
+  return names
+}
+
+export const search = async (query: string): Promise<Result[]> => {
+  const words = Array.from(new Set(tokenize(query)))
+  if (words.length === 0) return []
+  const manifest = await loadManifest()
+  const docs = manifest.docs.filter(Boolean) as [string, string, string, number][]
+  const total = docs.length
+  const averageLength = docs.reduce((sum, doc) => sum + doc[3], 0) / Math.max(1, total) || 1
+
+  let scores: Map<number, number> | null = null
+  for (const word of words) {
+    const shards = await Promise.all(shardsFor(manifest, word).map(loadShard))
+    const wordScores = new Map<number, number>()
+    for (const shard of shards) {
+      for (const term of Object.keys(shard)) {
+        if (!term.startsWith(word)) continue
+        const postings = shard[term]
+        const idf = Math.log(1 + total / (postings.length / 2))
+        const factor = term === word ? 1 : PREFIX_WEIGHT
+        for (let i = 0; i < postings.length; i += 2) {
+          const doc = postings[i]
+          const entry = manifest.docs[doc]
+          if (!entry) continue
+          const tf = postings[i + 1]
+          const norm = tf + K1 * (1 - B + (B * entry[3]) / averageLength)
+          wordScores.set(doc, (wordScores.get(doc) || 0) + ((tf * (K1 + 1)) / norm) * idf * factor)
+        }
+      }
+    }
+    // Every word has to match
+    if (scores === null) {
+      scores = wordScores
+    } else {
+      const previous: Map<number, number> = scores
+      scores = new Map()
+      for (const [doc, score] of wordScores) {
+        if (previous.has(doc)) scores.set(doc, score + (previous.get(doc) as number))
+      }
+    }
+    if (scores.size === 0) break
+  }
+
+  const results: Result[] = []
+  for (const [doc, score] of scores || []) {
+    const entry = manifest.docs[doc]
+    if (entry) results.push({ url: entry[0], title: entry[1], kind: entry[2], score })
+  }
+  return results.sort((a, b) => b.score - a.score).slice(0, MAX_RESULTS)
+}
+
+const Search: React.FC = () => {
+  const [query, setQuery] = useState(``)
+  const [results, setResults] = useState<Result[]>([])
+  const [error, setError] = useState(false)
+  const latest = useRef(0)
+
+  useEffect(() => {
+    const request = ++latest.current
+    search(query)
+      .then((found) => {
+        if (request === latest.current) {
+          setResults(found)
+          setError(false)
+        }
+      })
+      .catch(() => {
+        if (request === latest.current) setError(true)
+      })
+  }, [query])
+
+  return (
+    <div>
+      <input
+        type="search"
+        value={query}
+        onChange={(event) => setQuery(event.target.value)}
+        placeholder="Search posts and snippets"
+        aria-label="Search posts and snippets"
+        autoFocus
+        sx={{
+          width: `100%`,
+          fontSize: 2,
+          p: 2,
+          color: `text`,
+          bg: `background`,
+          border: `1px solid`,
+          borderColor: `muted`,
+          borderRadius: 4,
+        }}
+      />
+      {error && <p sx={{ color: `secondary` }}>Search is unavailable right now.</p>}
+      {!error && query.trim() && results.length === 0 && <p sx={{ color: `secondary` }}>No matches.</p>}
+      <ul sx={{ listStyle: `none`, p: 0, mt: 4 }}>
+        {results.map((result) => (
+          <li key={result.url} sx={{ mb: 3 }}>
+            <Link to={result.url} sx={{ fontSize: [1, 2] }}>
+              {result.title}
+            </Link>
+            {result.kind === `snippet` && <span sx={{ color: `secondary`, fontSize: 0, ml: 2 }}>snippet</span>}
+          </li>
+        ))}
+      </ul>
+    </div>
+  )
+}
+
+export default Search
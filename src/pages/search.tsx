@@ -0,0 +1,20 @@
+/** @jsx jsx */
+import { jsx, Heading } from "theme-ui"
+import * as React from "react"
+import type { HeadFC, PageProps } from "gatsby"
+import Layout from "../@lekoarts/gatsby-theme-minimal-blog/components/layout"
+import Seo from "@lekoarts/gatsby-theme-minimal-blog/src/components/seo"
+import Search from "../components/Search"
+
+const SearchPage: React.FC<PageProps> = () => (
+  <Layout>
+    <Heading as="h1" variant="styles.h1" sx={{ mb: 4 }}>
+      Search
+    </Heading>
+    <Search />
+  </Layout>
+)
+
+export default SearchPage
+
+export const Head: HeadFC = () => <Seo title="Search" pathname="/search/" />
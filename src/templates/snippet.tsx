@@ -1,7 +1,7 @@
 /** @jsx jsx */
 import * as React from "react"
 import { jsx, Heading } from "theme-ui"
-import { HeadFC, PageProps, graphql } from "gatsby"
+import { HeadFC, Link, PageProps, graphql } from "gatsby"
 import Layout from "../@lekoarts/gatsby-theme-minimal-blog/components/layout"
 import ItemTags from "@lekoarts/gatsby-theme-minimal-blog/src/components/item-tags"
 import Seo from "@lekoarts/gatsby-theme-minimal-blog/src/components/seo"
@@ -16,6 +16,10 @@ type SnippetProps = {
       name: string
       slug: string
     }[]
+    related?: {
+      title: string
+      slug: string
+    }[]
   }
 }
 
@@ -77,6 +81,20 @@ const SnippetTemplate: React.FC<React.PropsWithChildren<PageProps<SnippetProps>>
       >
         {children}
       </section>
+      {mdxSnippet.related && mdxSnippet.related.length > 0 && (
+        <section sx={{ mb: 5 }}>
+          <Heading as="h2" variant="styles.h3">
+            Related
+          </Heading>
+          <ul>
+            {mdxSnippet.related.map((entry) => (
+              <li key={entry.slug}>
+                <Link to={entry.slug}>{entry.title}</Link>
+              </li>
+            ))}
+          </ul>
+        </section>
+      )}
     </Layout>
   )
 }
@@ -102,6 +120,10 @@ export const query = graphql`
         name
         slug
       }
+      related {
+        title
+        slug
+      }
     }
   }
 `